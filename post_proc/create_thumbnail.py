@@ -108,16 +108,20 @@ class Thumbnails():
         return self.slice
     
     def _read_run_names(self):
-        """Reads the run names from the log file.
+        """Reads the run names from the run catalog of the log file or, if src is not in the path, from the log file.
         """        
-        import csv
-        run_names = []
-        with open(LOGPATH, "r") as csv_file:
-            csv_reader = csv.reader(csv_file)
-            next(csv_reader)
-            for line in csv_reader:
-                run_names.append(line[1])
-        return run_names
+        try:
+            from run_catalog import RunCatalog
+        except ImportError:
+            import csv
+            run_names = []
+            with open(LOGPATH, "r") as csv_file:
+                csv_reader = csv.reader(csv_file)
+                name_column = next(csv_reader).index("Name")
+                for line in csv_reader:
+                    run_names.append(line[name_column])
+            return run_names
+        return RunCatalog(LOGPATH).run_names()
 
     #a function that checks if there is any png file in the folder
     def _check_for_png(self, run_name: str = None):
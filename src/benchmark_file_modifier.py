@@ -0,0 +1,363 @@
+"""
+Benchmarks for the FileModifier. The micro-benchmark (benchmark_patterns) measures how long one call of modify_file
+takes on a copy of the job script, once with the compiled patterns that the entries of the line_archive carry and
+once with patterns that are rebuilt for every call. The job script itself is never changed.
+The suite (benchmark_suite) generates synthetic job scripts in the style of sunCAR30506.csh with different numbers
+of lines, modified parameters, helper sections and duplicates, times modify_file, import_parameters,
+export_parameters and write_log on them and saves the results as json, so that they can be compared to older runs.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import platform
+import itertools
+import contextlib
+import tracemalloc
+from datetime import datetime
+from statistics import median
+from read_write_automation import FileModifier, LinePatterns
+from job_template import template_path
+from config.config import SOURCEPATH, TESTCASE
+
+
+def _rebuild_patterns(mod):
+    """
+    Builds new patterns for every line object, like every call did before the patterns were cached. The cache of
+    the re module is kept warm, as it was before, so only the building of the patterns is measured.
+    """
+    for line_obj in list(mod.lines_to_read.values()) + list(mod.lines_to_modify.values()):
+        line_obj.patterns = LinePatterns(line_obj.line, line_obj.para_name)
+
+
+def time_modify_file(mod, filepath, repeats=10, rebuild_patterns=False):
+    """
+    Calls modify_file repeats times and returns the time of every call in seconds.
+
+    Args:
+        mod (FileModifier): The FileModifier with the parameters to read and modify.
+        filepath (str): The path to the copy of the job script.
+        repeats (int, optional): The number of calls. Defaults to 10.
+        rebuild_patterns (bool, optional): If the patterns are rebuilt in every call. Defaults to False.
+
+    Returns:
+        list: The time of every call in seconds.
+    """
+    times = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            if rebuild_patterns:
+                _rebuild_patterns(mod)
+            mod.modify_file(filepath)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def benchmark_patterns(sourcepath=SOURCEPATH, repeats=10):
+    """
+    Runs modify_file on a copy of the job script with cached and with rebuilt patterns and prints the
+    median time per call and the speedup.
+
+    Args:
+        sourcepath (str, optional): The path to the job script. Defaults to SOURCEPATH.
+        repeats (int, optional): The number of calls for each variant. Defaults to 10.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, os.path.basename(sourcepath))
+        shutil.copy(sourcepath, filepath)
+
+        mod = FileModifier()
+        # the first calls warm up the file system cache and the cache of the re module for both variants
+        time_modify_file(mod, filepath, repeats=1, rebuild_patterns=True)
+        time_modify_file(mod, filepath, repeats=1)
+        rebuilt = median(time_modify_file(mod, filepath, repeats, rebuild_patterns=True))
+        cached = median(time_modify_file(FileModifier(), filepath, repeats))
+
+    print("-"*100)
+    print(f"Benchmark of modify_file on {sourcepath} with {len(mod.lines_to_read)} parameters ({repeats} calls each)")
+    print(f"{'Rebuilt patterns':>18} | {rebuilt*1000:>10.2f} ms per call")
+    print(f"{'Cached patterns':>18} | {cached*1000:>10.2f} ms per call")
+    print(f"{'Speedup':>18} | {rebuilt/cached:>10.2f} x")
+    print("-"*100)
+
+
+# The sections of the synthetic job script. Every parameter of the archive of TESTCASE 19 is found in them.
+_SKELETON = [
+    ["#!/bin/csh"],
+    ["#HELPER LINE", "setenv NPX 4", "setenv NPY 4", "setenv NPZ 8"],
+    ["#HELPER LINE", "set    NNP = 128", "set    NNP = 128"],
+    ["#HELPER LINE", "setenv NTIME 08:00:00"],
+    ["#HELPER LINE", "setenv QUEUE big", "setenv QUEUE compute", "setenv PROJECT bm1236"],
+    ["#HELPER LINE", "setenv DIR /Net/Groups/BSI/scratch/EULAG_out/$JOBNAME",
+     "#setenv OUTPUTDIR /scratch/EULAG_out/$JOBNAME", "setenv DIR /work/bm/EULAG_out/$JOBNAME"],
+    ["#if (TESTCASE == {testcase})",
+     "      parameter (m=128, n=128, l=128)",
+     "      parameter (dx00=3000., dy00=3000., dz00=3000.)",
+     "      parameter (dt00=1.0, dtmax=4.0, lxyz=1)",
+     "      parameter (nt=6*60*60, noutp=60,",
+     "     &           nplot=1e8, nstore=30*60)",
+     "#endif"],
+    ["!HELPER LINE",
+     "      parameter (iwrite=1, iwrite0=0, irst=0)",
+     "      parameter (iomode=2)",
+     "      parameter (ismode=NETCDFO)",
+     "      parameter (iopar=3)",
+     "      parameter (nfil=1, nfilm=nfil)",
+     "      parameter (nfilo=1, nfilom=nfilo-1)",
+     "      parameter (dt_fil=0.4, nt_fil0=0, nt_film0=60*150)",
+     "      parameter (dt_filo=0.4, nt_filo0=0, nt_filom0=60*150)",
+     "      parameter (nfstart=13)",
+     "      parameter (nanlfl=1)",
+     "      parameter (idia=1)",
+     "      parameter (nplo=1)"],
+    ["#if (TESTCASE == {testcase})", "      parameter (ibcx=0, ibcy=0, ibcz=0)", "#endif",
+     "#if (TESTCASE == {testcase})", "      parameter (ibcx=1, ibcy=1, ibcz=0)", "#endif"],
+    ["#if (TESTCASE == {testcase})", "      parameter (isflx=1)", "      parameter (inoise=1)",
+     "      parameter (iblatt=0)", "#endif"],
+    ["!HELPER LINE", "      parameter (nspc=2)"],
+    ["#if (TESTCASE == {testcase})", "      parameter (istr=0, zhz=2000.)", "#endif",
+     "!HELPER LINE", "      parameter (imetryc=1, ivctype=2, ihorizdef=0, ivertdef=1)"],
+    ["#if (TESTCASE == {testcase})", "      parameter (isphere=0, icylind=0, icorio=1, ideep=0)", "#endif"],
+    ["!HELPER LINE", "#define TESTCASE {testcase}"],
+    ["#if (TESTCASE == {testcase})", "#define TURBST 0", "#define TKE 1", "#define SGS 1", "#define CHEMIS 1",
+     "#define IMRSB 0", "#define J3DIM 1", "#define MOISTMOD 1", "#define POLES 0", "#endif"],
+    ["#if (TESTCASE == {testcase})", "      data initi /1/", "      data lipps /1/",
+     "      data iab/1/, iabth/1/, iabqw/1/", "#endif",
+     "#if (TESTCASE == {testcase})", "      data dxabL/1e4/, towxL/1e10/", "      data dxabR/1e4/, towxR/1e10/",
+     "      data dyab/1e4/, towy/1e10/", "      data zab/2000.0/, towz/3600.0/", "#endif"],
+    ["#if (TESTCASE == {testcase})", "      data g/9.80616/, rg/287.04/, tt00/283.15/",
+     "     &  th00/283.15/, pr00/1.e5/, rh00/1.11/",
+     "      data u00/7.65/, v00/2.34/, st/0.0e-5/, u0z/0.0/, v0z/0.0/", "#endif",
+     "!HELPER LINE", "      data cour_max_allowed /0.9/", "      data timeadapt /1/"],
+    ["#if (TESTCASE == {testcase})", "      data fcr0/0.00014584/, ang/68./, initprs/0./",
+     "      data ceps/.845/, cL/0.845/, cm/.0856/, css/.165/, prndt/.42/",
+     "      data hf00/0.24/, qf00/5e-5/, cdrg/0.0/, rghn/0.60/",
+     "      data rv/461./, t00/273.16/, ee0/611./, hlat/2.53e6/", "      data rl00/0.50/", "      data dtm/30./",
+     "#endif"],
+    ["!HELPER LINE", "      ampns = 0.5e-3*nois"],
+    ["!HELPER LINE", "      chmsrc = 1e-2", "      chmflx = 0.0",
+     "!HELPER LINE", "      zo(i,j) = 0.001",
+     "      hfxp(i,j,:)     = (/ 22.44,  4.76,  0.7,   0.67, -1.58/) ! avg",
+     "      qfxp(i,j,:)     = (/ 37.98,  3.91, -1.57,  4.7,  -1.11 /)! avg",
+     "      chmsrc(i,j,1) = 1e-2", "      chmsrc(i,j,2) = 0.0", "      chmflx(i,j,1) = 0.0",
+     "!HELPER LINE", "      zo(i,j) = 0.220",
+     "      hfxp(i,j,:)     = (/ 15.42, -17.52, -44.91,  -2.46,  0.93/)! avg",
+     "      qfxp(i,j,:)     = (/ 51.73,  -9.42, -40.72,   0.43, 2.38/)! avg",
+     "      chmsrc(i,j,1) = 0.0", "      chmsrc(i,j,2) = 1e-2", "      chmflx(i,j,1) = 0.0"],
+    ["#HELPER LINE", "      mpiifort -O3 eulag.f", "      mpif90 -O3 eulag.f"],
+]
+# the lines in between the sections
+_FILLER = ["      x(i,j) = y(i,j) + 1", "c     a comment line", "      call update(a, b)", "",
+           "      if (a .gt. b) then", "      endif", "      do i=1,n", "      enddo", "echo running"]
+# lines that look like the lines of the parameters, they are put into sections of other testcases
+_DECOYS = ["      parameter (m=16, n=16, l=16)", "      parameter (nt=100, noutp=10,",
+           "      data zab/500.0/, towz/100.0/", "      data u00/1.0/, v00/0.0/, st/0.0/, u0z/0.0/, v0z/0.0/",
+           "#define TKE 0", "      parameter (ibcx=1, ibcy=0, ibcz=0)"]
+# the parameters that are modified by the suite, all of them are found in the synthetic job script
+BENCHMARK_PARAMETERS = ["n", "m", "l", "dx00", "dy00", "dz00", "dt00", "nt", "noutp", "nplot", "nstore",
+                        "ibcx", "ibcy", "ibcz", "isflx", "inoise", "TKE", "SGS", "iab", "iabth", "zab", "towz",
+                        "g", "pr00", "u00", "v00", "u0z", "v0z", "fcr0", "ceps", "hf00", "rghn", "dtm",
+                        "cour_max_allowed", "timeadapt", "irst", "nfil", "nfilm", "nfstart", "LC0_zo", "LC1_zo",
+                        "NPX", "NPY", "NPZ", "levante_NNP", "nspc", "istr", "imetryc", "icorio", "ampns"]
+
+
+def synthetic_job_script(n_lines=10000, n_sections=10, duplicate_density=0.01, seed=0):
+    """
+    Generates a job script in the style of sunCAR30506.csh. All parameters of the archive of TESTCASE 19 are in
+    their sections, the rest of the lines are filler lines in between.
+
+    Args:
+        n_lines (int, optional): The approximate number of lines. Defaults to 10000.
+        n_sections (int, optional): The number of additional helper sections of other testcases, each with a
+        copy of the first parameter lines. Defaults to 10.
+        duplicate_density (float, optional): The fraction of the filler lines that are lines of parameters in
+        sections of other testcases. Defaults to 0.01.
+        seed (int, optional): The seed of the random generator. Defaults to 0.
+
+    Returns:
+        str: The content of the job script.
+    """
+    rnd = random.Random(seed)
+    sections = [[line.format(testcase=TESTCASE) for line in section] for section in _SKELETON]
+    other_testcase = "0" if TESTCASE != "0" else "1"
+    for _ in range(n_sections):
+        sections.insert(rnd.randrange(1, len(sections)),
+                        [f"#if (TESTCASE == {other_testcase})", *_SKELETON[6][1:6], "#endif"])
+
+    n_filler = max(n_lines - sum(len(section) for section in sections), 0)
+    gaps = len(sections) - 1
+    lines = []
+    for k, section in enumerate(sections):
+        lines += section
+        if k == gaps:
+            break
+        # the lookback of the helper lines is 30 lines, so every gap is at least that long
+        for _ in range(max(n_filler // gaps, 30)):
+            if rnd.random() < duplicate_density:
+                lines += [f"#if (TESTCASE == {other_testcase})", rnd.choice(_DECOYS), "#endif"]
+            else:
+                lines.append(rnd.choice(_FILLER))
+    return "\n".join(lines) + "\n"
+
+
+def _measure(function, repeats):
+    """Returns the median time of repeats calls of function in seconds and the peak memory of one call in KiB."""
+    times = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return median(times), peak / 1024
+
+
+def benchmark_case(tmpdir, n_lines, n_parameters, n_sections, duplicate_density, repeats=5):
+    """
+    Runs the benchmarks of the FileModifier on one synthetic job script.
+
+    Args:
+        tmpdir (str): The folder for the job script, the exported parameters, the log and its catalog.
+        n_lines (int): The approximate number of lines of the job script.
+        n_parameters (int): The number of modified parameters (at most len(BENCHMARK_PARAMETERS)).
+        n_sections (int): The number of additional helper sections, see synthetic_job_script.
+        duplicate_density (float): The fraction of duplicate parameter lines, see synthetic_job_script.
+        repeats (int, optional): The number of timed calls of every operation. Defaults to 5.
+
+    Returns:
+        list: One result for every operation.
+    """
+    text = synthetic_job_script(n_lines, n_sections, duplicate_density)
+    n_lines = text.count("\n")
+    filepath = os.path.join(tmpdir, "sunCAR30506.csh")
+    with open(filepath, "w") as file:
+        file.write(text)
+    outpath = os.path.join(tmpdir, "out") + "/"
+    os.makedirs(outpath, exist_ok=True)
+    logpath = os.path.join(tmpdir, "log.csv")
+    # the catalog of the log is kept in tmpdir as well, so that no catalogs are left in the cache folder
+    catalogpath = os.path.join(tmpdir, "catalog")
+    parameters = BENCHMARK_PARAMETERS[:n_parameters]
+
+    calls = itertools.count()
+    def modifier(use_template=True):
+        mod = FileModifier(use_template=use_template)
+        call = next(calls)
+        for k, key_name in enumerate(parameters):
+            # a new value in every call, so that every call changes the file
+            value = call + k + (0.5 if mod.line_archive[key_name].is_float else 0)
+            mod.add_para(key_name, value)
+        return mod
+
+    run_names = itertools.count()
+    def export_parameters():
+        name = f"run{next(run_names)}"
+        os.makedirs(outpath + name, exist_ok=True)
+        mod.export_parameters(name, outpath=outpath)
+
+    # the first call compiles the template
+    with contextlib.redirect_stdout(io.StringIO()):
+        mod = modifier()
+        mod.modify_file(filepath)
+        export_parameters()
+
+    operations = {
+        "modify_file (search)": lambda: modifier(use_template=False).modify_file(filepath),
+        "modify_file (template)": lambda: modifier().modify_file(filepath),
+        "import_parameters": lambda: FileModifier().import_parameters(outpath + "run0"),
+        "export_parameters": export_parameters,
+        "write_log": lambda: mod.write_log(f"run{next(run_names)}", logpath=logpath,
+                                          catalogpath=catalogpath),
+    }
+    results = []
+    for operation, function in operations.items():
+        seconds, peak_kib = _measure(function, repeats)
+        results.append({"operation": operation, "lines": n_lines, "parameters": len(parameters),
+                        "sections": n_sections, "duplicate_density": duplicate_density,
+                        "seconds": seconds, "lines_per_second": n_lines / seconds, "peak_memory_kib": peak_kib})
+
+    if os.path.exists(template_path(filepath)):
+        os.remove(template_path(filepath))
+    return results
+
+
+def benchmark_suite(line_counts=(1000, 10000, 50000, 200000), parameter_counts=(10, 50), section_counts=(0, 50),
+                    duplicate_densities=(0.0, 0.05), repeats=5, output="benchmark_results.json", compare=None):
+    """
+    Runs benchmark_case for the line counts with the default of the other dimensions and for every other dimension
+    on 10000 lines, prints the results and saves them to a json file.
+
+    Args:
+        line_counts (tuple, optional): The numbers of lines. Defaults to (1000, 10000, 50000, 200000).
+        parameter_counts (tuple, optional): The numbers of modified parameters. Defaults to (10, 50).
+        section_counts (tuple, optional): The numbers of additional helper sections. Defaults to (0, 50).
+        duplicate_densities (tuple, optional): The fractions of duplicate lines. Defaults to (0.0, 0.05).
+        repeats (int, optional): The number of timed calls of every operation. Defaults to 5.
+        output (str, optional): The path of the json file. Defaults to "benchmark_results.json".
+        compare (str, optional): The path of the json file of an older run, which is compared to. Defaults to None.
+    """
+    cases = [(n_lines, parameter_counts[0], section_counts[0], duplicate_densities[0]) for n_lines in line_counts]
+    cases += [(10000, n_parameters, section_counts[0], duplicate_densities[0]) for n_parameters in parameter_counts[1:]]
+    cases += [(10000, parameter_counts[0], n_sections, duplicate_densities[0]) for n_sections in section_counts[1:]]
+    cases += [(10000, parameter_counts[0], section_counts[0], density) for density in duplicate_densities[1:]]
+
+    results = []
+    for case in cases:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            results += benchmark_case(tmpdir, *case, repeats=repeats)
+
+    older = {}
+    if compare is not None:
+        with open(compare, "r") as file:
+            for result in json.load(file)["results"]:
+                older[_result_key(result)] = result
+
+    print("-"*100)
+    print(f"{'Operation':<24}|{'Lines':>8} |{'Paras':>6} |{'Sects':>6} |{'Dups':>6} |{'ms':>10} |{'Lines/s':>12} |{'Peak KiB':>10} |{'vs old':>7}")
+    for result in results:
+        old = older.get(_result_key(result))
+        ratio = f"{result['seconds']/old['seconds']:>6.2f}x" if old else f"{'-':>7}"
+        print(f"{result['operation']:<24}|{result['lines']:>8} |{result['parameters']:>6} |{result['sections']:>6} |"
+              f"{result['duplicate_density']:>6} |{result['seconds']*1000:>10.2f} |{result['lines_per_second']:>12.0f} |"
+              f"{result['peak_memory_kib']:>10.0f} |{ratio}")
+    print("-"*100)
+
+    with open(output, "w") as file:
+        json.dump({"date": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+                   "platform": platform.platform(), "repeats": repeats, "results": results}, file, indent=1)
+    print(f"Results saved to {output}")
+
+
+def _result_key(result):
+    return (result["operation"], result["lines"], result["parameters"], result["sections"], result["duplicate_density"])
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--file", default=SOURCEPATH, help="Set the job script that is copied and used for the benchmark.")
+    parser.add_argument("-r", "--repeats", default=10, type=int, help="Set the number of calls of modify_file for each variant.")
+    parser.add_argument("-s", "--suite", default=False, action="store_true", help="Run the benchmark suite on synthetic job scripts.")
+    parser.add_argument("-l", "--lines", nargs="*", type=int, default=[1000, 10000, 50000, 200000], help="Set the line counts of the suite.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Set the json file the results of the suite are saved to.")
+    parser.add_argument("-c", "--compare", default=None, help="Set a json file of an older run of the suite to compare to.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = flag_parser()
+    if args.suite:
+        benchmark_suite(line_counts=args.lines, repeats=args.repeats, output=args.output, compare=args.compare)
+    else:
+        benchmark_patterns(args.file, args.repeats)
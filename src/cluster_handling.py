@@ -1,53 +1,203 @@
+"""
+An auxiliary module that helps to communicate and check with the cluster. A job is identified by the name of its
+output folder, i.e. its working directory.
+squeue is called once per snapshot of the user's jobs (SlurmSnapshot), which all helpers share for SNAPSHOT_TTL
+seconds. Submitted jobs are added to the snapshot instead of calling squeue again, and the snapshot is replaced as a
+whole under a lock, so that it can be shared by several threads.
+The other helpers rename the turbs file and copy the tape file of a restart, link the output of an existing run
+(link_output_files) and read the id of a job from the output of sbatch (parse_job_id). For a chain of restarts, the
+file management is either inserted after the line FILE_MANAGEMENT_LINE ("#FILE MANAGEMENT") of the job script, so
+that the job does it itself, or submitted as a small job that depends on the restart.
+"""
+import os
+import time
+import getpass
+import threading
 import subprocess
 
-def get_output_folders_of_running_slurm_jobs():
+# the seconds for which the jobs that squeue returned are used before squeue is called again
+SNAPSHOT_TTL = 10
+
+
+class SlurmSnapshot():
     """
-    Retrieves the output folder names for the user's running Slurm jobs.
+    The user's jobs in Slurm at one moment. squeue is called once and its result is kept for ttl seconds, so that
+    many lookups, e.g. one per run folder, only need one call of squeue. The jobs can be looked up by the name of
+    their output folder, their job name and their working directory in constant time. The output folders of the
+    active jobs leave out the jobs that only wait for another job to finish (reason Dependency). Jobs that are submitted
+    meanwhile are added to the snapshot instead of calling squeue again.
+    The snapshot can be shared by several threads: the jobs and the sets are never changed in place, but replaced
+    as a whole under a lock, and only one thread calls squeue at a time.
     """
+    def __init__(self, ttl=SNAPSHOT_TTL):
+        """
+        Args:
+            ttl (float, optional): The seconds for which the result of squeue is used. Defaults to SNAPSHOT_TTL.
+        """
+        self.ttl = ttl
+        self.taken = None
+        self.jobs = []
+        self.output_folders = set()
+        self.active_output_folders = set()
+        self.job_names = set()
+        self.work_dirs = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
 
-    command = "squeue -u $(whoami) -o '%j %Z'"  # Get job ID and working directory
-    process = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    def is_stale(self) -> bool:
+        """Returns True if squeue has not been called yet or its result is older than the ttl."""
+        return self.taken is None or time.monotonic() - self.taken > self.ttl
 
-    if process.returncode == 0:
-        output = process.stdout
-        output_folders = []
+    def invalidate(self):
+        """Makes the next lookup call squeue again, e.g. because the outcome of a submission is unknown."""
+        self.taken = None
 
-        for line in output.splitlines()[1:]:  # Skip header line
-            job_id, working_dir = line.split()
-            output_folders.append(working_dir.split(sep='/')[-1])    # Append output folder
+    def _set_jobs(self, jobs, taken):
+        output_folders = {os.path.basename(os.path.normpath(job["work_dir"])) for job in jobs}
+        active_output_folders = {os.path.basename(os.path.normpath(job["work_dir"])) for job in jobs
+                                 if job["reason"] != "Dependency"}
+        job_names = {job["name"] for job in jobs}
+        work_dirs = {os.path.normpath(job["work_dir"]) for job in jobs}
+        with self._lock:
+            self.jobs, self.output_folders, self.job_names, self.work_dirs = jobs, output_folders, job_names, work_dirs
+            self.active_output_folders = active_output_folders
+            self.taken = taken
 
-        return output_folders
-    else:
-        print(f"Error executing squeue: {process.stderr}")
-        return []  # Return an empty list if there's an error
+    def refresh(self, force=False):
+        """
+        Calls squeue if the snapshot is stale or force is True. If squeue fails, the jobs are empty and squeue is
+        called again with the next lookup.
+        """
+        with self._refresh_lock:
+            if not force and not self.is_stale():
+                return self
+            command = ["squeue", "-h", "-u", getpass.getuser(), "-o", "%i|%j|%T|%r|%Z"]
+            try:
+                process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                returncode, stderr = process.returncode, process.stderr
+            except OSError as e:
+                returncode, stderr = None, str(e)
+
+            jobs = []
+            if returncode == 0:
+                for line in process.stdout.splitlines():
+                    fields = line.split("|", 4)
+                    if len(fields) == 5:
+                        job_id, job_name, state, reason, work_dir = fields
+                        jobs.append({"id": job_id, "name": job_name, "state": state, "reason": reason,
+                                     "work_dir": work_dir})
+                self._set_jobs(jobs, time.monotonic())
+            else:
+                print(f"Error executing squeue: {stderr}")
+                self._set_jobs(jobs, None)
+            return self
+
+    def add_job(self, job_id, job_name, work_dir, state="PENDING", reason="None"):
+        """
+        Adds a job that has just been submitted, so that the snapshot does not have to be taken again. A stale
+        snapshot is left as it is, since squeue is called anyway with the next lookup.
+
+        Args:
+            job_id (str): The id of the job.
+            job_name (str): The name of the job.
+            work_dir (str): The working directory of the job, i.e. its output folder.
+            state (str, optional): The state of the job. Defaults to "PENDING".
+            reason (str, optional): Why the job is pending, e.g. "Dependency". Defaults to "None".
+        """
+        with self._refresh_lock:
+            # squeue may have been called after the submission and already have the job
+            if self.is_stale() or any(job["id"] == str(job_id) for job in self.jobs):
+                return
+            job = {"id": str(job_id), "name": job_name, "state": state, "reason": reason, "work_dir": work_dir}
+            self._set_jobs(self.jobs + [job], self.taken)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def output_folder_list(self) -> list:
+        """Returns the name of the output folder of every job."""
+        return [os.path.basename(os.path.normpath(job["work_dir"])) for job in self.jobs]
+
+    def is_running(self, output_folder) -> bool:
+        """Returns True if a job runs in an output folder with this name."""
+        return output_folder in self.output_folders
+
+    def has_job_name(self, job_name) -> bool:
+        """Returns True if a job with this job name is in the queue."""
+        return job_name in self.job_names
+
+    def has_work_dir(self, work_dir) -> bool:
+        """Returns True if a job runs in this working directory."""
+        return os.path.normpath(work_dir) in self.work_dirs
+
+
+# the snapshot that is shared by all helpers of this module
+_snapshot = SlurmSnapshot()
+
+
+def slurm_snapshot(max_age=None) -> SlurmSnapshot:
+    """
+    Returns the shared snapshot of the user's Slurm jobs, squeue is only called if the snapshot is older than its
+    ttl or max_age.
+
+    Args:
+        max_age (float, optional): The maximal age of the snapshot in seconds. Defaults to None, which uses the
+        ttl of the snapshot (SNAPSHOT_TTL).
+    """
+    if max_age is not None and _snapshot.taken is not None and time.monotonic() - _snapshot.taken > max_age:
+        _snapshot.invalidate()
+    return _snapshot.refresh()
+
+
+def invalidate_slurm_snapshot():
+    """Makes the next lookup call squeue again, e.g. if it is unknown whether a job has been submitted."""
+    _snapshot.invalidate()
+
+
+def add_job_to_slurm_snapshot(job_id, job_name, work_dir, reason="None"):
+    """Adds a job that has just been submitted to the shared snapshot, see SlurmSnapshot.add_job."""
+    _snapshot.add_job(job_id, job_name, work_dir, reason=reason)
+
+
+def get_output_folders_of_running_slurm_jobs():
+    """
+    Retrieves the output folder names for the user's running Slurm jobs.
+    """
+    return slurm_snapshot().output_folder_list()
+
+
+def get_output_folders_of_active_slurm_jobs():
+    """
+    Retrieves the output folder names for the user's jobs that do not only wait for another job to finish.
+    """
+    return list(slurm_snapshot().active_output_folders)
 
 
 def check_if_job_is_running(job_name):
     """
     Checks if the user's job is running.
     """
-
-    output_folders = get_output_folders_of_running_slurm_jobs()
-    return job_name in output_folders
+    return slurm_snapshot().is_running(job_name)
 
 def check_how_many_jobs_are_running():
     """
     Checks how many jobs the user has running.
     """
-
-    output_folders = get_output_folders_of_running_slurm_jobs()
-    return len(output_folders)
+    return len(slurm_snapshot())
 
 def pause_until_next_job_can_start(job_name):
     """
-    Pauses the script until the user's next job can start.
+    Pauses the script until the user's next job can start. See job_scheduler for a scheduler that does not
+    block while waiting.
     """
     import time as t
     
     t_iter = 0
     while True:
-        job_number = check_how_many_jobs_are_running()
-        if not check_if_job_is_running(job_name):
+        # one call of squeue per iteration
+        snapshot = slurm_snapshot()
+        job_number = len(snapshot)
+        if not snapshot.is_running(job_name):
             if job_number < 4:
                 print(f"Job {job_name} is no longer running. Starting next job...")
                 return
@@ -63,7 +213,7 @@ def rename_turbs_file(job_name, time_step):
     """
     Renames the turb file to include the time step.
     """
-    from config import OUTPATH
+    from config.config import OUTPATH
     import os
     # Get the output folder
     output_folder = os.path.join(OUTPATH, job_name)
@@ -77,7 +227,7 @@ def copy_tapef_file(job_name, time_step):
     """
     Copies the tape file to a new file with the time step.
     """
-    from config import OUTPATH
+    from config.config import OUTPATH
     import os
     import time as t
     # Get the output folder
@@ -87,6 +237,119 @@ def copy_tapef_file(job_name, time_step):
     os.system(f"cp {os.path.join(output_folder, 'tapef.nc')} {os.path.join(output_folder, f'tapef{time_step}.nc')}")
     t.sleep(15)  # Sleep for 15 seconds
 
+def link_output_files(existing_job_name, job_name):
+    """
+    Links the output files of an existing run into the output folder of a new run with the same parameters, so that
+    the new run does not have to be computed again. The parameters, the hash and the job script of the new run are
+    kept, the files that the new run already has are not replaced.
+
+    Returns:
+        int: The number of files that have been linked.
+    """
+    from config.config import OUTPATH
+    import os
+    existing_folder = os.path.join(OUTPATH, existing_job_name)
+    output_folder = os.path.join(OUTPATH, job_name)
+    os.makedirs(output_folder, exist_ok=True)
+
+    n_linked = 0
+    for file_name in os.listdir(existing_folder):
+        if file_name.endswith((".csv", ".hash", ".csh")):
+            continue
+        link_path = os.path.join(output_folder, file_name)
+        if os.path.lexists(link_path):
+            continue
+        os.symlink(os.path.join(os.path.abspath(existing_folder), file_name), link_path)
+        n_linked += 1
+    return n_linked
+
+
+def parse_job_id(output):
+    """
+    Returns the id of the job in the output of sbatch, "Submitted batch job <id>" or the output of
+    sbatch --parsable, or None if there is no id.
+    """
+    import re
+    match = re.search(r"Submitted batch job (\d+)", output) or re.match(r"\s*(\d+)(;\S*)?\s*$", output)
+    return match.group(1) if match else None
+
+
+# the line in the batch part of the job script after which insert_file_management adds the file management
+FILE_MANAGEMENT_LINE = "#FILE MANAGEMENT"
+
+
+def file_management_commands(job_name, time_step):
+    """
+    Returns the shell commands that do what rename_turbs_file and copy_tapef_file do, with the full paths of the
+    files, e.g. for the end of a batch script.
+    """
+    from config.config import OUTPATH
+    import os
+    import shlex
+    def path(file_name):
+        return shlex.quote(os.path.join(OUTPATH, job_name, file_name))
+    return (f"mv {path('turbs.nc')} {path(f'turbs{time_step}.nc')} && mv {path('turbf.nc')} {path(f'turbf{time_step}.nc')}"
+            f" && cp {path('tapef.nc')} {path(f'tapef{time_step}.nc')}")
+
+
+def insert_file_management(script_path, job_name, time_step) -> bool:
+    """
+    Adds the file management of the time step after the FILE_MANAGEMENT_LINE of the job script, so that the batch
+    job does it itself when EULAG has finished and no job of its own is needed. The line has to be in the part of
+    the script that runs in the batch job, e.g. at the end of the batch script the job script writes and submits.
+
+    Args:
+        script_path (str): The path to the rendered job script.
+        job_name (str): The name of the job, i.e. its output folder.
+        time_step (int): The time step that is added to the file names.
+
+    Returns:
+        bool: False if the job script has no FILE_MANAGEMENT_LINE and nothing was added.
+    """
+    with open(script_path, "r") as file:
+        lines = file.readlines()
+    for i, line in enumerate(lines):
+        if line.strip() == FILE_MANAGEMENT_LINE:
+            lines.insert(i + 1, file_management_commands(job_name, time_step) + "\n")
+            break
+    else:
+        return False
+    with open(script_path, "w") as file:
+        file.writelines(lines)
+    return True
+
+
+def submit_file_management(job_name, time_step, dependency, sbatch_options=()):
+    """
+    Submits a small job that does what rename_turbs_file and copy_tapef_file do on the login node, but only
+    after the job with the id dependency has finished successfully.
+
+    Args:
+        job_name (str): The name of the job, i.e. its output folder.
+        time_step (int): The time step that is added to the file names.
+        dependency (str): The id of the job that writes the files.
+        sbatch_options (tuple, optional): Further options of sbatch, e.g. the partition. Defaults to ().
+
+    Returns:
+        str: The id of the job or None if it could not be submitted.
+    """
+    from config.config import OUTPATH
+    import os
+    commands = file_management_commands(job_name, time_step)
+    command = ["sbatch", "--parsable", f"--dependency=afterok:{dependency}", f"--job-name={job_name}",
+               f"--chdir={os.path.join(OUTPATH, job_name)}", "--ntasks=1", "--time=00:10:00",
+               *sbatch_options, f"--wrap={commands}"]
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        print(f"Error executing sbatch: {process.stderr}")
+        return None
+    job_id = parse_job_id(process.stdout)
+    if job_id is None:
+        invalidate_slurm_snapshot()
+    else:
+        add_job_to_slurm_snapshot(job_id, job_name, os.path.join(OUTPATH, job_name), reason="Dependency")
+    return job_id
+
 if __name__ == "__main__":
     import sys
     print("-" * 40)
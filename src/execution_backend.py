@@ -0,0 +1,234 @@
+"""
+The backends that run the job scripts of Simulation. A backend starts a job script with the name of the run and
+tells which jobs are still running, like cluster_handling does for Slurm. Like in cluster_handling, a job is
+identified by the name of its output folder.
+    SlurmBackend: runs the job script, which submits the job to Slurm, and asks squeue for the running jobs
+    LocalBackend: runs the job scripts on the local machine in a pool with a limited number of jobs at the same
+    time and a fixed number of cores per job, e.g. for small test series on a workstation
+
+The local backend runs the job script as it is, so the script has to run EULAG itself instead of submitting it.
+"""
+import os
+import abc
+import shutil
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from cluster_handling import get_output_folders_of_running_slurm_jobs, get_output_folders_of_active_slurm_jobs, \
+    invalidate_slurm_snapshot, slurm_snapshot, add_job_to_slurm_snapshot, parse_job_id
+from config.config import OUTPATH, LOGPATH
+
+# the return code of a local job whose script could not be run at all
+RETURNCODE_NOT_RUN = -1
+
+
+class ExecutionBackend(abc.ABC):
+    """
+    The interface of the backends.
+    """
+    name = None
+
+    @abc.abstractmethod
+    def submit(self, script_path, job_name, env=None, run_name=None) -> subprocess.CompletedProcess:
+        """
+        Starts the job script with the name of the job.
+
+        Args:
+            script_path (str): The path to the job script.
+            job_name (str): The name of the job, i.e. the name of its output folder.
+            env (dict, optional): The environment of the job script. Defaults to None, which is the environment
+            of this process.
+            run_name (str, optional): The name of the run the job belongs to, e.g. RESTART2_<job_name>. Defaults
+            to None, which is the job_name.
+
+        Returns:
+            subprocess.CompletedProcess: The return code and the output of the submission.
+        """
+
+    @abc.abstractmethod
+    def running_job_names(self) -> list:
+        """Returns the names of the output folders of the running jobs."""
+
+    def active_job_names(self) -> list:
+        """
+        Returns the names of the output folders of the running jobs that do not only wait for another job to
+        finish, e.g. to count them toward the limit of the JobScheduler.
+        """
+        return self.running_job_names()
+
+    def is_running(self, job_name) -> bool:
+        """Returns True if the job is running."""
+        return job_name in self.running_job_names()
+
+    def has_failed(self, run_name, job_name):
+        """
+        Returns True if the last job of the run has failed, e.g. after it is no longer running, False if it has not
+        or None if its final state is not known yet, so that it is checked again later.
+        """
+        return False
+
+    def update_states(self):
+        """Brings the states of the submitted jobs up to date at once, e.g. once per tick of the JobScheduler."""
+        pass
+
+    def wait(self):
+        """Waits until all jobs that have been submitted by the backend have finished, if the backend can."""
+        pass
+
+
+class SlurmBackend(ExecutionBackend):
+    """
+    Runs the job script, which submits the job to Slurm. The running jobs are taken from the shared snapshot of
+    squeue in cluster_handling, every submitted job is added to it. The id of every submitted job is
+    added to the job registry, where sacct tells if it has failed. The states of all open jobs are updated at once
+    by update_states.
+    """
+    name = "slurm"
+
+    def __init__(self, logpath=LOGPATH):
+        """
+        Args:
+            logpath (str, optional): The path to the log file the job registry belongs to. Defaults to
+            LOGPATH.
+        """
+        self.logpath = logpath
+
+    def submit(self, script_path, job_name, env=None, run_name=None) -> subprocess.CompletedProcess:
+        from job_registry import JobRegistry
+        try:
+            result = subprocess.run([script_path, job_name], env=env, capture_output=True, text=True)
+        except OSError:
+            invalidate_slurm_snapshot()
+            raise
+        job_id = parse_job_id(result.stdout) if result.returncode == 0 else None
+        if job_id is not None:
+            JobRegistry(self.logpath).add_job(job_id, run_name or job_name, job_name)
+            # like all jobs of this module, the job runs in the output folder with its name
+            waiting = (env or os.environ).get("SBATCH_DEPENDENCY")
+            add_job_to_slurm_snapshot(job_id, job_name, os.path.join(OUTPATH, job_name),
+                                      reason="Dependency" if waiting else "None")
+        else:
+            # the script may have submitted a job without printing its id
+            invalidate_slurm_snapshot()
+        return result
+
+    def has_failed(self, run_name, job_name):
+        # the state is only read, it is brought up to date by update_states, e.g. once per tick of the scheduler
+        from job_registry import JobRegistry, FINAL_STATES
+        job = JobRegistry(self.logpath).last_job(run_name)
+        if job is None:
+            return False
+        if job["state"] not in FINAL_STATES:
+            # e.g. COMPLETING or RUNNING, since sacct may lag behind squeue
+            return None
+        return job["state"] != "COMPLETED"
+
+    def update_states(self):
+        from job_registry import JobRegistry
+        JobRegistry(self.logpath).update()
+
+    def running_job_names(self) -> list:
+        return get_output_folders_of_running_slurm_jobs()
+
+    def active_job_names(self) -> list:
+        return get_output_folders_of_active_slurm_jobs()
+
+    def is_running(self, job_name) -> bool:
+        return slurm_snapshot().is_running(job_name)
+
+
+class LocalBackend(ExecutionBackend):
+    """
+    Runs the job scripts on the local machine. At most max_jobs scripts run at the same time, the others wait in
+    the order they were submitted. Every job gets cores_per_job cores of its own: OMP_NUM_THREADS and NCORES are set
+    in its environment and, where the system supports it, the job is bound to its cores.
+    """
+    name = "local"
+
+    def __init__(self, max_jobs=2, cores_per_job=1, outpath=OUTPATH):
+        """
+        Args:
+            max_jobs (int, optional): The maximal number of jobs that run at the same time. Defaults to 2.
+            cores_per_job (int, optional): The number of cores of every job. Defaults to 1.
+            outpath (str, optional): The folder of the run folders. Defaults to OUTPATH.
+        """
+        n_cores = os.cpu_count() or 1
+        if max_jobs * cores_per_job > n_cores:
+            print(f"Warning: {max_jobs} jobs with {cores_per_job} cores need more than the {n_cores} cores of this machine.")
+        self.max_jobs = max_jobs
+        self.cores_per_job = cores_per_job
+        self.outpath = outpath
+        self.jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs)
+        self._lock = threading.Lock()
+        # every running job takes one of the sets of cores and gives it back when it has finished
+        self._free_cores = [set(range(i * cores_per_job, (i + 1) * cores_per_job)) for i in range(max_jobs)]
+
+    def _run(self, script_path, job_name, env):
+        folder = os.path.join(self.outpath, job_name)
+        with self._lock:
+            cores = self._free_cores.pop()
+        env = dict(os.environ if env is None else env)
+        env["OMP_NUM_THREADS"] = env["NCORES"] = str(self.cores_per_job)
+        bind = hasattr(os, "sched_setaffinity") and max(cores) < (os.cpu_count() or 1)
+        try:
+            with open(os.path.join(folder, "local.out"), "w") as output:
+                process = subprocess.Popen([script_path, job_name], cwd=folder, env=env, stdout=output,
+                                           stderr=subprocess.STDOUT)
+                # the job is bound to its cores right after it has started, a preexec_fn is not safe in the
+                # threads of the pool
+                if bind:
+                    try:
+                        os.sched_setaffinity(process.pid, cores)
+                    except OSError as e:
+                        print(f"Warning: The job {job_name} could not be bound to its cores: {e}")
+                returncode = process.wait()
+        except OSError as e:
+            print(f"ERROR: The job {job_name} could not be run: {e}")
+            return RETURNCODE_NOT_RUN
+        finally:
+            with self._lock:
+                self._free_cores.append(cores)
+        print(f"Local job {job_name} has finished with return code {returncode}.")
+        return returncode
+
+    def submit(self, script_path, job_name, env=None, run_name=None) -> subprocess.CompletedProcess:
+        """
+        Puts the job script into the queue of the pool and returns right away. The script is copied into the run
+        folder first, since the job script may be changed for the next run before this job starts. The output of
+        the job is written to local.out in the run folder.
+        """
+        folder = os.path.join(self.outpath, job_name)
+        os.makedirs(folder, exist_ok=True)
+        local_script = os.path.join(folder, os.path.basename(script_path))
+        if os.path.abspath(local_script) != os.path.abspath(script_path):
+            shutil.copy2(script_path, local_script)
+        self.jobs[job_name] = self._executor.submit(self._run, os.path.abspath(local_script), job_name, env)
+        return subprocess.CompletedProcess([script_path, job_name], 0,
+                                           stdout=f"Job {job_name} queued on the local machine\n", stderr="")
+
+    def running_job_names(self) -> list:
+        # the jobs that wait in the queue count as running, like pending jobs in squeue
+        return [job_name for job_name, future in self.jobs.items() if not future.done()]
+
+    def has_failed(self, run_name, job_name) -> bool:
+        future = self.jobs.get(job_name)
+        return future is not None and future.done() and self.returncode(job_name) != 0
+
+    def returncode(self, job_name):
+        """
+        Returns the return code of the job script, RETURNCODE_NOT_RUN if it could not be run or None if the job
+        has not finished.
+        """
+        future = self.jobs.get(job_name)
+        if future is None or not future.done():
+            return None
+        if future.exception() is not None:
+            print(f"ERROR: The job {job_name} could not be run: {future.exception()}")
+            return RETURNCODE_NOT_RUN
+        return future.result()
+
+    def wait(self):
+        for future in list(self.jobs.values()):
+            future.exception()
+
@@ -0,0 +1,177 @@
+"""
+A stand-in for sbatch, squeue and sacct to test the submission of jobs and job chains on a machine without Slurm.
+Put the folder in front of the PATH:
+    export PATH=/path/to/src/fake_slurm:$PATH
+
+sbatch records the job in a json state file ($FAKE_SLURM_STATE, defaults to fake_slurm.json in the temporary
+folder) and prints its id. Dependencies are taken from --dependency=afterok:<id>[:<id>] or $SBATCH_DEPENDENCY.
+The jobs are not run in the background, every call of squeue first runs the next $FAKE_SLURM_STEPS (default 1) jobs
+whose dependencies have completed, in the order they were submitted, and then lists the jobs that are still waiting.
+A job whose dependency has failed is cancelled like in Slurm. squeue understands -h, -j and -o with %i, %j, %T, %r
+(Dependency while a job waits for another one, otherwise None) and %Z.
+sacct lists the jobs with a line for the job and one for its batch step and understands -n, -P, -j and -o with
+JobID, JobIDRaw, JobName, State, ExitCode, Elapsed and MaxRSS.
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import resource
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+STATE_PATH = os.environ.get("FAKE_SLURM_STATE", os.path.join(tempfile.gettempdir(), "fake_slurm.json"))
+
+
+@contextmanager
+def state():
+    """Yields the state with the jobs and writes it back afterwards. The state file is locked meanwhile."""
+    with open(STATE_PATH + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(STATE_PATH, "r") as file:
+                data = json.load(file)
+        except (FileNotFoundError, ValueError):
+            data = {"next_id": 1000, "jobs": []}
+        yield data
+        with open(STATE_PATH, "w") as file:
+            json.dump(data, file, indent=1)
+
+
+def _option(args, name):
+    """Removes --name=value or --name value from args and returns the value or None."""
+    for i, arg in enumerate(args):
+        if arg.startswith(f"--{name}="):
+            del args[i]
+            return arg.split("=", 1)[1]
+        if arg == f"--{name}" and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+    return None
+
+
+def sbatch(args):
+    parsable = "--parsable" in args
+    args = [arg for arg in args if arg != "--parsable"]
+    dependency = _option(args, "dependency") or os.environ.get("SBATCH_DEPENDENCY", "")
+    name = _option(args, "job-name")
+    workdir = os.path.abspath(_option(args, "chdir") or os.getcwd())
+    wrap = _option(args, "wrap")
+    # the remaining options like --time or --ntasks are ignored
+    args = [arg for arg in args if not arg.startswith("-")]
+    if wrap is not None:
+        command = ["/bin/sh", "-c", wrap]
+    elif args:
+        command = ["/bin/sh", os.path.abspath(args[0]), *args[1:]]
+    else:
+        print("sbatch: error: no batch script given", file=sys.stderr)
+        return 1
+
+    after_ok = []
+    for condition in filter(None, dependency.split(",")):
+        kind, _, ids = condition.partition(":")
+        if kind != "afterok":
+            print(f"sbatch: error: the dependency {kind} is not supported", file=sys.stderr)
+            return 1
+        after_ok += [int(job_id) for job_id in ids.split(":")]
+
+    with state() as data:
+        job_id = data["next_id"]
+        data["next_id"] += 1
+        data["jobs"].append({"id": job_id, "name": name or os.path.basename(command[-1]), "workdir": workdir,
+                             "command": command, "after_ok": after_ok, "state": "PENDING"})
+    print(job_id if parsable else f"Submitted batch job {job_id}")
+    return 0
+
+
+def _advance(data, steps):
+    states = {job["id"]: job["state"] for job in data["jobs"]}
+    for job in data["jobs"]:
+        if steps == 0:
+            break
+        if job["state"] != "PENDING":
+            continue
+        dependencies = [states.get(job_id, "COMPLETED") for job_id in job["after_ok"]]
+        if any(state not in ["PENDING", "COMPLETED"] for state in dependencies):
+            job["state"] = states[job["id"]] = "CANCELLED"
+            continue
+        if "PENDING" in dependencies:
+            continue
+        os.makedirs(job["workdir"], exist_ok=True)
+        job["start"] = time.time()
+        with open(os.path.join(job["workdir"], f"slurm-{job['id']}.out"), "w") as output:
+            returncode = subprocess.run(job["command"], cwd=job["workdir"], stdout=output, stderr=output).returncode
+        job["end"] = time.time()
+        # the largest resident set size of all jobs so far, in KiB on Linux
+        job["max_rss"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        job["state"] = states[job["id"]] = "COMPLETED" if returncode == 0 else "FAILED"
+        job["exit_code"] = returncode
+        steps -= 1
+
+
+def squeue(args):
+    header = "-h" not in args and "--noheader" not in args
+    job_ids = _option(args, "jobs") or (args[args.index("-j") + 1] if "-j" in args else None)
+    output_format = _option(args, "format") or (args[args.index("-o") + 1] if "-o" in args else "%i %j %T")
+    with state() as data:
+        _advance(data, int(os.environ.get("FAKE_SLURM_STEPS", 1)))
+        jobs = [job for job in data["jobs"] if job["state"] == "PENDING"]
+        states = {job["id"]: job["state"] for job in data["jobs"]}
+    for job in jobs:
+        waiting = any(states.get(job_id) == "PENDING" for job_id in job["after_ok"])
+        job["reason"] = "Dependency" if waiting else "None"
+    if job_ids:
+        jobs = [job for job in jobs if str(job["id"]) in job_ids.split(",")]
+
+    fields = {"%i": ("JOBID", "id"), "%j": ("NAME", "name"), "%T": ("STATE", "state"), "%r": ("REASON", "reason"),
+              "%Z": ("WORK_DIR", "workdir")}
+    def line(values):
+        text = output_format
+        for field, value in values.items():
+            text = text.replace(field, str(value))
+        return text
+    if header:
+        print(line({field: title for field, (title, _) in fields.items()}))
+    for job in jobs:
+        print(line({field: job[key] for field, (_, key) in fields.items()}))
+    return 0
+
+
+def sacct(args):
+    header = "-n" not in args and "--noheader" not in args
+    parsable = "-P" in args or "--parsable2" in args
+    job_ids = _option(args, "jobs") or (args[args.index("-j") + 1] if "-j" in args else None)
+    fields = (_option(args, "format") or (args[args.index("-o") + 1] if "-o" in args else
+                                          "JobID,JobName,State,ExitCode")).split(",")
+    with state() as data:
+        jobs = data["jobs"]
+    if job_ids:
+        jobs = [job for job in jobs if str(job["id"]) in job_ids.split(",")]
+
+    lines = [fields] if header else []
+    for job in jobs:
+        elapsed = int(job.get("end", 0) - job.get("start", 0))
+        values = {"JobID": str(job["id"]), "JobIDRaw": str(job["id"]), "JobName": job["name"], "State": job["state"],
+                  "ExitCode": f"{job.get('exit_code', 0)}:0",
+                  "Elapsed": time.strftime("%H:%M:%S", time.gmtime(elapsed)), "MaxRSS": ""}
+        lines.append([values.get(field, "") for field in fields])
+        if "start" in job:
+            # the batch step has the memory of the job
+            values.update({"JobID": f"{job['id']}.batch", "JobIDRaw": f"{job['id']}.batch", "JobName": "batch",
+                           "MaxRSS": f"{job['max_rss']}K"})
+            lines.append([values.get(field, "") for field in fields])
+    for line in lines:
+        print("|".join(line) if parsable else " ".join(f"{value:<12}" for value in line))
+    return 0
+
+
+if __name__ == "__main__":
+    command = os.path.basename(sys.argv[1] if len(sys.argv) > 1 else "")
+    commands = {"sbatch": sbatch, "squeue": squeue, "sacct": sacct}
+    if command not in commands:
+        print(f"Usage: fake_slurm.py {{{','.join(commands)}}} [options]", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(commands[command](sys.argv[2:]))
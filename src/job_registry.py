@@ -0,0 +1,228 @@
+"""
+A registry of the submitted Slurm jobs in a SQLite database. Unlike the output folders in
+squeue (see cluster_handling), the jobs are identified by the id that sbatch returned when they were submitted, so
+a job that has left the queue can still be told apart as completed, failed, cancelled or timed out. The states are
+brought up to date with a single sacct query for all jobs that have not reached a final state, which also gives the
+exit code, the elapsed time and the maximal resident set size of every job.
+Like the run catalog, the registry is kept in the local cache folder (CATALOGPATH), since the locking of SQLite
+is not reliable on the network file system of the log. If the cache folder can not be written, it is kept in memory.
+"""
+import os
+import shutil
+import sqlite3
+import subprocess
+from datetime import datetime
+from run_catalog import CATALOGPATH, catalog_path
+from config.config import LOGPATH
+
+# the states of sacct after which a job does not change anymore
+FINAL_STATES = ["COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY", "NODE_FAIL", "PREEMPTED",
+                "BOOT_FAIL", "DEADLINE"]
+SACCT_FIELDS = ["JobIDRaw", "State", "ExitCode", "Elapsed", "MaxRSS"]
+# the registries in memory are kept open, since a database in memory is deleted with its last connection
+_memory_registries = {}
+
+
+def parse_elapsed(elapsed):
+    """Returns the seconds of an elapsed time of sacct, [days-]hours:minutes:seconds, or None."""
+    if not elapsed:
+        return None
+    days, _, clock = elapsed.rpartition("-")
+    seconds = 0
+    for part in clock.split(":"):
+        seconds = seconds * 60 + float(part)
+    return int(seconds + int(days or 0) * 86400)
+
+
+def parse_memory(memory):
+    """Returns the bytes of a memory size of sacct, e.g. 1234K or 2.5G, or None."""
+    if not memory:
+        return None
+    units = {"K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+    if memory[-1] in units:
+        return int(float(memory[:-1]) * units[memory[-1]])
+    return int(float(memory))
+
+
+class JobRegistry():
+    """
+    The SQLite registry of the jobs. The table "jobs" has one row per job id with the run and the name of the job,
+    the time of the submission, the state of sacct, the exit code, the elapsed seconds and the maximal resident set
+    size in bytes.
+    """
+    def __init__(self, logpath=LOGPATH, catalogpath=CATALOGPATH):
+        """
+        Opens the registry that belongs to the log file and creates it if it does not exist yet. A registry that
+        was kept next to the log file before is copied into the cache folder.
+
+        Args:
+            logpath (str, optional): The path to the log file. Defaults to LOGPATH.
+            catalogpath (str, optional): The folder of the registries. Defaults to CATALOGPATH.
+        """
+        self.path = os.path.splitext(catalog_path(logpath, catalogpath))[0] + ".jobs.sqlite"
+        old_path = os.path.splitext(logpath)[0] + ".jobs.sqlite"
+        try:
+            os.makedirs(catalogpath, exist_ok=True)
+            if os.path.isfile(old_path) and not os.path.exists(self.path):
+                shutil.copyfile(old_path, self.path)
+            # the timeout lets parallel submitters wait for each other instead of failing
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            self._create_tables()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: The job registry can not be kept in {catalogpath}, it is kept in memory ({e}).")
+            # all registries of the log in this process share the database in memory
+            self.path = f"file:{os.path.basename(self.path)}?mode=memory&cache=shared"
+            self.connection = sqlite3.connect(self.path, uri=True, timeout=60)
+            _memory_registries.setdefault(self.path, self.connection)
+            self._create_tables()
+
+    def _create_tables(self):
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    run TEXT,
+                    job_name TEXT,
+                    submitted TEXT,
+                    state TEXT,
+                    exit_code TEXT,
+                    elapsed INTEGER,
+                    max_rss INTEGER,
+                    updated TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run);
+                CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+            """)
+
+    def add_job(self, job_id, run_name, job_name=None):
+        """
+        Adds a job right after it has been submitted.
+
+        Args:
+            job_id (str): The id of the job returned by sbatch (see cluster_handling.parse_job_id).
+            run_name (str): The name of the run, e.g. RESTART2_<run> for a restart.
+            job_name (str, optional): The name of the job, i.e. its output folder. Defaults to None.
+        """
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO jobs (job_id, run, job_name, submitted, state) "
+                                    "VALUES (?, ?, ?, ?, 'PENDING')",
+                                    (str(job_id), run_name, job_name, datetime.now().strftime("%d.%m.%y %H:%M")))
+
+    def open_job_ids(self) -> list:
+        """Returns the ids of the jobs that have not reached a final state."""
+        marks = ", ".join("?" * len(FINAL_STATES))
+        rows = self.connection.execute(f"SELECT job_id FROM jobs WHERE state NOT IN ({marks})", FINAL_STATES)
+        return [row["job_id"] for row in rows]
+
+    def update(self, job_ids=None) -> int:
+        """
+        Brings the states of the jobs up to date with one call of sacct. The state, exit code and elapsed time are
+        taken from the line of the job, the maximal resident set size is the maximum of its steps.
+
+        Args:
+            job_ids (list, optional): The ids of the jobs. Defaults to None, which takes all open jobs.
+
+        Returns:
+            int: The number of jobs that have been updated or None if sacct failed.
+        """
+        job_ids = self.open_job_ids() if job_ids is None else [str(job_id) for job_id in job_ids]
+        if not job_ids:
+            return 0
+        command = ["sacct", "-n", "-P", "-j", ",".join(job_ids), "-o", ",".join(SACCT_FIELDS)]
+        try:
+            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            print(f"Error executing sacct: {e}")
+            return None
+        if process.returncode != 0:
+            print(f"Error executing sacct: {process.stderr}")
+            return None
+
+        jobs = {}
+        for line in process.stdout.splitlines():
+            fields = dict(zip(SACCT_FIELDS, line.split("|")))
+            job_id, _, step = fields.get("JobIDRaw", "").partition(".")
+            if job_id not in job_ids:
+                continue
+            job = jobs.setdefault(job_id, {"max_rss": None})
+            if not step:
+                # e.g. "CANCELLED by 1234"
+                job["state"] = fields.get("State", "").split(" ")[0]
+                job["exit_code"] = fields.get("ExitCode")
+                job["elapsed"] = parse_elapsed(fields.get("Elapsed"))
+            rss = parse_memory(fields.get("MaxRSS"))
+            if rss is not None:
+                job["max_rss"] = max(job["max_rss"] or 0, rss)
+
+        updated = datetime.now().strftime("%d.%m.%y %H:%M")
+        with self.connection:
+            for job_id, job in jobs.items():
+                if "state" not in job:
+                    continue
+                self.connection.execute("UPDATE jobs SET state = ?, exit_code = ?, elapsed = ?, "
+                                        "max_rss = COALESCE(?, max_rss), updated = ? WHERE job_id = ?",
+                                        (job["state"], job["exit_code"], job["elapsed"], job["max_rss"], updated,
+                                         job_id))
+        return len(jobs)
+
+    def jobs(self, run_name=None) -> list:
+        """
+        Returns the jobs as dictionaries in the order they were submitted.
+
+        Args:
+            run_name (str, optional): Only the jobs of this run. Defaults to None, which returns all jobs.
+        """
+        if run_name is None:
+            rows = self.connection.execute("SELECT * FROM jobs ORDER BY rowid")
+        else:
+            rows = self.connection.execute("SELECT * FROM jobs WHERE run = ? ORDER BY rowid", (run_name,))
+        return [dict(row) for row in rows]
+
+    def last_job(self, run_name):
+        """Returns the last job of the run or None."""
+        jobs = self.jobs(run_name)
+        return jobs[-1] if jobs else None
+
+    def failed_runs(self) -> list:
+        """Returns the runs whose last job has reached a final state other than COMPLETED, e.g. to submit them again."""
+        runs = {}
+        for job in self.jobs():
+            runs[job["run"]] = job
+        return [run_name for run_name, job in runs.items()
+                if job["state"] in FINAL_STATES and job["state"] != "COMPLETED"]
+
+    def counts(self) -> dict:
+        """Returns the number of jobs in every state."""
+        rows = self.connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state ORDER BY state")
+        return {state: n for state, n in rows.fetchall()}
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-l", "--log", default=LOGPATH, help="Set the path to the log file.")
+    parser.add_argument("-u", "--update", default=False, action="store_true",
+                        help="Update the states of the open jobs with sacct first.")
+    parser.add_argument("-r", "--run", default=None, help="Only print the jobs of this run.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = flag_parser()
+    registry = JobRegistry(args.log)
+    if args.update:
+        registry.update()
+    print("-"*100)
+    for job in registry.jobs(args.run):
+        elapsed = "" if job["elapsed"] is None else f"{job['elapsed']} s"
+        max_rss = "" if job["max_rss"] is None else f"{job['max_rss'] / 2**20:.1f} MiB"
+        print(f"{job['job_id']:>10} | {job['run']:<40} | {job['state']:<13} | {job['exit_code'] or '':>5} | "
+              f"{elapsed:>10} | {max_rss:>12}")
+    print("-"*100)
+    print(", ".join(f"{state}: {n}" for state, n in registry.counts().items()))
+    failed = registry.failed_runs()
+    if failed:
+        print(f"Failed runs: {', '.join(failed)}")
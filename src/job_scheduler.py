@@ -0,0 +1,183 @@
+"""
+An asyncio scheduler for EULAG jobs. Jobs are put into a queue with a priority and are started as soon as fewer
+than max_in_flight jobs are running. Once per tick the scheduler asks Slurm for all running jobs at once and calls
+the callbacks of the jobs that have finished, which can put new jobs into the queue, e.g. the next restart of a run.
+Like in cluster_handling, a job is identified by the name of its output folder.
+"""
+import time
+import heapq
+import asyncio
+import inspect
+from itertools import count
+from cluster_handling import get_output_folders_of_running_slurm_jobs, get_output_folders_of_active_slurm_jobs
+
+
+class Job():
+    """
+    A job in the scheduler.
+    """
+    def __init__(self, name, start, priority=0, on_done=None, wait_only=False):
+        """
+        Args:
+            name (str): The name of the job, i.e. the name of its output folder.
+            start (callable): Starts the job, e.g. submits its job script. Can be a coroutine function.
+            priority (int, optional): Jobs with a lower priority are started first, jobs with the same priority
+            in the order they were added. Defaults to 0.
+            on_done (callable, optional): Called with the job when it has finished. Can be a coroutine function.
+            Defaults to None.
+            wait_only (bool, optional): The job has been submitted before or has already left the queue and is only
+            waited for. Defaults to False.
+        """
+        self.name = name
+        self.start = start
+        self.priority = priority
+        self.on_done = on_done
+        self.wait_only = wait_only
+        self.state = "pending" # pending, running, done, failed or timeout
+        self.started = None
+        self.finished = None
+        self.error = None
+
+
+class JobScheduler():
+    """
+    Starts the queued jobs with at most max_in_flight jobs at the same time and waits for them to finish.
+    The number of jobs in flight counts all running jobs of the user, also the ones that were not started by
+    the scheduler, as pause_until_next_job_can_start did. Only jobs that have been submitted or started count:
+    jobs that only wait for another job to finish (e.g. a chain of restarts) and jobs that are only waited for
+    (wait_only) do not take the place of a job that could run.
+    """
+    def __init__(self, max_in_flight=4, poll_interval=30, timeout=None, count_all_jobs=True):
+        """
+        Args:
+            max_in_flight (int, optional): The maximal number of jobs that run at the same time. Defaults to 4.
+            poll_interval (float, optional): The seconds between two polls of Slurm. Defaults to 30.
+            timeout (float, optional): The seconds after which a job that is still running is given up. Its
+            callback is called with job.state == "timeout", so the caller decides what happens, e.g. to wait for
+            it again. Defaults to None, which waits forever.
+            count_all_jobs (bool, optional): If the other running jobs of the user count to max_in_flight.
+            Defaults to True.
+        """
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.count_all_jobs = count_all_jobs
+        self.jobs = []
+        self._queue = []
+        self._order = count()
+        # a list of the running jobs, not a dictionary by name, since several jobs can have the same name, e.g. a
+        # run and its restarts, which all run in its folder
+        self._in_flight = []
+        # the jobs that are only waited for are started right away, they are not limited by max_in_flight
+        self._waiting = []
+        # polls Slurm, replaced in tests or by other backends, the active jobs leave out the ones that only wait for
+        # another job, they are replaced together
+        self.running_job_names = get_output_folders_of_running_slurm_jobs
+        self.active_job_names = get_output_folders_of_active_slurm_jobs
+        # called once per tick before the callbacks of the finished jobs, e.g. ExecutionBackend.update_states, so
+        # that the callbacks can look up the states of their jobs without asking Slurm one after the other
+        self.update_states = None
+        # called once without arguments when the scheduler has run all jobs, e.g. to write the wide log file
+        self.on_finished = []
+
+    def submit(self, name, start, priority=0, on_done=None, wait_only=False) -> Job:
+        """
+        Puts a job into the queue. Jobs can also be submitted from the callbacks while the scheduler runs.
+
+        Args:
+            name (str): The name of the job, i.e. the name of its output folder.
+            start (callable): Starts the job. Can be a coroutine function.
+            priority (int, optional): Jobs with a lower priority are started first. Defaults to 0.
+            on_done (callable, optional): Called with the job when it has finished. Defaults to None.
+            wait_only (bool, optional): The job has been submitted before or has already left the queue and is only
+            waited for, it is started with the next tick and only counts toward max_in_flight while it is active
+            in Slurm. Defaults to False.
+
+        Returns:
+            Job: The job.
+        """
+        job = Job(name, start, priority, on_done, wait_only)
+        self.jobs.append(job)
+        if wait_only:
+            self._waiting.append(job)
+        else:
+            heapq.heappush(self._queue, (priority, next(self._order), job))
+        return job
+
+    async def _call(self, function, *args):
+        # coroutine functions are awaited, blocking functions run in a thread so that the loop is not blocked
+        if inspect.iscoroutinefunction(function):
+            return await function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    async def _start(self, job) -> bool:
+        try:
+            await self._call(job.start)
+        except Exception as e:
+            job.state, job.error = "failed", e
+            print(f"ERROR: The job {job.name} could not be started: {e}")
+            return False
+        job.state, job.started = "running", time.time()
+        self._in_flight.append(job)
+        return True
+
+    async def _start_jobs(self, n_running):
+        while self._waiting:
+            await self._start(self._waiting.pop(0))
+        # the jobs are started one after the other, e.g. because they share one FileModifier
+        while self._queue and n_running < self.max_in_flight:
+            _, _, job = heapq.heappop(self._queue)
+            if await self._start(job):
+                n_running += 1
+                print(f"Job {job.name} started, {len(self._queue)} jobs are waiting.")
+
+    async def _finish(self, job, state):
+        job.state, job.finished = state, time.time()
+        self._in_flight.remove(job)
+        if state == "timeout":
+            print(f"Job {job.name} is taking too long to finish and is no longer tracked.")
+        else:
+            print(f"Job {job.name} is no longer running.")
+        if job.on_done is not None:
+            try:
+                await self._call(job.on_done, job)
+            except Exception as e:
+                job.error = e
+                print(f"ERROR: The callback of the job {job.name} failed: {e}")
+
+    async def tick(self):
+        """Polls Slurm once, finishes the jobs that are no longer running and starts the next jobs."""
+        polled = time.time()
+        running = set(await self._call(self.running_job_names))
+        # jobs that were started after the poll are checked with the next poll
+        done = [job for job in self._in_flight if job.started <= polled and job.name not in running]
+        if done and self.update_states is not None:
+            await self._call(self.update_states)
+        for job in done:
+            await self._finish(job, "done")
+        for job in list(self._in_flight):
+            if job.started <= polled and self.timeout is not None and polled - job.started > self.timeout:
+                await self._finish(job, "timeout")
+
+        # a job counts if it is active in Slurm or if it has been started and does not only wait for another job,
+        # e.g. because it is not in the queue yet
+        active = set(await self._call(self.active_job_names))
+        counted = [job for job in self._in_flight
+                   if job.name in active or not (job.wait_only or job.name in running - active)]
+        n_running = len(counted)
+        if self.count_all_jobs:
+            n_running = max(n_running, len(active | {job.name for job in counted}))
+        await self._start_jobs(n_running)
+
+    async def run_async(self):
+        """Runs until the queue is empty and all jobs have finished."""
+        while self._queue or self._waiting or self._in_flight:
+            await self.tick()
+            if self._queue or self._waiting or self._in_flight:
+                await asyncio.sleep(self.poll_interval)
+        for function in self.on_finished:
+            await self._call(function)
+
+    def run(self):
+        """Runs the scheduler until the queue is empty and all jobs have finished."""
+        asyncio.run(self.run_async())
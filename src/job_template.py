@@ -0,0 +1,468 @@
+"""
+Compiles the EULAG job script into a template: the static text of the script in chunks and a typed slot for the
+value of every parameter of the line_archive. Rendering a configuration is then a single string join and does not
+search the file. The FileModifier uses the template in modify_file whenever the template can reproduce the result
+of the search and falls back to searching the file otherwise.
+The compiled template is cached on the local disk (CACHEPATH), keyed by the path of the job script, TESTCASE and
+CLUSTER, and is checked against the content hash of the script.
+"""
+import os
+import re
+import io
+import json
+import hashlib
+import tempfile
+from itertools import islice
+from source_index import SourceIndex, SectionMap
+from config.config import TESTCASE, CLUSTER
+
+TEMPLATE_VERSION = 2
+# the templates are cached on the local disk, since the job script is usually on a network file system
+CACHEPATH = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "eulag_framework")
+# a value that is not a whole line ends at the first of these characters, see LinePatterns.modify_value
+_VALUE = re.compile(r"[^ /,\)\n]*")
+
+
+def content_hash(text):
+    """Returns the sha256 hash of the text."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def line_spec(line_obj):
+    """
+    Returns the properties of a Line2Read or Line2Modify object that decide in which line it is found.
+    """
+    return (line_obj.line, line_obj.para_name, line_obj.helper_line, line_obj.helper_para_name,
+            line_obj.helper_value, line_obj.pos_of_appearance, line_obj.whole_line)
+
+
+def archive_hash(line_archive):
+    """Returns a hash of the search criteria of all parameters in the line_archive."""
+    specs = [[key_name, *line_spec(line_obj)] for key_name, line_obj in line_archive.items()]
+    return content_hash(json.dumps(specs))
+
+
+def template_path(filepath, cachepath=CACHEPATH):
+    """
+    Returns the path of the cached template of the file in the cache folder. The name contains the name of the
+    file, TESTCASE, CLUSTER and a hash of the full path of the file.
+    """
+    filepath = os.path.abspath(filepath)
+    path_hash = content_hash(filepath)[:16]
+    return os.path.join(cachepath, f"{os.path.basename(filepath)}.{TESTCASE}.{CLUSTER}.{path_hash}.template.json")
+
+
+class Slot():
+    """
+    A place in the template that holds the value of one or more parameters. The value either ends at the next
+    ' ', '/', ',', ')' or at the end of the line (whole_line=False) or is the rest of the line (whole_line=True).
+    """
+    def __init__(self, key_names, line_index, start, end, whole_line):
+        """
+        The constructor of the Slot class.
+
+        Args:
+            key_names (list): The key_names of the parameters that are written to this slot.
+            line_index (int): The index of the line in the file.
+            start (int): The column where the value starts in the line of the compiled file.
+            end (int): The column where the value ends in the line of the compiled file.
+            whole_line (bool): If the value is the rest of the line.
+        """
+        self.key_names = key_names
+        self.line_index = line_index
+        self.start = start
+        self.end = end
+        self.whole_line = whole_line
+
+
+class JobTemplate():
+    """
+    The job script split into static chunks and slots. chunks[k] is the text in front of slots[k] and the last chunk
+    is the text after the last slot. texts holds the values of the slots in the current file.
+    The outcomes store for every parameter of the line_archive the slot it is found in (None if it is not found) and
+    the second line it is found in if it is found multiple times (None otherwise).
+    """
+    def __init__(self, chunks, slots, texts, outcomes, read_values, archive_hash, content_hash):
+        """
+        The constructor of the JobTemplate class. Use JobTemplate.compile or JobTemplate.load to create a template.
+        """
+        self.chunks = chunks
+        self.slots = slots
+        self.pristine_texts = texts
+        self.texts = list(texts)
+        self.outcomes = outcomes
+        self.read_values = read_values
+        self.archive_hash = archive_hash
+        self.pristine_hash = content_hash
+        self.content_hash = content_hash
+        self._slots_of_line = {}
+        for k, slot in enumerate(slots):
+            self._slots_of_line.setdefault(slot.line_index, []).append(k)
+        self._pristine_lines = {}
+        self._verified = {}
+        self._specs = {}
+        self._patterns = {}
+        self._sections = []
+        # for every line with slots: the line beginnings a changed value can affect and the parameters found in it
+        self._line_begins_of_line = {}
+        self._keys_of_line = {}
+
+    @classmethod
+    def compile(cls, lines, line_archive, find_lines):
+        """
+        Compiles the lines of the job script into a template for the parameters of the line_archive.
+        A parameter only gets a slot if reading and modifying it find the same lines and the value is at the
+        same position for both. Parameters without a slot are left out of the template.
+
+        Args:
+            lines (list): The lines of the file.
+            line_archive (dict): The line_archive of the FileModifier.
+            find_lines (function): The function of the FileModifier that yields the lines of a parameter.
+
+        Returns:
+            JobTemplate: The compiled template.
+        """
+        index = SourceIndex(lines)
+        spans = {}
+        outcomes = {}
+        read_values = {}
+        for key_name, line_obj in line_archive.items():
+            modify_hits = list(islice(find_lines(line_obj, index), 2))
+            read_hits = list(islice(find_lines(line_obj, index, read=True), 2))
+            if [i for i, _ in modify_hits] != [i for i, _ in read_hits]:
+                continue
+            if not modify_hits:
+                outcomes[key_name] = (None, None)
+                continue
+
+            (i, modify_match), (_, read_match) = modify_hits[0], read_hits[0]
+            patterns = line_obj.patterns
+            if line_obj.whole_line:
+                substitution = patterns.substitute_whole_line.search(lines[i])
+                if substitution.start(1) != read_match.start(3):
+                    continue
+                span = (i, substitution.start(1), substitution.end(1), True)
+                read_values[key_name] = str(read_match.group(3))
+            else:
+                substitution = patterns.substitute_value.search(lines[i])
+                if (substitution.start() != modify_match.start(2) or substitution.end() != modify_match.end(3)
+                        or read_match.start(3) != modify_match.start(3)):
+                    continue
+                span = (i, modify_match.start(3), modify_match.end(3), False)
+                read_values[key_name] = str(read_match.group(3).strip())
+
+            duplicate = modify_hits[1][0] if len(modify_hits) > 1 else None
+            spans.setdefault(span, []).append(key_name)
+            outcomes[key_name] = (span, duplicate)
+
+        # parameters whose values overlap without being the same slot can not be templated
+        ordered = sorted(spans)
+        for previous, span in zip(ordered, ordered[1:]):
+            if previous[0] == span[0] and span[1] < previous[2]:
+                for key_name in spans[previous] + spans[span]:
+                    outcomes.pop(key_name, None)
+        ordered = [span for span in ordered if all(key_name in outcomes for key_name in spans[span])]
+
+        slots = [Slot(spans[span], *span) for span in ordered]
+        slot_of_span = {span: k for k, span in enumerate(ordered)}
+        outcomes = {key_name: (slot_of_span[span] if span is not None else None, duplicate)
+                    for key_name, (span, duplicate) in outcomes.items()}
+        for key_name in list(read_values):
+            if key_name not in outcomes:
+                del read_values[key_name]
+
+        chunks, texts, current = [], [], []
+        slots_by_line = {}
+        for k, slot in enumerate(slots):
+            slots_by_line.setdefault(slot.line_index, []).append(slot)
+        for i, line in enumerate(lines):
+            if i not in slots_by_line:
+                current.append(line)
+                continue
+            pos = 0
+            for slot in slots_by_line[i]:
+                current.append(line[pos:slot.start])
+                chunks.append("".join(current))
+                current = []
+                texts.append(line[slot.start:slot.end])
+                pos = slot.end
+            current.append(line[pos:])
+        chunks.append("".join(current))
+
+        template = cls(chunks, slots, texts, outcomes, read_values,
+                       archive_hash(line_archive), content_hash("".join(lines)))
+        template._attach(line_archive, lines)
+        return template
+
+    @classmethod
+    def load(cls, path, line_archive):
+        """
+        Loads a template from a json file.
+
+        Args:
+            path (str): The path to the json file.
+            line_archive (dict): The line_archive of the FileModifier.
+
+        Returns:
+            JobTemplate: The template or None if there is no template for this line_archive in the file.
+        """
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if (data.get("version") != TEMPLATE_VERSION or data.get("testcase") != TESTCASE or data.get("cluster") != CLUSTER
+                or data.get("archive_hash") != archive_hash(line_archive)):
+            return None
+
+        slots = [Slot(*slot) for slot in data["slots"]]
+        outcomes = {key_name: tuple(outcome) for key_name, outcome in data["outcomes"].items()}
+        template = cls(data["chunks"], slots, data["texts"], outcomes, data["read_values"],
+                       data["archive_hash"], data["content_hash"])
+        template._attach(line_archive, io.StringIO(template.render_text(template.pristine_texts)).readlines())
+        return template
+
+    def save(self, path):
+        """
+        Saves the template to a json file. The folder is created if it does not exist.
+
+        Args:
+            path (str): The path to the json file.
+        """
+        data = {"version": TEMPLATE_VERSION,
+                "testcase": TESTCASE,
+                "cluster": CLUSTER,
+                "archive_hash": self.archive_hash,
+                "content_hash": self.pristine_hash,
+                "chunks": self.chunks,
+                "slots": [[slot.key_names, slot.line_index, slot.start, slot.end, slot.whole_line] for slot in self.slots],
+                "texts": self.pristine_texts,
+                "outcomes": self.outcomes,
+                "read_values": self.read_values}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so that other processes never load a half written template
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(path), suffix=".tmp", delete=False) as file:
+            json.dump(data, file)
+        os.replace(file.name, path)
+
+    def _attach(self, line_archive, lines):
+        """
+        Keeps the search criteria and patterns of the parameters and the compiled lines of the slots, which
+        are needed to check that a changed line is still found the same way. The parts of the check that do not
+        depend on the values are done here once: a line beginning only has to be checked again if it reaches into
+        the first slot of the line and only the parameters whose line beginning matches the line are checked.
+        """
+        line_begins = {}
+        sections = {}
+        for key_name, line_obj in line_archive.items():
+            self._specs[key_name] = line_spec(line_obj)
+            self._patterns[key_name] = line_obj.patterns
+            line_begins.setdefault(line_obj.line, []).append(key_name)
+            helper = (line_obj.helper_line, line_obj.helper_para_name, line_obj.helper_value)
+            if helper not in sections:
+                sections[helper] = SectionMap(*helper)
+        self._sections = list(sections.values())
+
+        for i, slot_indices in self._slots_of_line.items():
+            pristine = lines[i]
+            self._pristine_lines[i] = pristine
+            first_start = self.slots[slot_indices[0]].start
+            indent = len(pristine) - len(pristine.lstrip())
+            self._line_begins_of_line[i] = []
+            self._keys_of_line[i] = []
+            for line, key_names in line_begins.items():
+                patterns = self._patterns[key_names[0]]
+                if indent + len(line) >= first_start:
+                    self._line_begins_of_line[i].append(patterns)
+                if patterns.line_begin.match(pristine):
+                    self._keys_of_line[i] += key_names
+
+    def can_render(self, key_name, line_obj) -> bool:
+        """
+        Returns True if the template knows the parameter with the same search criteria as line_obj.
+        """
+        return key_name in self.outcomes and self._specs.get(key_name) == line_spec(line_obj)
+
+    def line_number(self, key_name):
+        """Returns the line number of the parameter or None if it is not found."""
+        slot_index = self.outcomes[key_name][0]
+        return None if slot_index is None else self.slots[slot_index].line_index + 1
+
+    def duplicate_line_number(self, key_name):
+        """Returns the line number of the second line the parameter is found in or None."""
+        duplicate = self.outcomes[key_name][1]
+        return None if duplicate is None else duplicate + 1
+
+    def render_text(self, texts):
+        """Returns the text of the file with the given values of the slots."""
+        parts = [self.chunks[0]]
+        for text, chunk in zip(texts, self.chunks[1:]):
+            parts.append(text)
+            parts.append(chunk)
+        return "".join(parts)
+
+    def match(self, text):
+        """
+        Matches the text against the static chunks of the template.
+
+        Args:
+            text (str): The content of the file.
+
+        Returns:
+            list: The values of the slots in the text or None if the text does not fit the template.
+        """
+        texts = []
+        pos = 0
+        for chunk, slot in zip(self.chunks, self.slots):
+            if not text.startswith(chunk, pos):
+                return None
+            pos += len(chunk)
+            if slot.whole_line:
+                end = text.find("\n", pos)
+                end = len(text) if end == -1 else end
+            else:
+                end = _VALUE.match(text, pos).end()
+            texts.append(text[pos:end])
+            pos = end
+        if text[pos:] != self.chunks[-1]:
+            return None
+        return texts
+
+    def sync(self, text) -> bool:
+        """
+        Brings the values of the slots up to date with the content of the file. If the content hash is known,
+        nothing has to be done. Otherwise the text is matched against the static chunks.
+
+        Args:
+            text (str): The content of the file.
+
+        Returns:
+            bool: False if the text does not fit the template and it has to be compiled again.
+        """
+        text_hash = content_hash(text)
+        if text_hash == self.content_hash:
+            return True
+        texts = self.match(text)
+        if texts is None:
+            return False
+        for i in self._slots_of_line:
+            if not self._verify_line(i, texts):
+                return False
+        self.texts = texts
+        self.content_hash = text_hash
+        return True
+
+    def render(self, modifications):
+        """
+        Writes the values of the modifications into the slots, in the same order as modify_file would do it.
+
+        Args:
+            modifications (list): The (key_name, value) pairs of the parameters to modify.
+
+        Returns:
+            tuple: The new values of the slots and for every modification if it changed the line (None if the
+            parameter is not found), or None if the template can not reproduce the changes.
+        """
+        texts = list(self.texts)
+        changes = []
+        for key_name, value in modifications:
+            slot_index = self.outcomes[key_name][0]
+            if slot_index is None:
+                changes.append(None)
+                continue
+            # modify_file uses the value in a re.sub replacement, where backslashes have a meaning
+            if "\\" in value:
+                return None
+            changed = texts[slot_index] != value
+            texts[slot_index] = value
+            changes.append(changed)
+            if changed and not self._verify_line(self.slots[slot_index].line_index, texts):
+                return None
+        return texts, changes
+
+    def read_value(self, key_name, texts):
+        """
+        Returns the value of a parameter as modify_file would read it from the file with the given slot values.
+        """
+        slot = self.slots[self.outcomes[key_name][0]]
+        i = slot.line_index
+        if all(texts[k] == self.pristine_texts[k] for k in self._slots_of_line[i]):
+            return self.read_values[key_name]
+        line, _ = self._build_line(i, texts)
+        patterns = self._patterns[key_name]
+        if slot.whole_line:
+            return str(patterns.read_whole_line.search(line).group(3))
+        return str(patterns.read_value.search(line).group(3).strip())
+
+    def _build_line(self, i, texts):
+        """Returns the line i with the given slot values and the columns where the slots start."""
+        pristine = self._pristine_lines[i]
+        parts = []
+        starts = {}
+        length = 0
+        pos = 0
+        for k in self._slots_of_line[i]:
+            slot = self.slots[k]
+            parts.append(pristine[pos:slot.start])
+            length += slot.start - pos
+            starts[k] = length
+            parts.append(texts[k])
+            length += len(texts[k])
+            pos = slot.end
+        parts.append(pristine[pos:])
+        return "".join(parts), starts
+
+    def _verify_line(self, i, texts) -> bool:
+        """
+        Checks that the line i with the given slot values is found by every parameter exactly like the compiled
+        line: it starts with the same line beginnings, has the same helper section labels, every parameter
+        matches it or not like before and the values of the slots in it are still at the slot positions.
+        """
+        key = (i, tuple(texts[k] for k in self._slots_of_line[i]))
+        if key in self._verified:
+            return self._verified[key]
+
+        pristine = self._pristine_lines[i]
+        line, starts = self._build_line(i, texts)
+        self._verified[key] = self._check_line(i, pristine, line, starts, texts)
+        return self._verified[key]
+
+    def _check_line(self, i, pristine, line, starts, texts) -> bool:
+        if line == pristine:
+            return True
+        for patterns in self._line_begins_of_line[i]:
+            if bool(patterns.line_begin.match(pristine)) != bool(patterns.line_begin.match(line)):
+                return False
+        for section in self._sections:
+            if section.label(pristine) != section.label(line):
+                return False
+
+        for key_name in self._keys_of_line[i]:
+            patterns = self._patterns[key_name]
+            para_name = self._specs[key_name][1]
+            # the patterns of a parameter can only match a line that contains its name
+            if para_name not in line and para_name not in pristine:
+                continue
+            whole_line = self._specs[key_name][6]
+            read_pattern = patterns.read_whole_line if whole_line else patterns.read_value
+            modify_match = patterns.modify_value.search(line)
+            read_match = read_pattern.search(line)
+            if (bool(modify_match) != bool(patterns.modify_value.search(pristine))
+                    or bool(read_match) != bool(read_pattern.search(pristine))):
+                return False
+
+            slot_index = self.outcomes.get(key_name, (None, None))[0]
+            if slot_index is None or self.slots[slot_index].line_index != i:
+                continue
+            start = starts[slot_index]
+            if whole_line:
+                substitution = patterns.substitute_whole_line.search(line)
+                if substitution.start(1) != start or read_match.start(3) != start:
+                    return False
+            else:
+                substitution = patterns.substitute_value.search(line)
+                if (modify_match.start(3) != start or modify_match.end(3) != start + len(texts[slot_index])
+                        or substitution.start() != modify_match.start(2) or substitution.end() != modify_match.end(3)
+                        or read_match.start(3) != start):
+                    return False
+        return True
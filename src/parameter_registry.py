@@ -0,0 +1,129 @@
+"""
+The parameters that the FileModifier knows, i.e. how to find them in the job script. They are defined in the csv
+files in src/archive/: one file per cluster, one for the parameters that are always there and one per TESTCASE.
+The files are read once per process and kept as tuples. A FileModifier only creates the Line2Read object of a
+parameter when the parameter is actually requested.
+"""
+import os
+import csv
+from collections.abc import MutableMapping
+from config.config import TESTCASE, DEFAULT_HELPER_LINE, DEFAULT_HELPER_PARA_NAME, DEFAULT_HELPER_VALUE
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+# the files are read in this order, which is also the order of the parameters
+ARCHIVE_FILES = ["bgc.csv", "levante.csv", "common.csv", f"testcase_{TESTCASE}.csv"]
+ARCHIVE_COLUMNS = ["key_name", "para_name", "line", "helper_line", "helper_para_name", "helper_value",
+                   "pos_of_appearance", "whole_line", "is_float"]
+
+_specs_cache = {}
+
+
+def archive_spec(para_name,
+                 line,
+                 helper_para_name = DEFAULT_HELPER_PARA_NAME,
+                 helper_value = DEFAULT_HELPER_VALUE,
+                 helper_line = DEFAULT_HELPER_LINE,
+                 pos_of_appearance = None,
+                 whole_line = False,
+                 is_float = False,
+                 key_name = None) -> tuple:
+    """
+    Returns the arguments of the Line2Read object of a parameter in the line archive. The arguments are the same
+    as in FileModifier._add_line_to_archive.
+
+    Returns:
+        tuple: line, para_name, helper_para_name, helper_value, helper_line, pos_of_appearance, whole_line,
+        is_float and key_name.
+    """
+    if key_name == None:
+        key_name = para_name
+
+    if helper_line != DEFAULT_HELPER_LINE:
+        if helper_para_name == DEFAULT_HELPER_PARA_NAME and helper_value == DEFAULT_HELPER_VALUE:
+            helper_para_name = None
+            helper_value = None
+
+    return (line, para_name, helper_para_name, helper_value, helper_line, pos_of_appearance,
+            whole_line, is_float, key_name)
+
+
+def _read_archive_file(path):
+    """
+    Reads the specs of the parameters from a csv file with the ARCHIVE_COLUMNS. Empty cells take the default
+    of archive_spec.
+    """
+    specs = {}
+    with open(path, "r", newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            kwargs = {column: value for column, value in row.items() if value != ""}
+            if "pos_of_appearance" in kwargs:
+                kwargs["pos_of_appearance"] = int(kwargs["pos_of_appearance"])
+            for flag in ["whole_line", "is_float"]:
+                if flag in kwargs:
+                    kwargs[flag] = kwargs[flag] == "True"
+            spec = archive_spec(**kwargs)
+            specs[spec[-1]] = spec
+    return specs
+
+
+def load_specs(archive_dir=ARCHIVE_DIR, archive_files=ARCHIVE_FILES) -> dict:
+    """
+    Returns the specs of all parameters of the archive files, key_name -> archive_spec. The files are only read
+    the first time, files that do not exist are skipped.
+
+    Args:
+        archive_dir (str, optional): The folder of the archive files. Defaults to ARCHIVE_DIR.
+        archive_files (list, optional): The names of the archive files. Defaults to ARCHIVE_FILES.
+    """
+    key = (archive_dir, tuple(archive_files))
+    if key not in _specs_cache:
+        specs = {}
+        for file_name in archive_files:
+            path = os.path.join(archive_dir, file_name)
+            if os.path.exists(path):
+                specs.update(_read_archive_file(path))
+        _specs_cache[key] = specs
+    return _specs_cache[key]
+
+
+class ParameterRegistry(MutableMapping):
+    """
+    A dictionary from the key_name to the Line2Read or Line2Modify object of a parameter, which creates the
+    objects of the given key_names only when they are requested. Objects that are set are stored as in a dict.
+    The order of the keys is the order of the given key_names followed by the keys that have been added.
+    """
+    def __init__(self, key_names, make_line):
+        """
+        Args:
+            key_names (iterable): The key_names of the parameters that are created when requested.
+            make_line (callable): Creates the object of a parameter from its key_name.
+        """
+        self._make_line = make_line
+        self._lines = {}
+        self._keys = dict.fromkeys(key_names)
+
+    def __getitem__(self, key_name):
+        try:
+            return self._lines[key_name]
+        except KeyError:
+            if key_name not in self._keys:
+                raise
+        line_obj = self._lines[key_name] = self._make_line(key_name)
+        return line_obj
+
+    def __setitem__(self, key_name, line_obj):
+        self._keys[key_name] = None
+        self._lines[key_name] = line_obj
+
+    def __delitem__(self, key_name):
+        del self._keys[key_name]
+        self._lines.pop(key_name, None)
+
+    def __contains__(self, key_name):
+        return key_name in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
@@ -0,0 +1,335 @@
+"""
+An optional local service that keeps the job script and its compiled template in memory and answers requests over a
+Unix domain socket, so that the command line, Simulation and other scripts do not have to read and parse the job
+script on every call. The service checks before every request if the job script has changed and then only brings
+the template up to date, it is only compiled again if the static text of the script has changed.
+
+Start the service with
+    python parameter_service.py &
+and modify_file_with_service uses it whenever it is running and otherwise modifies the file itself.
+
+Every request and every response is a single line of json. The commands are:
+    ping: the path of the job script and the pid of the service
+    read: reads the parameters
+    modify: modifies the parameters in the job script
+    render: renders the job script with the parameters to another path, the job script is not changed
+    diff: returns the lines that the parameters would change without writing anything
+    validate: validates configurations against the job script (see validate_configs)
+    stop: stops the service
+"""
+import io
+import os
+import json
+import socket
+import tempfile
+import contextlib
+from read_write_automation import FileModifier
+from source_index import SourceIndex
+from job_template import CACHEPATH
+from config.config import SOURCEPATH
+
+SOCKETPATH = os.path.join(CACHEPATH, "parameter_service.sock")
+# the properties of a Line2Read or Line2Modify object that are sent to the service
+SPEC_FIELDS = ("line", "para_name", "value", "helper_line", "helper_para_name", "helper_value",
+               "pos_of_appearance", "whole_line", "is_float", "key_name")
+
+
+def line_spec(line_obj, value=True) -> dict:
+    """Returns the properties of a Line2Read or Line2Modify object that are needed to create it again."""
+    spec = {field: getattr(line_obj, field) for field in SPEC_FIELDS}
+    if not value:
+        spec["value"] = None
+    return spec
+
+
+class ParameterService():
+    """
+    The service that holds the lines of the job script, their index and the compiled template in memory.
+    Requests are handled one after the other, so that two requests never change the job script at the same time.
+    """
+    def __init__(self, filepath=SOURCEPATH, socket_path=SOCKETPATH):
+        """
+        Args:
+            filepath (str, optional): The path to the job script. Defaults to SOURCEPATH.
+            socket_path (str, optional): The path of the socket. Defaults to SOCKETPATH.
+        """
+        self.filepath = os.path.abspath(filepath)
+        self.socket_path = socket_path
+        self.lines = None
+        self._index = None
+        self._stat = None
+        self.reloads = 0
+        self.running = False
+
+    def _refresh(self):
+        """Reads the job script again if it has changed since it was read the last time."""
+        stat = os.stat(self.filepath)
+        stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stat == self._stat:
+            return
+        with open(self.filepath, "r") as file:
+            self.lines = file.readlines()
+        self._index = None
+        self._stat = stat
+        self.reloads += 1
+        # brings the cached template up to date with the new content, it is only compiled again if needed
+        with contextlib.redirect_stdout(io.StringIO()):
+            FileModifier()._get_template(self.filepath, self.lines)
+
+    @property
+    def index(self) -> SourceIndex:
+        """The index of the lines of the job script, created when it is needed."""
+        if self._index is None:
+            self._index = SourceIndex(self.lines)
+        return self._index
+
+    def _modifier(self, request):
+        """Returns a FileModifier with the parameters of the request."""
+        mod = FileModifier(safe=request.get("safe", True), use_template=request.get("use_template", True))
+        mod.lines_to_read = {}
+        mod.lines_to_modify = {}
+        for spec in request.get("lines_to_read", []):
+            mod.add_line(**{**spec, "value": None})
+        for spec in request.get("lines_to_modify", []):
+            mod.add_line(**spec)
+        for key_name, value in request.get("parameters", {}).items():
+            mod.add_para(key_name, value)
+        return mod
+
+    def _process(self, mod, filepath, in_place):
+        """Modifies and reads the parameters like FileModifier.modify_file, but with the lines in memory."""
+        for line_obj in mod.lines_to_read.values():
+            line_obj.found = False
+        for line_obj in mod.lines_to_modify.values():
+            line_obj.found = False
+
+        lines_changed = None
+        if mod.use_template:
+            template = mod._get_template(self.filepath, self.lines)
+            lines_changed = mod._modify_with_template(template, self.lines, filepath, in_place)
+        if lines_changed == None:
+            lines_changed = mod._modify_lines(list(self.lines), filepath, in_place)
+        if in_place and mod.diff:
+            # the job script has been written, it is read again with the next request
+            self._stat = None
+        print(f"\nTotal lines changed: {lines_changed}")
+        return lines_changed
+
+    def _result(self, mod, lines_changed):
+        return {"lines_changed": lines_changed,
+                "diff": {line_number: list(lines) for line_number, lines in mod.diff.items()},
+                "lines_to_modify": {key_name: [line_obj.line_number, line_obj.found]
+                                    for key_name, line_obj in mod.lines_to_modify.items()},
+                "lines_to_read": {key_name: [line_obj.value, line_obj.line_number, line_obj.found]
+                                  for key_name, line_obj in mod.lines_to_read.items()}}
+
+    def handle(self, request) -> dict:
+        """
+        Answers a request. The output that is printed while the request is handled is returned as "output" and
+        "exit" is True if the FileModifier quit, e.g. because a parameter was not found.
+
+        Args:
+            request (dict): The "command" and its arguments.
+
+        Returns:
+            dict: The response.
+        """
+        command = request.get("command")
+        if command == "ping":
+            return {"ok": True, "filepath": self.filepath, "pid": os.getpid(), "reloads": self.reloads}
+        if command == "stop":
+            self.running = False
+            return {"ok": True}
+
+        response = {"ok": True, "exit": False}
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                self._refresh()
+                if command == "validate":
+                    from validate_configs import validate_configs
+                    response["results"] = validate_configs(request.get("paths"), self.filepath,
+                                                           request.get("workers"), self.index)
+                elif command in ["read", "modify"]:
+                    mod = self._modifier(request)
+                    if command == "read":
+                        mod.lines_to_modify = {}
+                    response.update(self._result(mod, self._process(mod, self.filepath, in_place=True)))
+                elif command == "render":
+                    mod = self._modifier(request)
+                    lines_changed = self._process(mod, request["script_path"], in_place=False)
+                    response.update(self._result(mod, lines_changed))
+                elif command == "diff":
+                    mod = self._modifier(request)
+                    mod.lines_to_read = {}
+                    with tempfile.TemporaryDirectory() as directory:
+                        lines_changed = self._process(mod, os.path.join(directory, "diff.csh"), in_place=False)
+                    response.update(self._result(mod, lines_changed))
+                else:
+                    response = {"ok": False, "error": f"Unknown command {command}"}
+        except SystemExit:
+            response["exit"] = True
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        response["output"] = output.getvalue()
+        return response
+
+    def serve(self):
+        """Listens on the socket and answers the requests until the service is stopped."""
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if ParameterClient.connect(self.socket_path) is not None:
+                print(f"A parameter service is already running on {self.socket_path}.")
+                quit()
+            os.remove(self.socket_path)
+
+        self._refresh()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen()
+        self.running = True
+        print(f"The parameter service for {self.filepath} is listening on {self.socket_path}.")
+        try:
+            while self.running:
+                connection, _ = server.accept()
+                # a client that disconnects early must not stop the service
+                try:
+                    with connection, connection.makefile("rwb") as stream:
+                        try:
+                            request = json.loads(stream.readline())
+                        except ValueError:
+                            continue
+                        stream.write(json.dumps(self.handle(request)).encode() + b"\n")
+                except OSError as e:
+                    print(f"Warning: The connection to a client was lost: {e}")
+        finally:
+            server.close()
+            os.remove(self.socket_path)
+
+
+class ParameterClient():
+    """
+    Sends requests to a running ParameterService.
+    """
+    def __init__(self, socket_path=SOCKETPATH):
+        """
+        Args:
+            socket_path (str, optional): The path of the socket of the service. Defaults to SOCKETPATH.
+        """
+        self.socket_path = socket_path
+        self.filepath = None
+
+    @classmethod
+    def connect(cls, socket_path=SOCKETPATH):
+        """Returns a client if a service is running on the socket, else None."""
+        if not os.path.exists(socket_path):
+            return None
+        client = cls(socket_path)
+        try:
+            client.filepath = client.request("ping")["filepath"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return client
+
+    def request(self, command, **arguments) -> dict:
+        """
+        Sends a request to the service and returns the response.
+
+        Args:
+            command (str): The command, see the commands of the module.
+            **arguments: The arguments of the command.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(self.socket_path)
+            with connection.makefile("rwb") as stream:
+                stream.write(json.dumps({"command": command, **arguments}).encode() + b"\n")
+                stream.flush()
+                return json.loads(stream.readline())
+
+    def run(self, command, mod, **arguments):
+        """
+        Sends the parameters of the FileModifier with the command, prints the output of the service and sets
+        the line numbers and values of the response in the FileModifier like FileModifier.modify_file would do it.
+        If the FileModifier in the service quit, the program quits as well.
+
+        Args:
+            command (str): "read", "modify", "render" or "diff".
+            mod (FileModifier): The FileModifier with the parameters.
+            **arguments: The further arguments of the command.
+
+        Returns:
+            int: The number of lines that have been changed or None if the service could not handle the request.
+        """
+        response = self.request(command, safe=mod.safe, use_template=mod.use_template,
+                                lines_to_read=[line_spec(line_obj, value=False) for line_obj in mod.lines_to_read.values()],
+                                lines_to_modify=[line_spec(line_obj) for line_obj in mod.lines_to_modify.values()],
+                                **arguments)
+        print(response.get("output", ""), end="")
+        if not response["ok"]:
+            print(f"Warning: The parameter service could not handle the request: {response['error']}")
+            return None
+        if response["exit"]:
+            quit()
+
+        for key_name, (line_number, found) in response["lines_to_modify"].items():
+            mod.lines_to_modify[key_name].line_number = line_number
+            mod.lines_to_modify[key_name].found = found
+        for key_name, (value, line_number, found) in response["lines_to_read"].items():
+            line_obj = mod.lines_to_read[key_name]
+            line_obj.value, line_obj.line_number, line_obj.found = value, line_number, found
+        mod.diff = {int(line_number): tuple(lines) for line_number, lines in response["diff"].items()}
+        return response["lines_changed"]
+
+
+def modify_file_with_service(mod, filepath=SOURCEPATH, socket_path=SOCKETPATH):
+    """
+    Modifies the file with the parameters of the FileModifier by the parameter service if it is running for this
+    file, otherwise with FileModifier.modify_file.
+
+    Args:
+        mod (FileModifier): The FileModifier with the parameters.
+        filepath (str, optional): The path to the file. Defaults to SOURCEPATH.
+        socket_path (str, optional): The path of the socket of the service. Defaults to SOCKETPATH.
+
+    Returns:
+        int: The number of lines that have been changed.
+    """
+    client = ParameterClient.connect(socket_path)
+    lines_changed = None
+    if client is not None and client.filepath == os.path.abspath(filepath):
+        try:
+            lines_changed = client.run("modify", mod)
+        except (OSError, ValueError) as e:
+            print(f"Warning: The parameter service could not be reached: {e}")
+    if lines_changed == None:
+        lines_changed = mod.modify_file(filepath)
+    return lines_changed
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-f", "--file", default=SOURCEPATH, help="Set the job script the service holds.")
+    parser.add_argument("-s", "--socket", default=SOCKETPATH, help="Set the path of the socket.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--status", default=False, action="store_true", help="Print if a service is running.")
+    group.add_argument("--stop", default=False, action="store_true", help="Stop the running service.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = flag_parser()
+    if args.status or args.stop:
+        client = ParameterClient.connect(args.socket)
+        if client is None:
+            print(f"No parameter service is running on {args.socket}.")
+            quit()
+        if args.stop:
+            client.request("stop")
+            print(f"The parameter service for {client.filepath} has been stopped.")
+        else:
+            print(client.request("ping"))
+    else:
+        ParameterService(args.file, args.socket).serve()
@@ -4,15 +4,75 @@ It also saves the configs of a run in a log file and reload configs of previous
 With the help of cluster_handling one can also start a test series that restarts the simulation when needed.
 """
 import re
+import os
 import csv
+from run_log import RunLog
+from run_catalog import RunCatalog, CATALOGPATH
+from parameter_registry import ParameterRegistry, archive_spec, load_specs
+from source_index import SourceIndex
+from job_template import JobTemplate, archive_hash, content_hash, template_path
 from config.config import SOURCEPATH, OUTPATH, LOGPATH, ARCHIVEPATH, \
                         TESTCASE, CONFIGPATH, CLUSTER, DEFAULT_HELPER_LINE, \
                         DEFAULT_HELPER_PARA_NAME, DEFAULT_HELPER_VALUE
 
-class Line2Read:
+class LinePatterns:
+    """
+    The compiled regex patterns that are used to find, read and modify the line of a parameter.
+    They only depend on the line beginning and the parameter name, so the patterns are built once
+    and shared by all Line2Read and Line2Modify objects with the same line and para_name.
+    """
+    _cache = {}
+
+    def __init__(self, line, para_name):
+        """
+        The constructor of the LinePatterns class. Use LinePatterns.of to get the shared patterns.
+
+        Args:
+            line (str): The beginning of the line that the parameter is in. Spaces can be omitted.
+            para_name (str): The name of the parameter.
+        """
+        para_name = re.escape(para_name)
+        self.line_begin = re.compile(fr"\s*{re.escape(line)}")
+        self.modify_value = re.compile(fr"(^|[ ,\()])({para_name}\s*[=/ ]\s*)([^ /,\)\n]+)")
+        self.read_value = re.compile(fr"(^|[ ,\()]){para_name}\s*(=|/| )\s*([^ /,\)]+)")
+        self.read_whole_line = re.compile(fr"(^|[ ,\()])({para_name})(.*)")
+        self.substitute_value = re.compile(fr"{para_name}\s*[=/ ]\s*[^ /,\)\n]+")
+        self.substitute_whole_line = re.compile(fr"{para_name}(.*)")
+
+    @classmethod
+    def of(cls, line, para_name):
+        """
+        Returns the patterns for the given line and para_name and builds them only the first time.
+        """
+        key = (line, para_name)
+        if key not in cls._cache:
+            cls._cache[key] = cls(line, para_name)
+        return cls._cache[key]
+
+class LineRecord:
+    """
+    The base class of Line2Read and Line2Modify. The attributes are stored in slots instead of a dictionary
+    per object. FIELDS is the order of the attributes and EXPORT_FIELDS are the columns of the parameters.csv.
+    """
+    FIELDS = ("line", "line_number", "para_name", "value", "helper_line", "helper_para_name", "helper_value",
+              "pos_of_appearance", "pos_counter", "found", "whole_line", "is_float", "key_name", "patterns")
+    EXPORT_FIELDS = tuple(field for field in FIELDS if field not in ("pos_counter", "found", "patterns"))
+    __slots__ = FIELDS
+
+    def properties(self) -> dict:
+        """Returns the attributes of the object as a dictionary in the order of FIELDS."""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def export_row(self) -> list:
+        """Returns the values of the EXPORT_FIELDS."""
+        return [getattr(self, field) for field in self.EXPORT_FIELDS]
+
+class Line2Read(LineRecord):
     """
     An object that stores the information of a line that is supposed to be read from a file.
     """    
+    __slots__ = ()
+
     def __init__(self,
                  line,
                  para_name,
@@ -22,7 +82,8 @@ class Line2Read:
                  pos_of_appearance: int,
                  whole_line: bool,
                  is_float: bool,
-                 key_name: str
+                 key_name: str,
+                 patterns: LinePatterns = None
     ):
         """
         The constructor of the Line2Read class.
@@ -37,6 +98,8 @@ class Line2Read:
             line is located in the right section of the code.
             pos_of_appearance (int): If the given description is not unique, the pos_of_appearance can be used to
             specify which appearance of the parameter is meant.
+            patterns (LinePatterns, optional): The compiled patterns of the line. Defaults to None, in which case
+            the shared patterns for line and para_name are used.
         """        
         self.line = line
         self.line_number = None
@@ -46,16 +109,19 @@ class Line2Read:
         self.helper_para_name = helper_para_name
         self.helper_value = helper_value
         self.pos_of_appearance = pos_of_appearance #the position of the right list of matched parameter lines
-        self.pos_counter = pos_of_appearance #will be changed during the search
+        self.pos_counter = pos_of_appearance #the search keeps its own counter, see check_for_right_section
         self.found = False
         self.whole_line = whole_line
         self.is_float = is_float
         self.key_name = key_name
+        self.patterns = patterns if patterns is not None else LinePatterns.of(line, para_name)
 
-class Line2Modify:
+class Line2Modify(LineRecord):
     """
     An object that stores the information of a line that is supposed to be modified in a file.
     """    
+    __slots__ = ()
+
     def __init__(self,
                  line,
                  para_name,
@@ -66,7 +132,8 @@ class Line2Modify:
                  pos_of_appearance: int,
                  whole_line: bool,
                  is_float: bool,
-                 key_name: str
+                 key_name: str,
+                 patterns: LinePatterns = None
     ):
         """
         The constructor of the Line2Modify class.
@@ -85,6 +152,8 @@ class Line2Modify:
             whole_line (bool): If the whole line is the value of the parameter.
             is_float (bool): If the value of the parameter is a float.
             key_name (str): The name of the key in the dictionary and the unique identifier of the parameter.
+            patterns (LinePatterns, optional): The compiled patterns of the line. Defaults to None, in which case
+            the shared patterns for line and para_name are used.
         """        
         self.line = line
         self.line_number = None
@@ -99,10 +168,43 @@ class Line2Modify:
         self.whole_line = whole_line
         self.is_float = is_float
         self.key_name = key_name
+        self.patterns = patterns if patterns is not None else LinePatterns.of(line, para_name)
         
         if self.is_float and "." not in self.value and "e" not in self.value:
             self.value = self.value + "."
 
+class ImportResult():
+    """
+    The outcome of FileModifier.import_parameters: the parameters that have been imported and the rows of the
+    csv file that could not be imported.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The path to the csv file.
+        """
+        self.path = path
+        self.imported = {} # key_name -> value
+        self.unknown_keys = [] # key_names that are not in the line archive
+        self.missing_values = [] # key_names without a value
+        self.errors = [] # rows or headers that could not be read
+
+    @property
+    def ok(self) -> bool:
+        """True if every row of the csv file has been imported."""
+        return not (self.unknown_keys or self.missing_values or self.errors)
+
+    def summary(self) -> str:
+        """Returns a one line summary of the import."""
+        summary = f"Imported {len(self.imported)} parameters from {self.path}"
+        if self.unknown_keys:
+            summary += f", not in the archive: {', '.join(self.unknown_keys)}"
+        if self.missing_values:
+            summary += f", without value: {', '.join(self.missing_values)}"
+        if self.errors:
+            summary += f", errors: {' '.join(self.errors)}"
+        return summary
+
 class FileModifier():
     """
     A class that is used to read and modify a file. It has two dictionaries "lines_to_read" and "lines_to_modify"
@@ -112,28 +214,30 @@ class FileModifier():
     The class has a method "import_parameters" that imports the parameters that should be read and modified from a csv file.
     The class has a method "write_log" that writes the parameters that have been read and modified to a log file.
     """    
-    def __init__(self, safe=True):
+    # the compiled templates of the files, shared by all FileModifier objects
+    _templates = {}
+
+    def __init__(self, safe=True, use_template=True):
         """Initializes the FileModifier object with the dictionaries "lines_to_read", "lines_to_modify" and "line_archive".
 
         Args:
             safe (bool, optional): If safe is True, the program stops if a parameter found twice. Defaults to True.
+            use_template (bool, optional): If modify_file uses the compiled template of the file. Defaults to True.
         """        
         self.lines_to_read = {}
         self.lines_to_modify = {}
         self.line_archive = {}
         self.safe = safe
+        self.use_template = use_template
+        # the lines changed by the last call of modify_file: line number -> (old line, new line)
+        self.diff = {}
+        # the template of the file that was modified or rendered the last time, see run_hash
+        self._template = None
         self._add_all_parameters_to_archive()
         self.import_all_para_from_archive()
     
     def _properties_of_line(self, line):
-        # Using a loop
-        properties = {}
-        for key, value in vars(line).items():
-            properties[key] = value
-
-        # Using a dictionary comprehension (more concise)
-        properties = {key: value for key, value in vars(line).items()}
-        return properties
+        return line.properties()
     
     def _add_line_to_archive(self,
                              para_name,
@@ -166,16 +270,9 @@ class FileModifier():
             Defaults to None, but is set to para_name if not specified.
         """            
         
-        if key_name == None:
-            key_name = para_name
-        
-        if helper_line != DEFAULT_HELPER_LINE:
-            if helper_para_name == DEFAULT_HELPER_PARA_NAME and helper_value == DEFAULT_HELPER_VALUE:
-                helper_para_name = None
-                helper_value = None
-        
-        self.line_archive[key_name] = Line2Read(line, para_name, helper_para_name, helper_value, 
-                                                 helper_line, pos_of_appearance, whole_line, is_float, key_name)
+        self.line_archive[key_name] = Line2Read(*archive_spec(para_name, line, helper_para_name, helper_value,
+                                                              helper_line, pos_of_appearance, whole_line,
+                                                              is_float, key_name))
    
     def add_para(self, key_name, value = None):
         """
@@ -208,6 +305,7 @@ class FileModifier():
                  pos_of_appearance = None,
                  whole_line = False,
                  is_float = False,
+                 patterns = None,
                  **kwarg
     ):
         """Add a new Line2Modify object to the dictionary "lines_to_modify" or
@@ -228,57 +326,111 @@ class FileModifier():
             specify which appearance of the parameter is meant. Defaults to None.
             whole_line (bool, optional): If the whole line is the value of the parameter. Defaults to False.
             is_float (bool, optional): If the value of the parameter is a float. Defaults to False.
+            patterns (LinePatterns, optional): The compiled patterns of the line, e.g. from the line_archive.
+            Defaults to None.
         """    
         if value == None:
             self.lines_to_read[key_name] = Line2Read(line, para_name, helper_para_name,
                                                         helper_value, helper_line, pos_of_appearance,
-                                                        whole_line, is_float, key_name)
+                                                        whole_line, is_float, key_name, patterns)
         else:
             self.lines_to_modify[key_name] = Line2Modify(line, para_name, str(value), helper_para_name,
                                                            helper_value, helper_line, pos_of_appearance,
-                                                           whole_line, is_float, key_name)
+                                                           whole_line, is_float, key_name, patterns)
             
     
-    def check_for_right_section(self, line_obj, lines, i) -> bool:
+    def check_for_right_section(self, line_obj, index, i, pos_counter):
         """
-        This function searches for the first instance of the line_obj.helper_line before the line lines[i]
-        and returns True if in this line the line_obj.helper_para_name is equal to the line_obj.helper_value.
+        This function checks with the section map of the index if the line i is located after the 
+        line_obj.helper_line and if in this helper line the line_obj.helper_para_name is equal to the
+        line_obj.helper_value. If line_obj.pos_of_appearance is given, the line is only in the right section
+        if it is the pos_of_appearance-th appearance of the parameter in this kind of section.
+        The function does not change line_obj, the remaining appearances are passed in and returned.
 
         Args:
             line_obj (Line2Modify or Line2Read): The object that is checked.
-            lines (list): The list of lines of the file.
+            index (SourceIndex): The index of the lines of the file.
             i (int): The index of the line that is checked.
+            pos_counter (int): The number of appearances that are still missing until the right one is reached.
+            None if pos_of_appearance is not given.
         Returns:
-            bool: True if the helper line is found and either the helper_para_name is equal to the helper_value or
-            they are not given.
+            tuple: True if the line is in the right section and the pos_counter for the next line.
         """        
-        for j in range(i, i-30, -1):
-        # check if line_obj.helper_line is part of the current line
-            if not re.search(line_obj.helper_line, lines[j]):
+        sections = index.sections_before(i, line_obj.helper_line, line_obj.helper_para_name, line_obj.helper_value)
+        if pos_counter == None:
+            return sections > 0, None
+        if 0 < pos_counter <= sections:
+            return True, 0
+        return False, pos_counter - sections
+
+    def _find_lines(self, line_obj, index, read=False):
+        """
+        Yields the index and the match of every line of the file that fits the search criteria of line_obj:
+        the line starts with line_obj.line, contains the parameter and is in the right section.
+
+        Args:
+            line_obj (Line2Modify or Line2Read): The object that is searched for.
+            index (SourceIndex): The index of the lines of the file.
+            read (bool, optional): If the value is read, else the match is the one used to modify it. Defaults to False.
+        """
+        pos_counter = line_obj.pos_of_appearance
+        patterns = line_obj.patterns
+        if not read:
+            value_pattern = patterns.modify_value
+        # if the parameter has the whole line attribute, the whole line after the parameter name
+        # is counted as the parameter value
+        elif line_obj.whole_line:
+            value_pattern = patterns.read_whole_line
+        else:
+            value_pattern = patterns.read_value
+
+        # only the lines that start with line_obj.line are candidates
+        for i in list(index.lines_starting_with(line_obj.line, patterns.line_begin)):
+            # get the value of the parameter if it is found, else match is None
+            match = value_pattern.search(index.lines[i])
+            if not match:
                 continue
             
-            # check if either the helper_para_name and helper_value are given
-            if line_obj.helper_para_name or line_obj.helper_value:
-                match = re.search(fr"{line_obj.helper_para_name}\s*==\s*{line_obj.helper_value}", lines[j])
-                if match:
-                    if line_obj.pos_counter != None:
-                        line_obj.pos_counter -= 1
-                    if line_obj.pos_counter == 0 or line_obj.pos_counter == None:
-                        return True
-                else:
-                    return False
-            #if no helper values are given, the function returns True if the helper line is found
-            else: 
-                if line_obj.pos_counter != None:
-                        line_obj.pos_counter -= 1    
-                if line_obj.pos_counter == 0 or line_obj.pos_counter == None:
-                        return True
-        return False
+            # checks if the 'right' paramter after the helper line is found
+            in_section, pos_counter = self.check_for_right_section(line_obj, index, i, pos_counter)
+            if in_section:
+                yield i, match
+
+    def _print_modified(self, key_name, line_obj, changed):
+        if changed:
+            print(f"{'Modified':>18}| {line_obj.line_number:>6} | -> {key_name:<17} = {line_obj.value:>15} | {line_obj.para_name:<5}")
+        else:
+            print(f"{'Already Set':>18}| {line_obj.line_number:>6} | -> {key_name:<17} = {line_obj.value:>15} | {line_obj.para_name:<5}")
+
+    def _print_read(self, key_name, line_obj):
+        print(f"{'Read':>18} | {line_obj.line_number:>6} | -> {key_name:<17} = {line_obj.value:>15} | {line_obj.para_name:<5}")
+
+    def _quit_found_twice(self, key_name, line_obj, line_number, read=False):
+        """Warns and quits if the parameter is found multiple times."""
+        if read:
+            print(f"Warning: Parameter {key_name}/{line_obj.para_name} found multiple times fitting the search criteria in in {SOURCEPATH}"
+                  f"{' '*28}in line {line_obj.line_number} and {line_number}.")
+        else:
+            print(f"Warning: The parameter {key_name}/{line_obj.para_name} was found multiple times fitting the search criteria in in {SOURCEPATH}"
+                  f"{' '*28}in line {line_obj.line_number} and {line_number}.")
+        quit()
+
+    def _warn_not_found(self, key_name, line_obj, read=False):
+        """Warns if the parameter is not found and quits if it was supposed to be modified."""
+        if read:
+            print(f"Warning:  Parameter {key_name}/{line_obj.para_name} not found in {SOURCEPATH} with the search pattern {line_obj.helper_line},"
+                  f"{' '*20}{line_obj.helper_para_name} = {line_obj.helper_value} and pos_of_appearance = {line_obj.pos_of_appearance}.")
+        else:
+            print(f"Warning: The parameter {key_name}/{line_obj.para_name} not found in {SOURCEPATH} with the search pattern {line_obj.helper_line},"
+                  f"{' '*24}{line_obj.helper_para_name} = {line_obj.helper_value} and thus not written to the file.")
+            quit()
 
     def modify_file(self, filepath=SOURCEPATH):
         """
         Opens the file and reads the lines. Then it processes the lines to modify and the lines to read.
-        The lines to modify are modified and the lines to read are read. The changes are written back to the file.
+        The lines to modify are modified and the lines to read are read. If lines have changed, the file is replaced
+        atomically by the modified one and the changed lines are stored in self.diff. If self.use_template is True, the compiled template of the file is used whenever it gives the same result
+        as searching the file.
 
         Args:
             filepath (str, optional): The path to the file that should be modified. Defaults to SOURCEPATH.
@@ -290,98 +442,167 @@ class FileModifier():
             line_obj.found = False
         for line_obj in self.lines_to_modify.values():
             line_obj.found = False
-        lines_changed = 0
 
         # Read the file and store lines
         with open(filepath, "r") as file:
             lines = file.readlines()
 
+        lines_changed = None
+        if self.use_template:
+            template = self._get_template(filepath, lines)
+            lines_changed = self._modify_with_template(template, lines, filepath)
+        if lines_changed == None:
+            lines_changed = self._modify_lines(lines, filepath)
+
+        print(f"\nTotal lines changed: {lines_changed}")
+        return lines_changed
+
+    def _get_template(self, filepath, lines):
+        """
+        Returns the compiled template of the file. The template is kept in memory and cached on the local disk.
+        It is compiled again if the file does not fit the template anymore.
+        """
+        key = os.path.abspath(filepath)
+        current_archive_hash = archive_hash(self.line_archive)
+        template = FileModifier._templates.get(key)
+        if template is None or template.archive_hash != current_archive_hash:
+            template = JobTemplate.load(template_path(filepath), self.line_archive)
+
+        if template is None or not template.sync("".join(lines)):
+            template = JobTemplate.compile(lines, self.line_archive, self._find_lines)
+            try:
+                template.save(template_path(filepath))
+            except OSError:
+                print(f"Warning: Could not cache the template of {filepath}.")
+        FileModifier._templates[key] = template
+        self._template = template
+        return template
+
+    def _modify_with_template(self, template, lines, filepath, in_place=True):
+        """
+        Modifies and reads the parameters with the compiled template of the file.
+
+        Args:
+            template (JobTemplate): The template of the file.
+            lines (list): The lines of the file.
+            filepath (str): The path the modified file is written to.
+            in_place (bool, optional): If filepath is the file of the template itself. Then the template is updated
+            and the file is only written if lines have changed. Defaults to True.
+
+        Returns:
+            int: The number of lines that have been changed or None if the template can not be used
+            for the parameters, in which case nothing has been done.
+        """
+        lines_to_read = {key_name: line_obj for key_name, line_obj in self.lines_to_read.items()
+                         if key_name not in self.lines_to_modify}
+        for key_name, line_obj in {**self.lines_to_modify, **lines_to_read}.items():
+            if not template.can_render(key_name, line_obj):
+                return None
+        rendered = template.render([(key_name, line_obj.value) for key_name, line_obj in self.lines_to_modify.items()])
+        if rendered == None:
+            return None
+        texts, changes = rendered
+
+        lines_changed = 0
+        for (key_name, line_obj), changed in zip(self.lines_to_modify.items(), changes):
+            if changed == None:
+                self._warn_not_found(key_name, line_obj)
+            line_obj.line_number = template.line_number(key_name)
+            lines_changed += changed
+            self._print_modified(key_name, line_obj, changed)
+            line_obj.found = True
+            if self.safe and template.duplicate_line_number(key_name) != None:
+                self._quit_found_twice(key_name, line_obj, template.duplicate_line_number(key_name))
+
+        text = template.render_text(texts)
+        new_lines = text.splitlines(keepends=True)
+        changed_line_numbers = {template.line_number(key_name) for key_name, changed
+                                in zip(self.lines_to_modify, changes) if changed}
+        self.diff = {line_number: (lines[line_number - 1], new_lines[line_number - 1])
+                     for line_number in sorted(changed_line_numbers)}
+        if self.diff or not in_place:
+            self._write_file(filepath, text)
+        if in_place:
+            template.texts = texts
+            template.content_hash = content_hash(text)
+
+        for key_name, line_obj in lines_to_read.items():
+            line_obj.line_number = template.line_number(key_name)
+            if line_obj.line_number == None:
+                self._warn_not_found(key_name, line_obj, read=True)
+                continue
+            line_obj.value = template.read_value(key_name, texts)
+            self._print_read(key_name, line_obj)
+            line_obj.found = True
+            if self.safe and template.duplicate_line_number(key_name) != None:
+                self._quit_found_twice(key_name, line_obj, template.duplicate_line_number(key_name), read=True)
+        return lines_changed
+
+    def _modify_lines(self, lines, filepath, in_place=True):
+        """
+        Modifies and reads the parameters by searching the lines of the file.
+
+        Args:
+            lines (list): The lines of the file, which are modified in place.
+            filepath (str): The path the modified file is written to.
+            in_place (bool, optional): If filepath is the file the lines were read from. Then the file is only
+            written if lines have changed. Defaults to True.
+
+        Returns:
+            int: The number of lines that have been changed.
+        """
+        lines_changed = 0
+        original_lines = {}
+        # tokenize the file once, the candidate lines of every parameter are looked up in the index
+        index = SourceIndex(lines)
+
         # Process Lines to Modify and write changes (Modified)
     
         for key_name, line_obj in self.lines_to_modify.items():
-            line_obj.pos_counter = line_obj.pos_of_appearance  
-            # escape the line_obj.line and the para name to be used in the regex
-            line_begin = re.escape(line_obj.line)
-            para_name = re.escape(line_obj.para_name)  
-            for i, line in enumerate(lines):
-                # check if the line start with the line_begin
-                if not re.match(fr"\s*{line_begin}", line):
-                    continue
-                
-                # get the value of the parameter if it is found, else match is None
-                match = re.search(fr"(^|[ ,\()])({para_name}\s*[=/ ]\s*)([^ /,\)\n]+)", line)  # Modified regex
-                
-                # checks if the parameter is found and if the 'right' paramter after the helper line is found
-                if not (match and self.check_for_right_section(line_obj, lines, i)):
-                    continue
+            patterns = line_obj.patterns
+            for i, match in self._find_lines(line_obj, index):
+                line = lines[i]
                 
                 #warn and quit if the parameter is found multiple times
                 if line_obj.found == True:
-                    print(f"Warning: The parameter {key_name}/{line_obj.para_name} was found multiple times fitting the search criteria in in {SOURCEPATH}\
-                            in line {line_obj.line_number} and {i + 1}.")
-                    quit()
+                    self._quit_found_twice(key_name, line_obj, i + 1)
                 
                 value_with_operator = match.group(2)
-                old_line = lines[i]
                 if line_obj.whole_line:
-                    lines[i] = re.sub(fr"{para_name}(.*)", f"{line_obj.para_name}{line_obj.value}", line, count=1)
+                    new_line = patterns.substitute_whole_line.sub(f"{line_obj.para_name}{line_obj.value}", line, count=1)
                 else:
-                    lines[i] = re.sub(fr"{para_name}\s*[=/ ]\s*[^ /,\)\n]+", f"{value_with_operator}{line_obj.value}", line, count=1) 
+                    new_line = patterns.substitute_value.sub(f"{value_with_operator}{line_obj.value}", line, count=1) 
                     
                 line_obj.line_number = i + 1
                 
-                if lines[i] != old_line:
+                if new_line != line:
+                    original_lines.setdefault(i + 1, line)
+                    # writes the new line to lines and keeps the index up to date
+                    index.update_line(i, new_line)
                     lines_changed += 1
-                    print(f"{'Modified':>18}| {line_obj.line_number:>6} | -> {key_name:<17} = {line_obj.value:>15} | {line_obj.para_name:<5}")# | {lines[i]}")
-                else:
-                    print(f"{'Already Set':>18}| {line_obj.line_number:>6} | -> {key_name:<17} = {line_obj.value:>15} | {line_obj.para_name:<5}")# | {lines[i]}")
+                self._print_modified(key_name, line_obj, new_line != line)
                 
                 line_obj.found = True
                 if self.safe == False: break
             if line_obj.found == False:
-                print(f"Warning: The parameter {key_name}/{line_obj.para_name} not found in {SOURCEPATH} with the search pattern {line_obj.helper_line},\
-                        {line_obj.helper_para_name} = {line_obj.helper_value} and thus not written to the file.")
-                quit()
+                self._warn_not_found(key_name, line_obj)
 
-        with open(filepath, "w") as file:    
-            file.writelines(lines)
+        self.diff = {line_number: (line, lines[line_number - 1])
+                     for line_number, line in sorted(original_lines.items()) if line != lines[line_number - 1]}
+        if self.diff or not in_place:
+            self._write_file(filepath, "".join(lines))
 
          # Process Lines to Read
        
         for key_name, line_obj in self.lines_to_read.items():
-            line_obj.pos_counter = line_obj.pos_of_appearance
-            
             # check if the parameter is not already in the lines_to_modify dictionary
             if key_name in self.lines_to_modify:
                 continue
             
-            # escape the line_obj.line and the para name to be used in the regex
-            line_begin = re.escape(line_obj.line)
-            para_name = re.escape(line_obj.para_name)  
-            
-            # go through all lines in the file
-            for i, line in enumerate(lines):
-                # check if the line start with the line_begin
-                if not re.match(fr"\s*{line_begin}", line):
-                    continue
-            
-                # if the parameter has the whole line attribute, the whole line after the parameter name
-                # is counted as the parameter value
-                if line_obj.whole_line:
-                    match = re.search(fr"(^|[ ,\()])({para_name})(.*)", line)
-                # get the value of the parameter if it is found, else match is None
-                else:
-                    match = re.search(fr"(^|[ ,\()]){para_name}\s*(=|/| )\s*([^ /,\)]+)", line)  # Modified regex
-                # checks if the parameter is found and if the 'right' paramter afte the helper line is found 
-                
-                if not (match and self.check_for_right_section(line_obj, lines, i)):
-                    continue
-                
+            for i, match in self._find_lines(line_obj, index, read=True):
                 #warn and quit if the parameter is found multiple times
                 if line_obj.found == True:
-                    print(f"Warning: Parameter {key_name}/{line_obj.para_name} found multiple times fitting the search criteria in in {SOURCEPATH}\
-                            in line {line_obj.line_number} and {i + 1}.")
-                    quit()
+                    self._quit_found_twice(key_name, line_obj, i + 1, read=True)
 
                 if line_obj.whole_line:
                     line_obj.value = str(match.group(3))
@@ -390,24 +611,108 @@ class FileModifier():
                 
                 line_obj.line_number = i + 1
                 
-                print(f"{'Read':>18} | {line_obj.line_number:>6} | -> {key_name:<17} = {line_obj.value:>15} | {line_obj.para_name:<5}")# | {line}")
+                self._print_read(key_name, line_obj)
                 line_obj.found = True
                 
                 #break if the parameter is found: does not find duplicates, but runs faster
                 if self.safe == False: break
                         
             if (line_obj.found == False):
-                print(f"Warning:  Parameter {key_name}/{line_obj.para_name} not found in {SOURCEPATH} with the search pattern {line_obj.helper_line},\
-                    {line_obj.helper_para_name} = {line_obj.helper_value} and pos_of_appearance = {line_obj.pos_of_appearance}.")
+                self._warn_not_found(key_name, line_obj, read=True)
 
-        print(f"\nTotal lines changed: {lines_changed}")
         return lines_changed
     
+    def _write_file(self, filepath, text):
+        """
+        Writes the text to a temporary file next to filepath and renames it to filepath, so that the file is either
+        the old or the new one, even if the program is interrupted. The permissions of an existing file are kept.
+
+        Args:
+            filepath (str): The path to the file.
+            text (str): The new content of the file.
+        """
+        import shutil
+        import tempfile
+        directory, name = os.path.split(os.path.abspath(filepath))
+        with tempfile.NamedTemporaryFile("w", dir=directory, prefix=f".{name}.", suffix=".tmp", delete=False) as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            if os.path.exists(filepath):
+                shutil.copymode(filepath, file.name)
+            os.replace(file.name, filepath)
+        except OSError:
+            os.remove(file.name)
+            raise
+
+    def render_runs(self, runs, outpath=OUTPATH, filepath=SOURCEPATH):
+        """
+        Renders one job script for every run into the folder of the run instead of modifying the file itself.
+        The file is read once and every run is rendered from the same content, so the file stays untouched
+        and the scripts of a whole series can be submitted at once. While a run is yielded, its parameters are
+        set in lines_to_modify, so that they can be exported and logged. Afterwards they are reset.
+        As in export_parameters, the folder of a restart run is the folder of the original run. The script gets the
+        prefix of the restart in lower case, e.g. "restart2_" for RESTART2_<run>, so that restarts of the same
+        run that are submitted at once, e.g. a chain of restarts, do not overwrite each other's script.
+
+        Args:
+            runs (dict or iterable): The name of every run and a dictionary with the key_names and values of its
+            parameters, which are set on top of the parameters that have already been added. Instead of a
+            dictionary the (name, parameters) pairs can be given one after the other, e.g. by Sweep.runs.
+            outpath (str, optional): The path where the folders of the runs are created. Defaults to OUTPATH.
+            filepath (str, optional): The path to the file that the scripts are rendered from. Defaults to SOURCEPATH.
+
+        Yields:
+            tuple: The name of the run and the path to its job script.
+        """
+        import shutil
+        # Read the file once for all runs
+        with open(filepath, "r") as file:
+            lines = file.readlines()
+        template = self._get_template(filepath, lines) if self.use_template else None
+
+        lines_to_modify = self.lines_to_modify
+        for run_name, parameters in (runs.items() if isinstance(runs, dict) else runs):
+            self.lines_to_modify = dict(lines_to_modify)
+            try:
+                for key_name, value in parameters.items():
+                    self.add_para(key_name, value)
+                for line_obj in self.lines_to_read.values():
+                    line_obj.found = False
+                for line_obj in self.lines_to_modify.values():
+                    line_obj.found = False
+
+                if "RESTART" in run_name:
+                    run_path = outpath + re.sub(fr"RESTAR[^_]+_", "", run_name) + "/"
+                    prefix = re.search(fr"RESTAR[^_]+_", run_name).group().lower()
+                    script_path = run_path + prefix + os.path.basename(filepath)
+                else:
+                    run_path = outpath + run_name + "/"
+                    script_path = run_path + os.path.basename(filepath)
+                os.makedirs(run_path, exist_ok=True)
+
+                print("-"*100)
+                print(f"Rendering the job script of {run_name} to {script_path}")
+                lines_changed = None
+                if template is not None:
+                    lines_changed = self._modify_with_template(template, lines, script_path, in_place=False)
+                if lines_changed == None:
+                    lines_changed = self._modify_lines(list(lines), script_path, in_place=False)
+                # the script has to be executable like the file it is rendered from
+                shutil.copymode(filepath, script_path)
+                print(f"\nTotal lines changed: {lines_changed}")
+
+                yield run_name, script_path
+            finally:
+                self.lines_to_modify = lines_to_modify
+
     def export_parameters(self, name_of_run = "", outpath=OUTPATH, file_name="parameters"):
         """
         Exports the parameters that have been read and modified to a "parameters.csv" file. The format is as follows:
         The first block contains the changed parameters and the second block contains the read parameters.
         The columns are "line_number", "line", "para_name", "value", "helper_para_name", "helper_value", "helper_line".
+        The run_hash is saved next to the csv file in a file with the same name and the ending ".hash".
 
         Args:
             name_of_run (str, optional): The name of the run that is used in the outpath. If the name contains "RESTART",
@@ -427,9 +732,7 @@ class FileModifier():
         else:
             outpath = outpath + name_of_run + "/" + file_name + ".csv"
         
-        properties = self._properties_of_line(Line2Modify("", "", "", "", "", "", "", "","",""))
-        del properties["pos_counter"]
-        del properties["found"]
+        properties = LineRecord.EXPORT_FIELDS
 
         #check if there is already a file with the same name
         if os.path.exists(outpath):
@@ -445,10 +748,7 @@ class FileModifier():
             writer.writerow(["Changed parameters"])
             writer.writerow(properties)
             for line_obj in self.lines_to_modify.values():
-                line_obj_properties = self._properties_of_line(line_obj)
-                del line_obj_properties["pos_counter"]
-                del line_obj_properties["found"]
-                writer.writerow(line_obj_properties.values())
+                writer.writerow(line_obj.export_row())
 
             writer.writerow([])
             writer.writerow(["Read parameters"])
@@ -456,19 +756,26 @@ class FileModifier():
             for line_obj in self.lines_to_read.values():
                 if line_obj.value == None:
                     continue
-                line_obj_properties = self._properties_of_line(line_obj)
-                del line_obj_properties["pos_counter"]
-                del line_obj_properties["found"]
-                writer.writerow(line_obj_properties.values())
+                writer.writerow(line_obj.export_row())
+
+        # the hash of the run next to the csv file, so that identical runs can be found without the log
+        with open(re.sub(r"\.csv$", ".hash", outpath), "w") as hashfile:
+            hashfile.write(self.run_hash() + "\n")
 
-    def import_parameters(self, inpath="/"):
+    def import_parameters(self, inpath="/", quiet=False):
         """
-        Imports the parameters that should be read and modified from a csv file. The format is the same as in the
-        export_parameters method. The method reads the csv file and creates a new Line2Read or Line2Modify object for each
-        row in the csv file. The object is then added to the dictionary "lines_to_read" or "lines_to_modify".
+        Imports the parameters that should be modified from a csv file. The format is the same as in the
+        export_parameters method. The whole csv file is read at once, a new Line2Modify object is created for each
+        row with a value and all of them are added to the dictionary "lines_to_modify" in a single update.
+        Rows that can not be imported do not stop the program, they are collected in the returned ImportResult.
 
         Args:
-            inpath (str, optional): The path to the csv file. Defaults to "/".
+            inpath (str, optional): The path to the csv file or the run folder with the parameters.csv file.
+            Defaults to "/".
+            quiet (bool, optional): If True, the imported parameters and the warnings are not printed. Defaults to False.
+
+        Returns:
+            ImportResult: The imported parameters and the rows that could not be imported.
         """        
         #check if the inpath end with .csv
 
@@ -476,315 +783,151 @@ class FileModifier():
             full_file_path = inpath + "/parameters.csv"
         else:
             full_file_path = inpath
+        result = ImportResult(full_file_path)
         with open(full_file_path, "r") as csvfile:
-            reader = csv.reader(csvfile)
-            # Skip the first row
-            _ = next(reader)  
-            # Read the second row as header
-            header = next(reader)
-            
-            # get the column indices of the parameters "key_name" and "value"
-            try:
-                key_name_index = header.index("key_name")
-            except:
+            rows = list(csv.reader(csvfile))
+
+        # the first row is the title, the second row is the header
+        header = rows[1] if len(rows) > 1 else []
+        # get the column indices of the parameters "key_name" and "value"
+        if "key_name" in header:
+            key_name_index = header.index("key_name")
+        elif "para_name" in header:
+            if not quiet:
                 print("No key_name column found in the csv file. Using para_name insted")
-                key_name_index = header.index("para_name")
-                
-            value_index = header.index("value")
-            # Read the rest of the rows
-            for i, row in enumerate(reader, start=1):
-                if row == []: 
-                    continue # Skip empty rows
-                elif row[0] in ["line", "line_number", "Changed parameters", "Read parameters"]:
-                    continue # Skip header row
-                elif row[3] == "":
+            key_name_index = header.index("para_name")
+        else:
+            result.errors.append("No key_name or para_name column found in the csv file.")
+            return result
+        if "value" not in header:
+            result.errors.append("No value column found in the csv file.")
+            return result
+        value_index = header.index("value")
+
+        imported = {}
+        for i, row in enumerate(rows[2:], start=1):
+            if row == []: 
+                continue # Skip empty rows
+            elif row[0] in ["line", "line_number", "Changed parameters", "Read parameters"]:
+                continue # Skip header row
+            elif len(row) <= max(3, key_name_index, value_index):
+                result.errors.append(f"Line number {i} has only {len(row)} columns.")
+                continue
+            elif row[3] == "":
+                if not quiet:
                     print(f"Warning: {row[2]} has no value in the csv file in line number {i}.")
-                    continue # Skip rows without a value
-                    
-                # extract the key_name and the value from the row
-                key_name, value = row[key_name_index], row[value_index]
+                result.missing_values.append(row[key_name_index])
+                continue # Skip rows without a value
+                
+            # extract the key_name and the value from the row
+            key_name, value = row[key_name_index], row[value_index]
 
-                # check if the parameter is known if the line archive
-                if key_name not in self.line_archive:
+            # check if the parameter is known if the line archive
+            if key_name not in self.line_archive:
+                if not quiet:
                     print(f"Warning: {key_name} not found in the archive.")
-                    continue
+                result.unknown_keys.append(key_name)
+                continue
+            line = self.line_archive[key_name]
+            
+            # make sure the float values have a dot
+            if line.is_float and "." not in value and "e" not in value:
+                value = value + "."
                 
-                # make sure the float values have a dot
-                if self.line_archive[key_name].is_float and "." not in value and "e" not in value:
-                    value = value + "."
-                    
-                # print out the imported parameters
+            # print out the imported parameters
+            if not quiet:
                 print(f"{'Imported':>18} | {key_name:<17} = {value:>15} | {row[2]:<5}")
-                # add the parameter to the dictionary
-                self.add_para(key_name, value)
+            imported[key_name] = Line2Modify(line.line, line.para_name, value, line.helper_para_name,
+                                             line.helper_value, line.helper_line, line.pos_of_appearance,
+                                             line.whole_line, line.is_float, key_name, line.patterns)
+            result.imported[key_name] = value
+
+        self.lines_to_modify.update(imported)
+        return result
     
-    def write_log(self, run_name, logpath=LOGPATH):
+    def run_hash(self, filepath=None) -> str:
         """
-        Writes the parameters that have been read and modified to a log file. The format is as follows:
-        It appends the parameters to the log file, where also older runs are stored. The first two columns are
-        "name_of_run" and "date_time". The self.para_name are the rest of the header. If a self.para_name is not yet in the header,
-        it is added to the header.
+        Returns a hash of the run: the values of all parameters that have been read and modified and the static
+        text of the job script, i.e. the template of the file without the values of the parameters. Two runs with
+        the same hash run the same job script. Numbers are compared as numbers, so 200 and 200. give the same hash.
 
         Args:
-            run_name (str): The name of the run that is used in the log file.
-            logpath (str, optional): The path to the log file. Defaults to LOGPATH.
+            filepath (str, optional): The path to the job script the run is rendered from. Defaults to None, in which
+            case the template of the file that was modified or rendered the last time is used or else SOURCEPATH.
 
-        """        
-        
-        INIT_HEADER = ['Started', 'Name', 'Notes']
-        
-        class Parameter:
-            def __init__(self, para_name, value):
-                self.para_name = para_name
-                self.value = value
-
-        def _read_first_line(logpath):
-            try:
-                with open(logpath, 'r', newline='') as csvfile:
-                    reader = csv.reader(csvfile)
-                    return next(reader)  # Get the first row as a list
+        Returns:
+            str: "sha256:" followed by the hash.
+        """
+        import json
+        from run_diff import normalize_value
+        values = {key_name: normalize_value(line_obj.value)
+                  for key_name, line_obj in {**self.lines_to_read, **self.lines_to_modify}.items()
+                  if line_obj.value != None}
+        template = self._template
+        if filepath is not None or template is None:
+            filepath = filepath or SOURCEPATH
+            with open(filepath, "r") as file:
+                template = self._get_template(filepath, file.readlines())
+        return "sha256:" + content_hash(json.dumps([sorted(values.items()), template.chunks]))
 
-            except: return []
+    def log_record(self, run_name) -> dict:
+        """
+        Returns the record of the run in the log: the columns "Name", "Started", "Notes" and "Hash" and the value of
+        every key_name that has been read and modified, e.g. to log the run later with write_log.
 
+        Args:
+            run_name (str): The name of the run that is used in the log file.
+        """
         from datetime import datetime
-        now = datetime.now()
-        start_time = now.strftime("%d.%m.%y %H:%M")
-        header = _read_first_line(logpath)
-        name = Parameter("Name", run_name)
-        time = Parameter("Started", start_time)
-        notes = Parameter("Notes", "")
-        
-        init_dict = {}
-        init_dict['Name'] = name
-        init_dict['Started'] = time
-        init_dict['Notes'] = notes
+        start_time = datetime.now().strftime("%d.%m.%y %H:%M")
+        record = {"Name": run_name, "Started": start_time, "Notes": "", "Hash": self.run_hash()}
+        for key_name, line_obj in {**self.lines_to_read, **self.lines_to_modify}.items():
+            record[key_name] = line_obj.value
+        return record
 
-        all_params = {**init_dict, **self.lines_to_read, **self.lines_to_modify}
-        for para_name, line_obj in all_params.items():
-            if para_name not in header:
-                header.append(para_name)
+    def write_log(self, run_name, logpath=LOGPATH, record=None, catalogpath=CATALOGPATH):
+        """
+        Writes the parameters that have been read and modified to the log of all runs. The run is appended as one
+        record with the columns "Name", "Started", "Notes" and "Hash" and one column for every key_name. If a key_name
+        is not yet a column of the log, the column is added. The wide log file is written by RunLog.compact.
+        The run is also added to the run catalog, where it can be looked up by its name, its run_hash and its
+        parameters.
 
-        # Read all lines except the first
-        try:
-            with open(logpath, 'r', newline='') as csvfile:
-                reader = csv.reader(csvfile)
-                # Skip the first line
-                next(reader)
-                remaining_lines = list(reader)
-        except: remaining_lines = []
-        
-        
-        new_line = []
-        for para in header:
-            if para in all_params:
-                new_line.append(all_params[para].value)
-            else:
-                new_line.append("")
-        
-        # Write the new first line and the rest of the lines back to the file
-        with open(logpath, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(header)
-            writer.writerows(remaining_lines)
-            writer.writerow(new_line)
+        Args:
+            run_name (str): The name of the run that is used in the log file.
+            logpath (str, optional): The path to the log file. Defaults to LOGPATH.
+            record (dict, optional): The record of log_record, if the parameters have changed since. Defaults to
+            None, in which case the current parameters are logged.
+            catalogpath (str, optional): The folder of the run catalogs. Defaults to CATALOGPATH.
+
+        """        
+        if record is None:
+            record = self.log_record(run_name)
+        RunLog(logpath).append(record)
+        RunCatalog(logpath, catalogpath).add_run(record)
 
     def import_all_para_from_archive(self):
         """
-        This method is enacted in the constructor of the class and adds all parameters that are in the archive.
+        This method is enacted in the constructor of the class and adds all parameters that are in the archive
+        to the parameters that are read. The Line2Read objects are only created when a parameter is requested.
         """        
-        for key_name in self.line_archive.keys():
-            self.add_para(key_name)
+        self.lines_to_read = ParameterRegistry(list(self.line_archive), self._line_to_read)
+
+    def _line_to_read(self, key_name):
+        line = self.line_archive[key_name]
+        line.value = None
+        return Line2Read(line.line, line.para_name, line.helper_para_name, line.helper_value, line.helper_line,
+                         line.pos_of_appearance, line.whole_line, line.is_float, key_name, line.patterns)
     
     def _add_all_parameters_to_archive(self): 
         """
-        This method is enacted in the constructor of the class and adds the information below on how to find
+        This method is enacted in the constructor of the class and adds the information on how to find
         the parameters in the file "sunCAR30506.csh" such that they can be added easily by the method "add_para"
-        without further information.
+        without further information. The parameters are defined in the csv files in src/archive/ (see
+        parameter_registry) and the Line2Read objects are only created when a parameter is requested.
         """
-
-        # For bgc
-        self._add_line_to_archive("NNP", "set    NNP", key_name = "bgc_NNP",
-                                  helper_line="#HELPER LINE", pos_of_appearance=1)
-        
-        self._add_line_to_archive("QUEUE", "setenv QUEUE", key_name = "bgc_QUEUE",
-                                  helper_line="#HELPER LINE", pos_of_appearance=1)
-    
-        self._add_line_to_archive("DIR", "setenv DIR /Net", key_name= "bgc_DIR",
-                                    whole_line=True, helper_line="#HELPER LINE",
-                                    pos_of_appearance=1)
-        self._add_line_to_archive("mpiifort", "mpiifort", helper_line="#HELPER LINE")
-        
-        
-        # For levante
-        self._add_line_to_archive("NNP", "set    NNP", key_name="levante_NNP",
-                                  helper_line="#HELPER LINE", pos_of_appearance=2)
-        
-        self._add_line_to_archive("QUEUE", "setenv QUEUE", key_name="levante_QUEUE",
-                                  helper_line="#HELPER LINE", pos_of_appearance=2)    
-        
-        self._add_line_to_archive("PROJECT", "setenv PROJECT", key_name="levante_PROJECT",
-                                  helper_line="#HELPER LINE")
-
-        self._add_line_to_archive("DIR", "setenv DIR /work", key_name= "levante_DIR",
-                                    whole_line=True, helper_line="#HELPER LINE",
-                                    pos_of_appearance=1)
-                                
-        self._add_line_to_archive("OUTPUTDIR", "#setenv OUTPUTDIR", whole_line=True,
-                                helper_line="#HELPER LINE")
-        
-        self._add_line_to_archive("mpif90", "mpif90", helper_line="#HELPER LINE")        
-         
-        
-        self._add_line_to_archive("TESTCASE", "#define TESTCASE", helper_line="!HELPER LINE")
-        match TESTCASE:
-            case "19":    
-                self._add_line_to_archive("NPX", "setenv NPX", helper_line="#HELPER LINE")
-                self._add_line_to_archive("NPY", "setenv NPY", helper_line="#HELPER LINE")
-                self._add_line_to_archive("NPZ", "setenv NPZ", helper_line="#HELPER LINE")
-                                       
-                self._add_line_to_archive("NTIME", "setenv NTIME", helper_line="#HELPER LINE")
-                self._add_line_to_archive("m", "parameter ")
-                self._add_line_to_archive("n", "parameter ")
-                self._add_line_to_archive("l", "parameter ")
-
-                self._add_line_to_archive("dx00", "parameter ", is_float=True)
-                self._add_line_to_archive("dy00", "parameter ", is_float=True)
-                self._add_line_to_archive("dz00", "parameter ", is_float=True)
-                self._add_line_to_archive("dt00", "parameter ", is_float=True)
-                self._add_line_to_archive("dtmax", "parameter ", is_float=True)
-                self._add_line_to_archive("lxyz", "parameter ")
-            
-                self._add_line_to_archive("nt", "parameter ")
-                self._add_line_to_archive("noutp", "parameter ")
-                self._add_line_to_archive("nplot", "&")
-                self._add_line_to_archive("nstore", "&")
-
-                self._add_line_to_archive("ibcx", "parameter ", pos_of_appearance=2) #Careful with the pos_of_appearance
-                self._add_line_to_archive("ibcy", "parameter ", pos_of_appearance=2) #Depends on PARAMETER POLES
-                self._add_line_to_archive("ibcz", "parameter ", pos_of_appearance=2)
-
-                self._add_line_to_archive("isflx", "parameter ")
-                self._add_line_to_archive("inoise","parameter ")
-                self._add_line_to_archive("iblatt", "parameter ")
-                self._add_line_to_archive("nspc", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("istr", "parameter ", pos_of_appearance=1)
-                self._add_line_to_archive("zhz", "parameter ", is_float=True, pos_of_appearance=1)
-
-                self._add_line_to_archive("imetryc", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("ivctype", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("ihorizdef", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("ivertdef", "parameter ", helper_line="!HELPER LINE")
-            
-                self._add_line_to_archive("isphere", "parameter ")
-                self._add_line_to_archive("icylind", "parameter ")
-                self._add_line_to_archive("icorio", "parameter ")
-                self._add_line_to_archive("ideep", "parameter ")
-
-                self._add_line_to_archive("TURBST", "#define")
-                self._add_line_to_archive("TKE", "#define")
-                self._add_line_to_archive("SGS", "#define")
-                self._add_line_to_archive("CHEMIS", "#define")
-                self._add_line_to_archive("IMRSB", "#define")
-                self._add_line_to_archive("J3DIM", "#define")
-                self._add_line_to_archive("MOISTMOD", "#define")
-                self._add_line_to_archive("POLES", "#define")             
-
-                self._add_line_to_archive("initi", "data")
-                self._add_line_to_archive("lipps", "data")
-
-                self._add_line_to_archive("iab", "data")
-                self._add_line_to_archive("iabth", "data")
-                self._add_line_to_archive("iabqw", "data")
-
-                self._add_line_to_archive("dxabL", "data", is_float=True)
-                self._add_line_to_archive("towxL", "data", is_float=True)  
-                self._add_line_to_archive("dxabR", "data", is_float=True)
-                self._add_line_to_archive("towxR", "data", is_float=True)
-                self._add_line_to_archive("dyab", "data", is_float=True)
-                self._add_line_to_archive("towy", "data", is_float=True)
-                self._add_line_to_archive("zab", "data", is_float=True)
-                self._add_line_to_archive("towz", "data", is_float=True)
-
-                self._add_line_to_archive("g", "data", is_float=True)
-                self._add_line_to_archive("rg", "data", is_float=True)
-                self._add_line_to_archive("tt00", "data", is_float=True)
-                self._add_line_to_archive("th00", "&  th00", is_float=True)
-                self._add_line_to_archive("pr00", "&  th00", is_float=True)
-                self._add_line_to_archive("rh00", "&  th00", is_float=True) 
-            
-                self._add_line_to_archive("u00", "data", is_float=True)
-                self._add_line_to_archive("v00", "data", is_float=True)
-                self._add_line_to_archive("st", "data", is_float=True)
-                self._add_line_to_archive("u0z", "data", is_float=True)
-                self._add_line_to_archive("v0z", "data", is_float=True)
-
-                self._add_line_to_archive("fcr0", "data", pos_of_appearance=1, is_float=True)
-                self._add_line_to_archive("ang", "data", pos_of_appearance=1, is_float=True)
-                self._add_line_to_archive("initprs", "data", pos_of_appearance=1, is_float=True)
-
-                self._add_line_to_archive("ceps", "data", pos_of_appearance=1, is_float=True)
-                self._add_line_to_archive("cL", "data", pos_of_appearance=1, is_float=True)
-                self._add_line_to_archive("cm", "data", pos_of_appearance=1, is_float=True)
-                self._add_line_to_archive("css", "data", pos_of_appearance=1, is_float=True)
-                self._add_line_to_archive("prndt", "data", pos_of_appearance=1, is_float=True)
-
-                self._add_line_to_archive("hf00", "data", is_float=True)
-                self._add_line_to_archive("qf00", "data", is_float=True)
-                self._add_line_to_archive("cdrg", "data", is_float=True)
-                self._add_line_to_archive("rghn", "data", is_float=True)
-
-                self._add_line_to_archive("rv", "data", is_float=True)
-                self._add_line_to_archive("t00", "data", is_float=True)
-                self._add_line_to_archive("ee0", "data", is_float=True)
-                self._add_line_to_archive("hlat", "data", is_float=True)
-                self._add_line_to_archive("rl00", "data", is_float=True)
-                self._add_line_to_archive("dtm", "data", is_float=True)
-
-                self._add_line_to_archive("cour_max_allowed", "data cour_max_allowed", helper_line="!HELPER LINE", 
-                                         is_float=True)
-                self._add_line_to_archive("timeadapt", "data timeadapt", helper_line="!HELPER LINE")
-                self._add_line_to_archive("ampns", "ampns", helper_line="!HELPER LINE",  is_float=True)
-                
-                #Restart Parameters
-                self._add_line_to_archive("iwrite", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("iwrite0", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("irst", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("iomode", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("ismode", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("iopar", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nfil", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nfilm", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nfilo", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nfilom", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("dt_fil", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nt_fil0", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nt_film0", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("dt_filo", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nt_filo0", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nt_filom0", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nfstart", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nanlfl", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("idia", "parameter ", helper_line="!HELPER LINE")
-                self._add_line_to_archive("nplo", "parameter ", helper_line="!HELPER LINE")
-            
-                self._add_line_to_archive("chmsrc", "chmsrc", helper_line="!HELPER LINE",  is_float=True)
-                self._add_line_to_archive("chmflx", "chmflx", helper_line="!HELPER LINE",  is_float=True)
-                
-                # Landcover Class 1
-                self._add_line_to_archive("zo(i,j)", "zo(i,j)", key_name="LC1_zo", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=1)
-                self._add_line_to_archive("hfxp(i,j,:)", "hfxp(i,j,:)", key_name="LC1_hfxp", helper_line="!HELPER LINE", pos_of_appearance=1, whole_line=True)
-                self._add_line_to_archive("qfxp(i,j,:)", "qfxp(i,j,:)", key_name="LC1_qfxp", helper_line="!HELPER LINE", pos_of_appearance=1, whole_line=True)
-                self._add_line_to_archive("chmsrc(i,j,1)", "chmsrc(i,j,1)", key_name="LC1_chmsrc1", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=1)
-                self._add_line_to_archive("chmsrc(i,j,2)", "chmsrc(i,j,2)", key_name="LC1_chmsrc2", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=1)
-                self._add_line_to_archive("chmflx(i,j,1)", "chmflx(i,j,1)", key_name="LC1_chmflx1", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=1)
-                
-                # Landcover Class 0
-                self._add_line_to_archive("zo(i,j)", "zo(i,j)", key_name="LC0_zo", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=2)
-                self._add_line_to_archive("hfxp(i,j,:)", "hfxp(i,j,:)", key_name="LC0_hfxp", helper_line="!HELPER LINE", pos_of_appearance=2, whole_line=True)
-                self._add_line_to_archive("qfxp(i,j,:)", "qfxp(i,j,:)", key_name="LC0_qfxp", helper_line="!HELPER LINE", pos_of_appearance=2, whole_line=True)
-                self._add_line_to_archive("chmsrc(i,j,1)", "chmsrc(i,j,1)", key_name="LC0_chmsrc1", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=2)
-                self._add_line_to_archive("chmsrc(i,j,2)", "chmsrc(i,j,2)", key_name="LC0_chmsrc2", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=2)
-                self._add_line_to_archive("chmflx(i,j,1)", "chmflx(i,j,1)", key_name="LC0_chmflx1", helper_line="!HELPER LINE",  is_float=True, pos_of_appearance=2)
+        specs = load_specs()
+        self.line_archive = ParameterRegistry(specs, lambda key_name: Line2Read(*specs[key_name]))
 
 def flag_parser():
     #check for flags when running the script
@@ -797,6 +940,8 @@ def flag_parser():
                         help="Load a specific configuration from the config (-c), the archive (-a) or the output (-o) folder.")
     group.add_argument("-s", "--save", default="",\
                         help="Save the current configuration as a configuration in the config folder with the name you set.")
+    group.add_argument("-v", "--validate", default=False, action="store_true",\
+                        help="Check all configurations in the config and the output folder against the job script without changing it.")
     
     parser.add_argument("-c", "--config", default="", help="Set the name of the configuration you want to load from the config folder. Input the full name.")
     parser.add_argument("-a", "--archive", default="", help="Set the name of the archive folder you want to laod the parameter configuration from.")
@@ -805,6 +950,7 @@ def flag_parser():
 
 if __name__ == "__main__":
     import argparse
+    from parameter_service import modify_file_with_service
     mod = FileModifier(safe=True)
 
     args = flag_parser()
@@ -821,7 +967,7 @@ if __name__ == "__main__":
         if answer != "y":
             print("No changes have been made.")
             quit()    
-        mod.modify_file()
+        modify_file_with_service(mod)
 
     elif args.load:
         if args.config == "" and args.archive == "" and args.output == "":
@@ -851,7 +997,7 @@ if __name__ == "__main__":
             if answer != "y":
                 print("No changes have been made.")
                 quit()
-            mod.modify_file()
+            modify_file_with_service(mod)
 
     elif args.save != "":
         if args.config != "" or args.archive != "" or args.output != "":
@@ -862,15 +1008,19 @@ if __name__ == "__main__":
                 print("No changes have been made.")
                 quit()
         
-        mod.modify_file()
+        modify_file_with_service(mod)
         #get rid of the .csv ending if it is there
         file_name = re.sub(".csv", "", args.save)
         mod.export_parameters(outpath=CONFIGPATH, file_name=file_name)
 
         print(f"The configuration has been saved as {file_name}.csv in the config folder.")
     
+    elif args.validate:
+        from validate_configs import validate_configs
+        validate_configs()
+
     # if not option are specified
     else:
-        mod.modify_file()
+        modify_file_with_service(mod)
 
 
@@ -0,0 +1,230 @@
+"""
+A catalog of all runs in a SQLite database on the local disk. It holds the same runs as the log (see run_log),
+but the runs are keyed by their name and the parameters are indexed, so that looking up a run or finding all
+runs with given parameter values does not need to read the whole log.
+The log usually sits on a network file system, where the locking of SQLite is not reliable, so the catalog is kept
+in the local cache folder (CATALOGPATH) and brought up to date with the runs that have been appended to the log
+since, e.g. by other machines. If the cache folder can not be written, the catalog is kept in memory.
+"""
+import os
+import sqlite3
+import hashlib
+from run_log import RunLog
+from config.config import LOGPATH
+
+# the catalogs are kept on the local disk, like the templates of the job script (see job_template)
+CATALOGPATH = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "eulag_framework")
+
+
+def catalog_path(logpath, catalogpath=CATALOGPATH):
+    """
+    Returns the path of the catalog of the log file in the cache folder. The name contains the name of the log
+    file and a hash of its full path.
+    """
+    logpath = os.path.abspath(logpath)
+    path_hash = hashlib.sha256(logpath.encode()).hexdigest()[:16]
+    return os.path.join(catalogpath, f"{os.path.splitext(os.path.basename(logpath))[0]}.{path_hash}.sqlite")
+
+
+class RunCatalog():
+    """
+    The SQLite catalog of the runs. The table "runs" has one row per run with the columns "name", "started",
+    "notes" and "hash", the hash of its parameters and job script (see FileModifier.run_hash). The table "parameters" has one row per run and key_name with the value as text and, if the value is
+    a number, also as a number. Both the text and the number are indexed per key_name.
+    """
+    def __init__(self, logpath=LOGPATH, catalogpath=CATALOGPATH):
+        """
+        Opens the catalog that belongs to the log file and creates it if it does not exist yet. The runs that
+        have been logged since the catalog was opened the last time are added to it.
+
+        Args:
+            logpath (str, optional): The path to the log file. Defaults to LOGPATH.
+            catalogpath (str, optional): The folder of the catalogs. Defaults to CATALOGPATH.
+        """
+        self.logpath = logpath
+        self.path = catalog_path(logpath, catalogpath)
+        try:
+            os.makedirs(catalogpath, exist_ok=True)
+            # the timeout lets parallel submitters wait for each other instead of failing
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            self._create_tables()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: The run catalog can not be kept in {catalogpath}, it is kept in memory ({e}).")
+            self.path = ":memory:"
+            self.connection = sqlite3.connect(self.path)
+            self._create_tables()
+        self.sync()
+
+    def _create_tables(self):
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]
+        if columns and "hash" not in columns:
+            # a catalog of an older version, it is only a cache of the log and imported again by sync
+            with self.connection:
+                self.connection.executescript("""
+                    DROP TABLE IF EXISTS runs;
+                    DROP TABLE IF EXISTS parameters;
+                    DROP TABLE IF EXISTS synced;
+                """)
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    name TEXT PRIMARY KEY,
+                    started TEXT,
+                    notes TEXT,
+                    hash TEXT
+                );
+                CREATE INDEX IF NOT EXISTS runs_hash ON runs (hash);
+                CREATE TABLE IF NOT EXISTS synced (
+                    records_id TEXT PRIMARY KEY,
+                    offset INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS parameters (
+                    run TEXT NOT NULL,
+                    key_name TEXT NOT NULL,
+                    value TEXT,
+                    number REAL,
+                    PRIMARY KEY (run, key_name)
+                );
+                CREATE INDEX IF NOT EXISTS parameters_value ON parameters (key_name, value);
+                CREATE INDEX IF NOT EXISTS parameters_number ON parameters (key_name, number);
+            """)
+
+    def _records_id(self, log):
+        # the records file is only replaced as a whole when edits of the log are taken over, see RunLog.compact
+        try:
+            stat = os.stat(log.records_path)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    def sync(self) -> int:
+        """
+        Adds the runs that have been appended to the log since the last sync. If the records file of the log has
+        been replaced, all runs are imported again.
+
+        Returns:
+            int: The number of added runs.
+        """
+        log = RunLog(self.logpath)
+        with log.locked():
+            records_id = self._records_id(log)
+            row = self.connection.execute("SELECT records_id, offset FROM synced").fetchone()
+            offset = row[1] if row is not None and row[0] == records_id else 0
+            rows, offset = log.rows_from(offset)
+        with self.connection:
+            for record in rows:
+                self._add(record)
+            self.connection.execute("DELETE FROM synced")
+            self.connection.execute("INSERT INTO synced VALUES (?, ?)", (records_id, offset))
+        return len(rows)
+
+    @staticmethod
+    def _number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _add(self, record):
+        record = dict(record)
+        name = record.pop("Name", "")
+        started = record.pop("Started", "")
+        notes = record.pop("Notes", "")
+        run_hash = record.pop("Hash", "") or None
+        self.connection.execute("DELETE FROM parameters WHERE run = ?", (name,))
+        self.connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)", (name, started, notes, run_hash))
+        self.connection.executemany("INSERT INTO parameters VALUES (?, ?, ?, ?)",
+                                    [(name, key_name, value, self._number(value))
+                                     for key_name, value in record.items() if value not in (None, "")])
+
+    def add_run(self, record):
+        """
+        Adds a run to the catalog. A run with the same name is replaced.
+
+        Args:
+            record (dict): The "Name", "Started", "Notes" and "Hash" of the run and the values of its parameters.
+        """
+        with self.connection:
+            self._add(record)
+
+    def import_log(self, logpath=None):
+        """
+        Adds all runs of the log to the catalog.
+
+        Args:
+            logpath (str, optional): The path to the log file. Defaults to None, in which case the log file of
+            the catalog is used.
+
+        Returns:
+            int: The number of imported runs.
+        """
+        rows = RunLog(logpath if logpath is not None else self.logpath).rows()
+        with self.connection:
+            for row in rows:
+                self._add(row)
+        return len(rows)
+
+    def has_run(self, name) -> bool:
+        """Returns True if there is a run with the given name in the catalog."""
+        return self.connection.execute("SELECT 1 FROM runs WHERE name = ?", (name,)).fetchone() is not None
+
+    def run_names(self, starts_with="") -> list:
+        """
+        Returns the names of all runs in the catalog that start with starts_with.
+
+        Args:
+            starts_with (str, optional): The beginning of the names. Defaults to "", which gives all runs.
+        """
+        rows = self.connection.execute("SELECT name FROM runs WHERE substr(name, 1, ?) = ? ORDER BY name",
+                                       (len(starts_with), starts_with))
+        return [name for name, in rows]
+
+    def find_runs(self, **parameters) -> list:
+        """
+        Returns the names of all runs that have the given values, e.g. find_runs(towz=200, TKE=1).
+        Numbers are compared as numbers, so towz=200 also finds runs with towz = 200.0.
+
+        Returns:
+            list: The names of the runs.
+        """
+        query = "SELECT name FROM runs"
+        arguments = []
+        for i, (key_name, value) in enumerate(parameters.items()):
+            number = self._number(value)
+            column = "value" if number is None else "number"
+            query += f" JOIN parameters p{i} ON p{i}.run = runs.name AND p{i}.key_name = ? AND p{i}.{column} = ?"
+            arguments += [key_name, str(value) if number is None else number]
+        return [name for name, in self.connection.execute(query + " ORDER BY name", arguments)]
+
+    def runs_with_hash(self, run_hash) -> list:
+        """Returns the names of all runs with the given hash of their parameters and job script."""
+        rows = self.connection.execute("SELECT name FROM runs WHERE hash = ? ORDER BY name", (run_hash,))
+        return [name for name, in rows]
+
+    def parameters(self, name) -> dict:
+        """Returns the key_names and values of the parameters of the run."""
+        rows = self.connection.execute("SELECT key_name, value FROM parameters WHERE run = ?", (name,))
+        return dict(rows.fetchall())
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-l", "--log", default=LOGPATH, help="Set the path to the log file.")
+    parser.add_argument("-i", "--import_log", default=False, action="store_true",
+                        help="Import all runs of the log into the catalog again.")
+    parser.add_argument("-f", "--find", nargs="*", default=[],
+                        help="Print the runs with the given parameters, e.g. -f towz=200 TKE=1.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = flag_parser()
+    catalog = RunCatalog(args.log)
+    if args.import_log:
+        print(f"Imported {catalog.import_log()} runs into {catalog.path}")
+    if args.find:
+        for name in catalog.find_runs(**dict(para.split("=", 1) for para in args.find)):
+            print(name)
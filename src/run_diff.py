@@ -0,0 +1,233 @@
+"""
+Compares the parameters of many runs at once. The parameters of the runs are loaded from the log or from the
+parameters.csv files of the run folders into a table with one row per run and one column per parameter. Every value
+is replaced by a number per column, so that comparing runs only compares integer arrays with numpy.
+"""
+import os
+import csv
+from run_log import RunLog
+from config.config import LOGPATH, OUTPATH
+
+# the columns of the log that are no parameters
+LOG_COLUMNS = ["Name", "Started", "Notes", "Hash"]
+
+
+def normalize_value(value) -> str:
+    """Returns the value in a form in which numbers are compared as numbers, so 200, 200. and 200.0 are the same."""
+    try:
+        return repr(float(value))
+    except (TypeError, ValueError):
+        return value.strip()
+
+
+def read_parameters_csv(path) -> dict:
+    """
+    Returns the key_names and values of the changed and the read parameters of a parameters.csv file as written by
+    FileModifier.export_parameters. Parameters without a value are left out.
+
+    Args:
+        path (str): The path to the parameters.csv file.
+    """
+    parameters = {}
+    with open(path, "r", newline="") as csvfile:
+        key_name_index = value_index = None
+        for row in csv.reader(csvfile):
+            if len(row) < 2:
+                continue # Skip empty rows and the titles of the blocks
+            if "value" in row and ("key_name" in row or "para_name" in row):
+                key_name_index = row.index("key_name") if "key_name" in row else row.index("para_name")
+                value_index = row.index("value")
+                continue
+            if key_name_index is None or len(row) <= max(key_name_index, value_index):
+                continue
+            if row[value_index] != "":
+                parameters[row[key_name_index]] = row[value_index]
+    return parameters
+
+
+class RunTable():
+    """
+    The parameters of a set of runs. codes is a numpy array with one row per run and one column per key_name, in which
+    every value is replaced by its index in values[column]. The code 0 stands for a parameter that the run does not
+    have.
+    """
+    def __init__(self, names, records):
+        """
+        Args:
+            names (list): The names of the runs.
+            records (list): The parameters of every run as a dictionary from the key_name to the value.
+        """
+        import numpy as np
+
+        self.names = list(names)
+        self.key_names = list(dict.fromkeys(key_name for record in records for key_name in record))
+        self.values = []
+        self.codes = np.zeros((len(self.names), len(self.key_names)), dtype=np.int32)
+        for j, key_name in enumerate(self.key_names):
+            codes_of_values = {}
+            values = [""]
+            for i, record in enumerate(records):
+                value = record.get(key_name, "")
+                if value == "":
+                    continue
+                normalized = normalize_value(value)
+                if normalized not in codes_of_values:
+                    codes_of_values[normalized] = len(values)
+                    values.append(value)
+                self.codes[i, j] = codes_of_values[normalized]
+            self.values.append(values)
+
+    @classmethod
+    def from_log(cls, logpath=LOGPATH):
+        """
+        Loads the parameters of all runs in the log.
+
+        Args:
+            logpath (str, optional): The path to the log file. Defaults to LOGPATH.
+        """
+        rows = RunLog(logpath).rows()
+        names = [row.get("Name", "") for row in rows]
+        records = [{key_name: value for key_name, value in row.items() if key_name not in LOG_COLUMNS}
+                   for row in rows]
+        return cls(names, records)
+
+    @classmethod
+    def from_runs(cls, run_folders=None, outpath=OUTPATH):
+        """
+        Loads the parameters of the runs from the parameters.csv files in their run folders.
+
+        Args:
+            run_folders (list, optional): The names of the run folders in outpath or the paths to them. Defaults to
+            None, in which case all run folders in outpath with a parameters.csv file are used.
+            outpath (str, optional): The folder of the run folders. Defaults to OUTPATH.
+        """
+        if run_folders is None:
+            run_folders = sorted(folder for folder in os.listdir(outpath)
+                                 if os.path.isfile(os.path.join(outpath, folder, "parameters.csv")))
+        names, records = [], []
+        for folder in run_folders:
+            path = os.path.join(outpath, folder, "parameters.csv")
+            try:
+                records.append(read_parameters_csv(path))
+            except FileNotFoundError:
+                print(f"Warning: {path} could not be found.")
+                continue
+            names.append(os.path.basename(os.path.normpath(folder)))
+        return cls(names, records)
+
+    def differing_parameters(self) -> list:
+        """Returns the key_names of the parameters that do not have the same value in all runs."""
+        if len(self.names) == 0:
+            return []
+        differs = (self.codes != self.codes[0]).any(axis=0)
+        return [key_name for key_name, different in zip(self.key_names, differs) if different]
+
+    def diff_matrix(self):
+        """
+        Returns the number of parameters in which every pair of runs differs as a numpy array with one row and one
+        column per run. Only the differing parameters are compared: they are one-hot encoded, so that the number of
+        equal parameters of all pairs is a single matrix product.
+        """
+        import numpy as np
+
+        columns = [self.key_names.index(key_name) for key_name in self.differing_parameters()]
+        n_runs = len(self.names)
+        if not columns:
+            return np.zeros((n_runs, n_runs), dtype=np.int32)
+
+        codes = self.codes[:, columns]
+        # shift the codes of every column so that all values of all columns get their own one-hot column
+        offsets = np.concatenate(([0], np.cumsum(codes.max(axis=0) + 1)[:-1]))
+        one_hot = np.zeros((n_runs, int(offsets[-1] + codes[:, -1].max() + 1)), dtype=np.float32)
+        one_hot[np.repeat(np.arange(n_runs), len(columns)), (codes + offsets).ravel()] = 1
+        equal = one_hot @ one_hot.T
+        return len(columns) - np.rint(equal).astype(np.int32)
+
+    def diff(self, name_a, name_b) -> dict:
+        """
+        Returns the parameters in which two runs differ.
+
+        Args:
+            name_a (str): The name of the first run.
+            name_b (str): The name of the second run.
+
+        Returns:
+            dict: key_name -> (value of the first run, value of the second run). Parameters that a run does not have
+            are "".
+        """
+        a, b = self.names.index(name_a), self.names.index(name_b)
+        return {key_name: (self.values[j][self.codes[a, j]], self.values[j][self.codes[b, j]])
+                for j, key_name in enumerate(self.key_names) if self.codes[a, j] != self.codes[b, j]}
+
+    def groups(self) -> list:
+        """
+        Returns the runs grouped by their parameters: runs that have the same value for every parameter are in the
+        same group. The groups are sorted by their size, the largest first.
+
+        Returns:
+            list: The groups as lists of run names.
+        """
+        import numpy as np
+
+        if len(self.names) == 0:
+            return []
+        _, inverse, counts = np.unique(self.codes, axis=0, return_inverse=True, return_counts=True)
+        groups = [[] for _ in counts]
+        for name, group in zip(self.names, inverse.ravel()):
+            groups[group].append(name)
+        return sorted(groups, key=len, reverse=True)
+
+    def signature(self, name) -> dict:
+        """Returns the values of the differing parameters of a run."""
+        i = self.names.index(name)
+        differing = set(self.differing_parameters())
+        return {key_name: self.values[j][self.codes[i, j]] for j, key_name in enumerate(self.key_names)
+                if key_name in differing}
+
+    def save_diff_matrix(self, outpath):
+        """
+        Saves the diff matrix as a csv file with the run names as first row and first column.
+
+        Args:
+            outpath (str): The path of the csv file.
+        """
+        matrix = self.diff_matrix()
+        with open(outpath, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow([""] + self.names)
+            for name, row in zip(self.names, matrix.tolist()):
+                writer.writerow([name] + row)
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-l", "--log", default=LOGPATH, help="Set the path to the log file the runs are loaded from.")
+    parser.add_argument("-r", "--runs", nargs="*", default=None,
+                        help="Load the runs from the parameters.csv files of the run folders in OUTPATH instead of the log. Without names all run folders are loaded.")
+    parser.add_argument("-d", "--diff", nargs=2, default=None, help="Print the parameters in which two runs differ.")
+    parser.add_argument("-o", "--output", default="", help="Save the diff matrix of all runs as a csv file.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = flag_parser()
+    table = RunTable.from_log(args.log) if args.runs is None else RunTable.from_runs(args.runs or None)
+
+    print("-"*100)
+    if args.diff:
+        for key_name, (value_a, value_b) in table.diff(*args.diff).items():
+            print(f"{key_name:>18} | {value_a:>15} | {value_b:>15}")
+    else:
+        differing = table.differing_parameters()
+        print(f"{len(table.names)} runs, {len(differing)} of {len(table.key_names)} parameters differ: {', '.join(differing)}")
+        for group in table.groups():
+            signature = ", ".join(f"{key_name} = {value}" for key_name, value in table.signature(group[0]).items())
+            print(f"{len(group):>6} runs | {signature}")
+            print(f"{'':>11} | {', '.join(group)}")
+    if args.output:
+        table.save_diff_matrix(args.output)
+        print(f"The diff matrix has been saved to {args.output}")
+    print("-"*100)
@@ -0,0 +1,204 @@
+"""
+The log of all runs. Every run is appended as one row to a records file next to the log file, while the columns
+are kept in a small schema file. New parameters only add a column to the schema, so previous rows never have to be
+rewritten. The wide log.csv with one column per parameter is produced on demand with compact(). Before the log file
+is written again, the values that have been edited in it, e.g. the Notes of a run, are taken over into the records.
+All changes are done while holding a lock on the log, so that runs can be logged in parallel.
+"""
+import os
+import io
+import csv
+import json
+import fcntl
+import tempfile
+from contextlib import contextmanager
+from config.config import LOGPATH
+
+
+class RunLog():
+    """
+    An append-only log of the runs, stored in three files next to the log file:
+    <log>.schema.json with the list of columns, <log>.records.csv with one row per run in the order of the
+    columns that were known when the row was written and <log>.lock, which is locked while the log is changed.
+    """
+    def __init__(self, logpath=LOGPATH):
+        """
+        Initializes the RunLog object. If there are no records yet but a log file exists, its rows are
+        imported as the first records.
+
+        Args:
+            logpath (str, optional): The path to the wide log file. Defaults to LOGPATH.
+        """
+        self.logpath = logpath
+        base = os.path.splitext(logpath)[0]
+        self.schema_path = base + ".schema.json"
+        self.records_path = base + ".records.csv"
+        self.lock_path = base + ".lock"
+
+        if not os.path.exists(self.records_path):
+            with self.locked():
+                self._import_log()
+
+    @contextmanager
+    def locked(self):
+        """Holds an exclusive lock on the log until the block is left."""
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _import_log(self):
+        # another process may have imported the log while this one waited for the lock
+        if os.path.exists(self.records_path):
+            return
+        columns, rows = [], []
+        if os.path.exists(self.logpath):
+            with open(self.logpath, "r", newline="") as csvfile:
+                reader = csv.reader(csvfile)
+                columns = next(reader, [])
+                rows = list(reader)
+        self._write_schema(columns)
+        self._write_atomic(self.records_path, rows)
+
+    def _write_schema(self, columns):
+        directory = os.path.dirname(os.path.abspath(self.schema_path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as file:
+            json.dump(columns, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(file.name, self.schema_path)
+
+    def _write_atomic(self, path, rows):
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", newline="", delete=False) as file:
+            csv.writer(file).writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(file.name, path)
+
+    def columns(self) -> list:
+        """Returns the columns of the log."""
+        try:
+            with open(self.schema_path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return []
+
+    def append(self, record):
+        """
+        Appends one run to the log. Columns that are not yet known are added to the schema.
+
+        Args:
+            record (dict): The value of every column of the run. Columns without a value are left empty.
+        """
+        with self.locked():
+            columns = self.columns()
+            new_columns = [column for column in record if column not in columns]
+            if new_columns:
+                columns = columns + new_columns
+                self._write_schema(columns)
+
+            with open(self.records_path, "a", newline="") as csvfile:
+                csv.writer(csvfile).writerow([record.get(column, "") for column in columns])
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+
+    def rows(self) -> list:
+        """
+        Returns all runs of the log as dictionaries from the column to the value. Columns that were added
+        after a run was logged are empty for this run.
+        """
+        return self.rows_from(0)[0]
+
+    def rows_from(self, offset):
+        """
+        Returns the runs that have been appended to the records file after the byte offset, e.g. to read only the
+        runs that have been logged since the last call.
+
+        Args:
+            offset (int): The byte offset in the records file, 0 for all runs.
+
+        Returns:
+            tuple: The runs as dictionaries like rows() and the offset of the end of the records file.
+        """
+        columns = self.columns()
+        try:
+            with open(self.records_path, "rb") as csvfile:
+                csvfile.seek(offset)
+                data = csvfile.read()
+        except FileNotFoundError:
+            data = b""
+        # a row that is still being written is read the next time
+        data = data[:data.rfind(b"\n") + 1]
+        records = list(csv.reader(io.StringIO(data.decode(), newline="")))
+        offset += len(data)
+        return [dict(zip(columns, row + [""] * (len(columns) - len(row)))) for row in records], offset
+
+    def run_names(self) -> list:
+        """Returns the names of all runs in the log."""
+        return [row.get("Name", "") for row in self.rows()]
+
+    def _merge_edits(self) -> list:
+        """
+        Takes the values that have been edited in the log file over into the records. The rows are matched by the
+        name of the run, rows and columns that are not in the records are ignored. Returns the edited rows, the
+        records are only written again if there are any.
+        """
+        try:
+            with open(self.logpath, "r", newline="") as csvfile:
+                reader = csv.reader(csvfile)
+                log_columns = next(reader, [])
+                edited = {row[log_columns.index("Name")]: dict(zip(log_columns, row)) for row in reader
+                          if "Name" in log_columns and len(row) == len(log_columns)}
+        except FileNotFoundError:
+            return []
+
+        columns = self.columns()
+        rows = self.rows()
+        changed_rows = []
+        for row in rows:
+            edited_row = edited.get(row.get("Name"), {})
+            changes = {column: value for column, value in edited_row.items() if column in row and row[column] != value}
+            if changes:
+                row.update(changes)
+                changed_rows.append(row)
+        if changed_rows:
+            self._write_atomic(self.records_path, [[row[column] for column in columns] for row in rows])
+        return changed_rows
+
+    def compact(self, outpath=None):
+        """
+        Writes the wide log with one column for every parameter and one row for every run. The values that
+        have been edited in the log file are taken over into the records first, so they are not overwritten. The
+        records file is replaced then, so the run catalog imports the runs again the next time it is opened.
+
+        Args:
+            outpath (str, optional): The path of the wide log. Defaults to None, in which case the log file is used.
+        """
+        if outpath is None:
+            outpath = self.logpath
+        with self.locked():
+            changed_rows = self._merge_edits()
+            if changed_rows:
+                print(f"Took the edits of {len(changed_rows)} runs in {self.logpath} over into the records")
+            columns = self.columns()
+            rows = [list(row.values()) for row in self.rows()]
+            self._write_atomic(outpath, [columns] + rows)
+        print(f"Wrote {len(rows)} runs with {len(columns)} columns to {outpath}")
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-l", "--log", default=LOGPATH, help="Set the path to the log file.")
+    parser.add_argument("-o", "--outpath", default=None, help="Set the path of the wide log. Defaults to the log file.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = flag_parser()
+    RunLog(args.log).compact(args.outpath)
@@ -0,0 +1,156 @@
+"""
+The journal of a series of runs. Every step of a run is appended as one line of json to the journal of its series,
+so that a series that was interrupted, e.g. because the Python process died, can be resumed: runs that have been
+submitted are not submitted again and the restarts of a convergence test continue where they stopped.
+The steps of a run are:
+    prepared: the name of the run has been checked, from now on its folder belongs to the series
+    logged: the parameters have been exported and logged
+    submitted: the job has been submitted
+    finished: the job is no longer running
+    processed: the output has been processed, e.g. the turbs file of a restart has been renamed
+    failed: the job could not be submitted or has failed, it is submitted again when the series is resumed
+    reused: the output of a run with the same parameters has been linked, which counts as submitted, finished
+    and processed
+"""
+import os
+import json
+import fcntl
+import time
+from contextlib import contextmanager
+from config.config import LOGPATH
+
+# the journals are kept next to the log
+JOURNALPATH = os.path.join(os.path.dirname(LOGPATH), "journals")
+STEPS = ["prepared", "logged", "submitted", "finished", "processed", "failed", "reused"]
+
+
+class SeriesJournal():
+    """
+    An append-only journal of the runs of a series in <journal_dir>/<series_name>.jsonl. The journal is locked
+    while a line is appended, so that runs can be recorded from several threads and processes.
+    """
+    def __init__(self, series_name, journal_dir=JOURNALPATH):
+        """
+        Args:
+            series_name (str): The name of the series.
+            journal_dir (str, optional): The folder of the journals. Defaults to JOURNALPATH.
+        """
+        self.series_name = series_name
+        self.path = os.path.join(journal_dir, series_name + ".jsonl")
+        self.lock_path = os.path.join(journal_dir, series_name + ".lock")
+
+    @contextmanager
+    def locked(self):
+        """Holds an exclusive lock on the journal until the block is left."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def record(self, run_name, step, **details):
+        """
+        Appends a step of a run to the journal.
+
+        Args:
+            run_name (str): The name of the run.
+            step (str): The step, one of STEPS.
+            **details: Further information about the run, e.g. the name or the id of its job.
+        """
+        if step not in STEPS:
+            print(f"ERROR: The step {step} is unknown, use one of {', '.join(STEPS)}.")
+            quit()
+        entry = {"run": run_name, "step": step, "time": time.time(), **details}
+        with self.locked():
+            with open(self.path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+
+    def entries(self) -> list:
+        """Returns all entries of the journal in the order they were recorded."""
+        entries = []
+        try:
+            with open(self.path, "r") as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue # a line that was not written completely when the process died
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def runs(self) -> dict:
+        """
+        Returns the runs of the journal in the order they were recorded first. Every run is a dictionary with the
+        "steps" that have been done, the last "step", its "time" and the details of all entries of the run, the
+        later entries overwrite the details of the earlier ones. A failed job undoes all steps but "prepared" and
+        "logged".
+        """
+        runs = {}
+        for entry in self.entries():
+            run = runs.setdefault(entry["run"], {"steps": []})
+            run.update(entry)
+            if entry["step"] == "failed":
+                run["steps"] = [step for step in run["steps"] if step in ["prepared", "logged"]]
+            if entry["step"] not in run["steps"]:
+                run["steps"].append(entry["step"])
+        return runs
+
+    def done(self, run_name, step, runs=None) -> bool:
+        """
+        Returns True if the step of the run has been done. A reused run counts as submitted, finished and processed.
+
+        Args:
+            run_name (str): The name of the run.
+            step (str): The step.
+            runs (dict, optional): The runs as returned by runs(), if they have been read already. Defaults to None.
+        """
+        runs = self.runs() if runs is None else runs
+        steps = runs.get(run_name, {}).get("steps", [])
+        return step in steps or ("reused" in steps and step in ["submitted", "finished", "processed"])
+
+    def update_finished(self, running_job_names) -> list:
+        """
+        Records the submitted runs whose job is no longer running as finished.
+
+        Args:
+            running_job_names (list): The names of the running jobs, e.g. of ExecutionBackend.running_job_names.
+
+        Returns:
+            list: The names of the runs that have finished.
+        """
+        running = set(running_job_names)
+        runs = self.runs()
+        finished = [run_name for run_name, run in runs.items()
+                    if self.done(run_name, "submitted", runs) and not self.done(run_name, "finished", runs)
+                    and run.get("job", run_name) not in running]
+        for run_name in finished:
+            self.record(run_name, "finished")
+        return finished
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("series", help="Set the name of the series.")
+    parser.add_argument("-j", "--journals", default=JOURNALPATH, help="Set the folder of the journals.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from datetime import datetime
+    args = flag_parser()
+    journal = SeriesJournal(args.series, args.journals)
+    runs = journal.runs()
+    print("-"*100)
+    print(f"The series {args.series} has {len(runs)} runs in {journal.path}")
+    for run_name, run in runs.items():
+        changed = datetime.fromtimestamp(run["time"]).strftime("%d.%m.%y %H:%M")
+        print(f"{run_name:<50} | {run['step']:<10} | {changed} | {', '.join(run['steps'])}")
+    print("-"*100)
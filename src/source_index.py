@@ -0,0 +1,160 @@
+"""
+An index over the lines of the EULAG job script. The FileModifier uses it to find the lines that belong to a
+parameter without running a regex over every line of the file for every parameter.
+It also keeps a section map that tells for every line in which helper section (TESTCASE, #HELPER LINE,
+!HELPER LINE, ...) it is located.
+"""
+import re
+from bisect import bisect_left, insort
+
+# the number of lines (including the line itself) that are searched for the helper line of a section
+SECTION_LOOKBACK = 30
+
+
+class SourceIndex():
+    """
+    Tokenizes the lines of a file once and keeps an index from the beginning of the lines to their line numbers.
+    The lines are grouped by their first non-whitespace character, so that the lines that start with a given
+    line beginning only have to be searched in one small group. The result for every line beginning is cached.
+    """
+    def __init__(self, lines):
+        """
+        Initializes the index for the given lines.
+
+        Args:
+            lines (list): The lines of the file as returned by readlines(). The list is shared with the caller
+            and changes have to be announced with update_line.
+        """
+        self.lines = lines
+        self._by_first_char = {}
+        self._by_line_begin = {}
+        self._sections = {}
+        for i, line in enumerate(lines):
+            self._by_first_char.setdefault(line.lstrip()[:1], []).append(i)
+
+    @staticmethod
+    def _line_begin_pattern(line_begin):
+        return re.compile(fr"\s*{re.escape(line_begin)}")
+
+    def lines_starting_with(self, line_begin, pattern=None) -> list:
+        """
+        Returns the indices of all lines that start with line_begin, leading whitespace ignored.
+        This gives the same lines as re.match(fr"\\s*{re.escape(line_begin)}", line) over all lines.
+
+        Args:
+            line_begin (str): The beginning of the line.
+            pattern (re.Pattern, optional): The compiled pattern of the line beginning. Defaults to None, in which
+            case it is compiled here.
+
+        Returns:
+            list: The sorted indices of the matching lines.
+        """
+        if line_begin in self._by_line_begin:
+            return self._by_line_begin[line_begin][1]
+
+        if pattern is None:
+            pattern = self._line_begin_pattern(line_begin)
+        first_char = line_begin.lstrip()[:1]
+        if first_char:
+            candidates = self._by_first_char.get(first_char, [])
+        else:
+            candidates = range(len(self.lines))
+
+        indices = [i for i in candidates if pattern.match(self.lines[i])]
+        self._by_line_begin[line_begin] = (pattern, indices)
+        return indices
+
+    def update_line(self, i, new_line):
+        """
+        Replaces the line i and updates the index if the beginning of the line has changed.
+
+        Args:
+            i (int): The index of the line.
+            new_line (str): The new content of the line.
+        """
+        old_first_char = self.lines[i].lstrip()[:1]
+        self.lines[i] = new_line
+        new_first_char = new_line.lstrip()[:1]
+
+        if old_first_char != new_first_char:
+            group = self._by_first_char[old_first_char]
+            del group[bisect_left(group, i)]
+            insort(self._by_first_char.setdefault(new_first_char, []), i)
+
+        for pattern, indices in self._by_line_begin.values():
+            pos = bisect_left(indices, i)
+            is_listed = pos < len(indices) and indices[pos] == i
+            if pattern.match(new_line):
+                if not is_listed:
+                    indices.insert(pos, i)
+            elif is_listed:
+                del indices[pos]
+
+        for section in self._sections.values():
+            if i in section.labels and section.labels[i] != section.label(new_line):
+                section.labels.clear()
+                section.counts.clear()
+
+    def sections_before(self, i, helper_line, helper_para_name=None, helper_value=None) -> int:
+        """
+        Returns how many helper lines of the right section are found when going back from the line i
+        (including i itself) for SECTION_LOOKBACK lines. The search stops at the first helper line that
+        belongs to another section, i.e. where helper_para_name is not equal to helper_value.
+        The labels of the lines and the result for every line are computed once and then looked up.
+
+        Args:
+            i (int): The index of the line.
+            helper_line (str): The regex of the helper line that starts a section.
+            helper_para_name (str, optional): The name of the helper parameter in the helper line. Defaults to None.
+            helper_value (str, optional): The value the helper parameter has to have. Defaults to None.
+
+        Returns:
+            int: The number of helper lines of the right section in front of the line.
+        """
+        key = (helper_line, helper_para_name, helper_value)
+        section = self._sections.get(key)
+        if section is None:
+            section = self._sections[key] = SectionMap(helper_line, helper_para_name, helper_value)
+
+        count = section.counts.get(i)
+        if count is None:
+            count = 0
+            for j in range(i, i - SECTION_LOOKBACK, -1):
+                label = section.label_of(self.lines, j)
+                if label == 0:
+                    continue
+                if label == -1:
+                    break
+                count += 1
+            section.counts[i] = count
+        return count
+
+
+class SectionMap():
+    """
+    The labels of the lines for one kind of section: 1 for a helper line of the right section,
+    -1 for a helper line of another section and 0 for all other lines.
+    """
+    def __init__(self, helper_line, helper_para_name, helper_value):
+        self.helper_pattern = re.compile(helper_line)
+        if helper_para_name or helper_value:
+            self.value_pattern = re.compile(fr"{helper_para_name}\s*==\s*{helper_value}")
+        else:
+            self.value_pattern = None
+        self.labels = {}
+        self.counts = {}
+
+    def label(self, line) -> int:
+        if not self.helper_pattern.search(line):
+            return 0
+        if self.value_pattern is None or self.value_pattern.search(line):
+            return 1
+        return -1
+
+    def label_of(self, lines, j) -> int:
+        # negative indices are looked up from the end of the file, like lines[j] does
+        line = lines[j]
+        j = j % len(lines)
+        if j not in self.labels:
+            self.labels[j] = self.label(line)
+        return self.labels[j]
@@ -0,0 +1,195 @@
+"""
+Declarative sweeps over the parameters of the job script. A sweep has a name, the parameters that are the same for
+all runs (base) and the axes, i.e. the parameters that change from run to run. The runs are created lazily from the
+axes in one of four modes:
+    grid: every combination of the values of the axes
+    zip: the i-th value of every axis, all axes need the same number of values
+    random: samples drawn at random, a list is sampled by choice and a range {"low": ..., "high": ...} uniformly
+    lhs: a Latin hypercube sample, every axis is divided into as many strata as there are samples
+The names of the runs are deterministic: grid and zip runs are named after their values, e.g. DIANA_rghn0dot3_ampns1dot8
+as in the test series of Simulation, sampled runs are numbered, e.g. DIANA_lhs0042. Random and lhs sweeps give the
+same runs for the same seed.
+
+A sweep can be created in Python or loaded from a TOML or YAML file like
+    name = "DIANA"
+    mode = "lhs"
+    samples = 100
+    start_from = "DIANA_rghn0dot0_ampns1dot4"
+    [base]
+    TKE = 0
+    [axes]
+    ampns = {low = 0.3, high = 4.0}
+    rghn = [0.0, 0.3]
+"""
+import os
+import random
+from itertools import product
+
+MODES = ["grid", "zip", "random", "lhs"]
+
+
+def format_value(value) -> str:
+    """Returns the value as it is used in a run name, e.g. 0.3 -> 0dot3."""
+    return str(value).replace(".", "dot")
+
+
+class Sweep():
+    """
+    A sweep over the parameters of the job script. runs() yields the name and the parameters of every run.
+    """
+    def __init__(self,
+                 name,
+                 axes,
+                 base = None,
+                 mode = "grid",
+                 samples = None,
+                 seed = 0,
+                 labels = None,
+                 start_from = None,
+                 significant_digits = 6):
+        """
+        Args:
+            name (str): The name of the series, the names of the runs start with it.
+            axes (dict): The key_name of every parameter that changes and its values: a list of values or, for the
+            random and lhs mode, a range {"low": ..., "high": ...}. The order of the axes is the order in the names.
+            base (dict, optional): The key_names and values of the parameters that are the same for all runs.
+            Defaults to None.
+            mode (str, optional): "grid", "zip", "random" or "lhs". Defaults to "grid".
+            samples (int, optional): The number of runs of the random and lhs mode. Defaults to None.
+            seed (int, optional): The seed of the random and lhs mode. Defaults to 0.
+            labels (dict, optional): Shorter names of the axes in the run names, e.g. {"cour_max_allowed": "crn"}.
+            Defaults to None.
+            start_from (str, optional): The run folder in OUTPATH or the configuration the parameters are imported
+            from before the base is set. Defaults to None.
+            significant_digits (int, optional): The number of significant digits of the sampled values. Defaults to 6.
+        """
+        self.name = name
+        self.axes = dict(axes)
+        self.base = dict(base or {})
+        self.mode = mode
+        self.samples = samples
+        self.seed = seed
+        self.labels = dict(labels or {})
+        self.start_from = start_from
+        self.significant_digits = significant_digits
+        self._check()
+
+    def _check(self):
+        """Prints an error and quits if the sweep can not be run."""
+        error = None
+        if self.mode not in MODES:
+            error = f"The mode {self.mode} is unknown, use one of {', '.join(MODES)}."
+        elif not self.axes:
+            error = "The sweep has no axes."
+        elif self.mode in ["grid", "zip"] and any(isinstance(values, dict) for values in self.axes.values()):
+            error = f"Ranges can only be sampled in the random and lhs mode, not in the {self.mode} mode."
+        elif self.mode == "zip" and len({len(values) for values in self.axes.values()}) > 1:
+            error = "All axes of a zip sweep need the same number of values."
+        elif self.mode in ["random", "lhs"] and not self.samples:
+            error = f"Set the number of samples of the {self.mode} sweep."
+        if error:
+            print(f"ERROR in the sweep {self.name}: {error}")
+            quit()
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Loads a sweep from a TOML (.toml) or YAML (.yaml, .yml) file. YAML needs the package pyyaml.
+
+        Args:
+            path (str): The path to the file.
+        """
+        if os.path.splitext(path)[1] in [".yaml", ".yml"]:
+            import yaml
+            with open(path, "r") as file:
+                spec = yaml.safe_load(file)
+        else:
+            import tomllib
+            with open(path, "rb") as file:
+                spec = tomllib.load(file)
+        return cls(**spec)
+
+    def __len__(self):
+        if self.mode == "grid":
+            length = 1
+            for values in self.axes.values():
+                length *= len(values)
+            return length
+        if self.mode == "zip":
+            return len(next(iter(self.axes.values())))
+        return self.samples
+
+    def _round(self, value):
+        return float(f"{value:.{self.significant_digits}g}")
+
+    def _name(self, parameters):
+        return self.name + "".join(f"_{self.labels.get(key_name, key_name)}{format_value(value)}"
+                                   for key_name, value in parameters.items())
+
+    def _sample(self, values, u):
+        """Returns the value of an axis at the position u in [0, 1)."""
+        if isinstance(values, dict):
+            return self._round(values["low"] + u * (values["high"] - values["low"]))
+        return values[int(u * len(values))]
+
+    def runs(self):
+        """
+        Yields the runs of the sweep one after the other. Two runs with the same name, e.g. because two values
+        of an axis are formatted the same way, raise a ValueError when the second one is reached.
+
+        Yields:
+            tuple: The name of the run and a dictionary with the key_names and values of the axes.
+        """
+        names = set()
+        for run_name, parameters in self._runs():
+            if run_name in names:
+                raise ValueError(f"The sweep {self.name} has two runs with the name {run_name}, "
+                                 f"the second one has the parameters {parameters}.")
+            names.add(run_name)
+            yield run_name, parameters
+
+    def _runs(self):
+        key_names = list(self.axes)
+        if self.mode == "grid":
+            for values in product(*self.axes.values()):
+                parameters = dict(zip(key_names, values))
+                yield self._name(parameters), parameters
+        elif self.mode == "zip":
+            for values in zip(*self.axes.values()):
+                parameters = dict(zip(key_names, values))
+                yield self._name(parameters), parameters
+        else:
+            rng = random.Random(self.seed)
+            width = len(str(self.samples - 1))
+            if self.mode == "lhs":
+                # every axis gets its own order of the strata
+                strata = [rng.sample(range(self.samples), self.samples) for _ in key_names]
+            for i in range(self.samples):
+                if self.mode == "lhs":
+                    positions = [(stratum[i] + rng.random()) / self.samples for stratum in strata]
+                else:
+                    positions = [rng.random() for _ in key_names]
+                parameters = {key_name: self._sample(self.axes[key_name], u)
+                              for key_name, u in zip(key_names, positions)}
+                yield f"{self.name}_{self.mode}{i:0{width}d}", parameters
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sweep", help="Set the TOML or YAML file of the sweep.")
+    parser.add_argument("-n", "--number", default=20, type=int, help="Set the number of runs that are printed.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from itertools import islice
+    args = flag_parser()
+    sweep = Sweep.from_file(args.sweep)
+    print("-"*100)
+    print(f"The sweep {sweep.name} has {len(sweep)} runs ({sweep.mode})")
+    for run_name, parameters in islice(sweep.runs(), args.number):
+        print(f"{run_name:<40} | " + ", ".join(f"{key_name} = {value}" for key_name, value in parameters.items()))
+    print("-"*100)
@@ -1,25 +1,50 @@
 import subprocess
 from read_write_automation import FileModifier
-from cluster_handling import check_if_job_is_running
+from cluster_handling import link_output_files
+from run_log import RunLog
+from run_catalog import RunCatalog
+from parameter_service import modify_file_with_service
+from sweep import Sweep
+from job_scheduler import JobScheduler
+from execution_backend import SlurmBackend
+from series_journal import SeriesJournal
 from config.config import SOURCEPATH, OUTPATH, LOGPATH, ARCHIVEPATH
 
+# the ticks of the scheduler after which a job whose final state is still unknown, e.g. because sacct does not
+# know it, is taken as not failed
+MAX_STATE_CHECKS = 10
+
+
+def compact_log():
+    """Writes the wide log file, see RunLog.compact."""
+    RunLog(LOGPATH).compact()
+
 class Simulation():
     """
     A class to run series of EULAG simulations.
     """    
-    def __init__(self, name):
+    def __init__(self, name, backend=None):
         """
         Initializes the Simulation object.
 
         Args:
             name (str): Either the name of the series or the name of the run.
+            backend (ExecutionBackend, optional): Runs the job scripts, see execution_backend. Defaults to None,
+            in which case the jobs are submitted to Slurm.
         """        
         self.mod = FileModifier()
+        self.backend = backend or SlurmBackend()
+        # the steps of the runs of the series, so that an interrupted series can be resumed
+        self.journal = SeriesJournal(name)
         self.series_name = name
         self.run_name = name #if the run is a run series the name later will be changed for every run
         self.export = True
         self.log = True
         self.modify = True
+        # what happens if a run with the same parameters exists: "ask", "link" its output or "never" reuse it
+        self.reuse = "ask"
+        # how often the final state of the last job of a run has been checked, see _has_failed
+        self._state_checks = {}
         
     def general_params(self):
         """
@@ -86,28 +111,19 @@ class Simulation():
 
     def run_name_is_duplicate(self):
         """
-        reads all the names of the runs from the log.csv file
-        from the column that has "Name" as the header
-        if self.run_name is not in the list, it returns True
+        looks up self.run_name in the run catalog (see run_catalog)
+        if self.run_name is not in the catalog, it returns True
         It also checks if there is a folder in the outpath that has self.run_name in it.
 
         Returns:
             bool : If the name is a duplicate or not.
         """    
         
-        import csv
         name = self.run_name
         
-        with open(LOGPATH, "r") as csv_file:
-            csv_reader = csv.reader(csv_file)
-            next(csv_reader)
-            for i, line in enumerate(csv_reader):
-                #check if the name is in the line
-                if name not in line:
-                    continue
-                
-                print(f"ERROR: {name} is already in the log file in the row {i}")
-                return True
+        if RunCatalog(LOGPATH).has_run(name):
+            print(f"ERROR: {name} is already in the log file")
+            return True
         
         #check if the name is already in the outpath
         import os
@@ -120,40 +136,373 @@ class Simulation():
         #if the name is not in the log file or in the outpath  
         return False
 
-    def modify_file_and_run_eulag(self):
+    def reuse_existing_run(self, run_name):
+        """
+        Looks up the runs with the same run_hash as the current parameters in the run catalog. If one of them has
+        completed and its folder is in the outpath, its output files are linked into the folder of run_name instead
+        of running EULAG again. A run has completed if its last job in the job registry is COMPLETED or, if it has
+        no job there, e.g. with the local backend, if the journal of the series says it has finished. Depending on
+        self.reuse the user is asked first ("ask"), the output is linked ("link") or nothing is reused ("never").
+        Restarts are never reused.
+
+        Args:
+            run_name (str): The name of the new run.
+
+        Returns:
+            bool: True if the output of an existing run is used and no job has to be started.
+        """
+        import os
+        from job_registry import JobRegistry
+        if self.reuse == "never" or "RESTART" in run_name:
+            return False
+
+        run_hash = self.mod.run_hash()
+        same_runs = [name for name in RunCatalog(LOGPATH).runs_with_hash(run_hash)
+                     if name != run_name and "RESTART" not in name and os.path.isdir(os.path.join(OUTPATH, name))]
+        if not same_runs:
+            return False
+
+        registry = JobRegistry(LOGPATH)
+        jobs = {name: registry.last_job(name) for name in same_runs}
+        open_job_ids = set(registry.open_job_ids())
+        registry.update([job["job_id"] for job in jobs.values() if job is not None and job["job_id"] in open_job_ids])
+        journal_runs = self.journal.runs()
+        running = self.backend.running_job_names()
+        finished = []
+        for name, job in jobs.items():
+            if job is not None:
+                if registry.last_job(name)["state"] == "COMPLETED":
+                    finished.append(name)
+            elif name not in running and self.journal.done(name, "finished", journal_runs):
+                finished.append(name)
+        if not finished:
+            print(f"Note: {run_name} has the same parameters as {', '.join(same_runs)}, which have not completed.")
+            return False
+
+        existing_run = finished[0]
+        if self.reuse == "ask":
+            print("-"*100)
+            print(f"{run_name} has the same parameters as {existing_run}.")
+            print("Do you want to link its output instead of running EULAG again? (y/n)")
+            if input() != "y":
+                return False
+        n_linked = link_output_files(existing_run, run_name)
+        print(f"EULAG OUTPUT REUSED: {n_linked} files of {existing_run} linked to {run_name}")
+        print("---------------------------------")
+        return True
+
+    def modify_file_and_run_eulag(self, compact_log=True):
         """
         Modifies the file with all parameters that were specified (if self.modifiy != False)
         and the starts a EULAG job with the name self.run_name. It also exports the parameters
         and writes the log file if self.export and self.log are True respectively.
+        The steps are recorded in the journal of the series, a run that has already been submitted is skipped. If
+        it has not been logged, e.g. because the process died right after the submission, it is logged now.
+
+        Args:
+            compact_log (bool, optional): Write the wide log file after the run has been logged. Defaults to True,
+            a series of runs passes False and writes it once at the end.
         """
         import re
         run_name = self.run_name
         log_name = self.run_name
         mod = self.mod
-        
-        #check if the name is a duplicate
-        if self.run_name_is_duplicate():
+        journal_runs = self.journal.runs()
+
+        #a run that is in the journal has been started before and is resumed
+        submitted = self.journal.done(log_name, "submitted", journal_runs)
+        logged = self.journal.done(log_name, "logged", journal_runs) or not (self.export or self.log)
+        if submitted and logged:
+            print(f"{log_name} has already been submitted, see the journal of the series {self.series_name}.")
             return
+        #check if the name is a duplicate
+        if log_name not in journal_runs:
+            if self.run_name_is_duplicate():
+                return
+            self.journal.record(log_name, "prepared")
         
         #set the parameters for the run
         if self.modify:
-            mod.modify_file()
+            modify_file_with_service(mod)
         
         # get rid of the restart prefix
         run_name = re.sub(fr"RESTAR[^_]+_", "", run_name)
-        #run the job
-        subprocess.run([SOURCEPATH, run_name])
-                
-        print("EULAG JOB STARTED:", run_name)
-        print("---------------------------------")
-        print("")
-        print("")
+        #run the job unless the output of a run with the same parameters is reused
+        if submitted:
+            print(f"{log_name} has already been submitted, but it has not been logged yet.")
+        elif self.modify and self.reuse_existing_run(log_name):
+            self.journal.record(log_name, "reused")
+        else:
+            result = self._submit(SOURCEPATH, log_name, run_name, resumed=log_name in journal_runs)
+            print(result.stdout, end="")
+            if result.returncode != 0:
+                print(f"ERROR: The job {run_name} could not be started: {result.stderr}")
+            else:
+                print("EULAG JOB STARTED:", run_name)
+                print("---------------------------------")
+                print("")
+                print("")
         
         #export the parameters and write the log
+        if not logged:
+            self._export_and_log(log_name)
+            if self.log and compact_log:
+                RunLog(LOGPATH).compact()
+
+    def _submit(self, script_path, run_name, job_name, resumed=False):
+        """
+        Submits the job script with the backend and records the submission in the journal right away, so that the
+        run is not submitted again if the series is resumed. If the run is resumed, a job that has been submitted
+        before the process died, but has not been recorded in the journal, is recorded instead of submitting the run
+        again.
+        """
+        if resumed:
+            job_id = self._unrecorded_job(run_name, job_name)
+            if job_id is not None:
+                self.journal.record(run_name, "submitted", job=job_name)
+                return subprocess.CompletedProcess([script_path, job_name], 0, stderr="",
+                                                   stdout=f"{run_name} has already been submitted as job {job_id}.\n")
+        result = self.backend.submit(script_path, job_name, run_name=run_name)
+        self.journal.record(run_name, "submitted" if result.returncode == 0 else "failed", job=job_name)
+        return result
+
+    def _unrecorded_job(self, run_name, job_name=None):
+        """
+        Looks for a job of the run that has been submitted, but not recorded in the journal, e.g. because the
+        process died right after sbatch returned. The job registry has the jobs of SlurmBackend as soon as their
+        id is known, a job that is not in the registry is found in the queue by job_name. Restarts of the same run
+        share the job_name, so it is only looked up in the queue if it is given. A submission is still missed if
+        the process died before the job was registered and the job has left the queue since.
+
+        Returns:
+            str: The id of the job, "" if it was only found in the queue, or None if the run has to be submitted.
+        """
+        from job_registry import JobRegistry, FINAL_STATES
+        registry = JobRegistry(LOGPATH)
+        job = registry.last_job(run_name)
+        if job is not None and job["state"] not in FINAL_STATES:
+            registry.update([job["job_id"]])
+            job = registry.last_job(run_name)
+        if job is not None and job["state"] in FINAL_STATES and job["state"] != "COMPLETED":
+            # the last job has failed, the run is submitted again
+            return None
+        if job is not None:
+            return job["job_id"]
+        if job_name is not None and self.backend.is_running(job_name):
+            return ""
+        return None
+
+    def _export_and_log(self, run_name):
+        """Exports the parameters and writes the log if self.export and self.log are True respectively."""
+        self._log(run_name, self._export(run_name))
+
+    def _export(self, run_name):
+        """
+        Exports the parameters if self.export is True and returns the record of the run for the log if self.log
+        is True, so that the run can be logged with _log once its job has been submitted.
+        """
         if self.export:
-            mod.export_parameters(log_name)
+            self.mod.export_parameters(run_name)
+        return self.mod.log_record(run_name) if self.log else None
+
+    def _log(self, run_name, record):
+        """Writes the record of _export to the log and records in the journal that the run has been logged."""
         if self.log:
-            mod.write_log(log_name)
+            self.mod.write_log(run_name, record=record)
+        if self.export or self.log:
+            self.journal.record(run_name, "logged")
+
+    def _runs_to_resume(self, runs, on_submitted=None):
+        """
+        Yields the runs of a series that have not been submitted yet according to the journal, one after the
+        other. Runs that are not in the journal and whose names are duplicates are skipped, the others are recorded
+        as prepared. Runs that have been submitted, but not logged, e.g. because the process died right after the
+        submission, are yielded as well, so that they are logged, but they must not be submitted again.
+
+        Args:
+            runs (dict or iterable): The runs of the series or their (name, parameters) pairs.
+            on_submitted (function, optional): Is called with the name of every run that has already been
+            submitted and with its entry in the journal. Defaults to None.
+        """
+        journal_runs = self.journal.runs()
+        for run_name, parameters in (runs.items() if isinstance(runs, dict) else runs):
+            if self.journal.done(run_name, "submitted", journal_runs):
+                if on_submitted is not None:
+                    on_submitted(run_name, journal_runs[run_name])
+                if self.journal.done(run_name, "logged", journal_runs) or not (self.export or self.log):
+                    print(f"{run_name} has already been submitted, see the journal of the series {self.series_name}.")
+                    continue
+                print(f"{run_name} has already been submitted, but it has not been logged yet.")
+                yield run_name, parameters
+                continue
+            #check the name before the folder is created
+            self.run_name = run_name
+            if run_name not in journal_runs:
+                if self.run_name_is_duplicate():
+                    print(f"{run_name} is skipped since its name is a duplicate.")
+                    continue
+                self.journal.record(run_name, "prepared")
+            yield run_name, parameters
+
+    def run_series(self, runs, workers=8):
+        """
+        Renders a job script for every run into its folder and starts a EULAG job with it. Unlike
+        modify_file_and_run_eulag, SOURCEPATH is not modified, so an aborted series does not leave it
+        changed. The scripts are rendered one after the other, while up to workers jobs are submitted at the
+        same time by a pool of threads. The parameters are exported right after a script is rendered, if
+        self.export is True, and the run is logged once its job has been submitted, if self.log is True. The log
+        is only written by the main thread.
+        Runs that have already been submitted according to the journal of the series are not submitted again, only
+        logged if that has not been done, so an interrupted series is resumed by calling the method again.
+
+        Args:
+            runs (dict or iterable): The name of every run and a dictionary with the key_names and values of its
+            parameters or the (name, parameters) pairs one after the other, e.g. of Sweep.runs.
+            workers (int, optional): The number of jobs that are submitted at the same time. Defaults to 8.
+        """
+        import re
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        mod = self.mod
+        journal_runs = self.journal.runs()
+        runs = self._runs_to_resume(runs)
+
+        submissions = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for run_name, script_path in mod.render_runs(runs):
+                # get rid of the restart prefix
+                job_name = re.sub(fr"RESTAR[^_]+_", "", run_name)
+                #export the parameters, unless it was done before the series was interrupted
+                logged = self.journal.done(run_name, "logged", journal_runs)
+                record = None if logged else self._export(run_name)
+                if self.journal.done(run_name, "submitted", journal_runs):
+                    # the job was submitted before the series was interrupted, the run is only logged
+                    self._log(run_name, record)
+                elif self.reuse_existing_run(run_name):
+                    self.journal.record(run_name, "reused")
+                    if not logged:
+                        self._log(run_name, record)
+                else:
+                    #run the job, the output is printed and the run is logged when the submission is done
+                    submission = executor.submit(self._submit, script_path, run_name, job_name,
+                                                 run_name in journal_runs)
+                    submissions[submission] = (run_name, job_name, logged, record)
+
+            for submission in as_completed(submissions):
+                run_name, job_name, logged, record = submissions[submission]
+                try:
+                    result = submission.result()
+                except OSError as e:
+                    print(f"ERROR: The job {job_name} could not be started: {e}")
+                    continue
+                print(result.stdout, end="")
+                if result.returncode != 0:
+                    print(f"ERROR: The job {job_name} could not be started: {result.stderr}")
+                    continue
+                if not logged:
+                    self._log(run_name, record)
+                print("EULAG JOB STARTED:", job_name)
+                print("---------------------------------")
+                print("")
+                print("")
+
+        #write the wide log file once for the whole series
+        if self.log:
+            RunLog(LOGPATH).compact()
+
+    def _start_job(self, script_path, run_name, job_name, on_submitted=None, resumed=False):
+        """
+        Submits the job script with the backend and raises an error if it could not be started. on_submitted is
+        called without arguments once the job has been submitted, e.g. to log the run.
+        """
+        result = self._submit(script_path, run_name, job_name, resumed)
+        print(result.stdout, end="")
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        if on_submitted is not None:
+            on_submitted()
+
+    def _has_failed(self, scheduler, run_name, job_name, on_done, priority=0):
+        """
+        Returns True if the last job of the run has failed and False if it has not, see ExecutionBackend.has_failed.
+        If its final state is not known yet, e.g. because sacct still has it as COMPLETING, None is returned and a
+        job that only waits is put into the scheduler with on_done, so that the state is checked again with the next
+        tick. After MAX_STATE_CHECKS checks the job is taken as not failed.
+        """
+        failed = self.backend.has_failed(run_name, job_name)
+        checks = self._state_checks.pop(run_name, 0) + 1
+        if failed is not None:
+            return failed
+        if checks >= MAX_STATE_CHECKS:
+            print(f"Warning: The final state of the job of {run_name} is unknown, it is taken as not failed.")
+            return False
+        self._state_checks[run_name] = checks
+        scheduler.submit(job_name, lambda: None, priority, on_done=on_done, wait_only=True)
+        return None
+
+    def schedule_series(self, runs, scheduler, priority=0):
+        """
+        Renders a job script for every run into its folder like run_series, but puts the submission of the jobs
+        into the queue of the scheduler, which starts them when fewer than its max_in_flight jobs are running.
+        The parameters are exported right after a script is rendered and the run is logged when its job has been
+        submitted. When the series is resumed, the runs that have been submitted but have not finished according
+        to the journal are only waited for.
+
+        Args:
+            runs (dict or iterable): The name of every run and a dictionary with the key_names and values of its
+            parameters or the (name, parameters) pairs one after the other, e.g. of Sweep.runs.
+            scheduler (JobScheduler): The scheduler the jobs are put into.
+            priority (int, optional): The priority of the jobs in the scheduler. Defaults to 0.
+        """
+        import re
+        from functools import partial
+        mod = self.mod
+        # the scheduler asks the backend of the simulation which jobs are still running and how they ended
+        scheduler.running_job_names = self.backend.running_job_names
+        scheduler.active_job_names = self.backend.active_job_names
+        scheduler.update_states = self.backend.update_states
+        journal_runs = self.journal.runs()
+
+        # the wide log file is written once when the scheduler has run all jobs
+        if self.log and compact_log not in scheduler.on_finished:
+            scheduler.on_finished.append(compact_log)
+
+        def finished(run_name):
+            def on_done(job):
+                if job.state == "timeout":
+                    # the job may still be running, it is waited for again when the series is resumed
+                    print(f"The job of {run_name} is no longer tracked, resume the series to wait for it again.")
+                    return
+                failed = self._has_failed(scheduler, run_name, job.name, on_done, priority)
+                if failed is None:
+                    return
+                if failed:
+                    print(f"ERROR: The job of {run_name} has failed, it is submitted again when the series is resumed.")
+                    self.journal.record(run_name, "failed", job=job.name)
+                else:
+                    self.journal.record(run_name, "finished")
+            return on_done
+
+        def wait_for(run_name, journal_run):
+            # a run that has been submitted but has not finished is only waited for
+            if not self.journal.done(run_name, "finished", {run_name: journal_run}):
+                scheduler.submit(journal_run.get("job", run_name), lambda: None, priority, on_done=finished(run_name),
+                                 wait_only=True)
+        runs = self._runs_to_resume(runs, on_submitted=wait_for)
+
+        for run_name, script_path in mod.render_runs(runs):
+            # get rid of the restart prefix
+            job_name = re.sub(fr"RESTAR[^_]+_", "", run_name)
+            #export the parameters and log the run when it is submitted, unless it was done before the series was
+            #interrupted
+            on_submitted = None
+            if not self.journal.done(run_name, "logged", journal_runs):
+                on_submitted = partial(self._log, run_name, self._export(run_name))
+            if self.journal.done(run_name, "submitted", journal_runs):
+                # the job was submitted before the series was interrupted and is waited for, the run is only logged
+                on_submitted()
+                continue
+            scheduler.submit(job_name, partial(self._start_job, script_path, run_name, job_name, on_submitted,
+                                               run_name in journal_runs), priority, on_done=finished(run_name))
 
     def restart_runs(self, restart_number = None):
         """
@@ -169,7 +518,9 @@ class Simulation():
         #import the parameters from the archive
         mod = self.mod
         beginning_run_name = self.series_name
+        journal_runs = self.journal.runs()
         full_dir_path = {}
+        # the folders are listed, since runs that were not logged or copied into the outpath are not in the catalog
         for folder in os.listdir(OUTPATH):
             if not folder.startswith(beginning_run_name):
                 continue    
@@ -181,12 +532,21 @@ class Simulation():
             quit()
 
         for folder, dir in full_dir_path.items():
+            #check if the restart has been submitted before the series was interrupted, if it has not been logged
+            #modify_file_and_run_eulag logs it
+            restart_name = f"RESTART{restart_number}_{folder}"
+            submitted = self.journal.done(restart_name, "submitted", journal_runs)
+            if submitted and self.journal.done(restart_name, "logged", journal_runs):
+                print(f"Run {folder} has already been restarted")
+                continue
             #check if run is already running
-            if check_if_job_is_running(folder):
+            if not submitted and self.backend.is_running(folder):
                 print(f"Run {folder} is already running")
                 continue
             
-            mod.import_parameters(dir)
+            imported = mod.import_parameters(dir, quiet=True)
+            if not imported.ok:
+                print(imported.summary())
             #set parameters for restart
             mod.add_para("nt", '20*200')
             mod.add_para("nplot", '5*200')
@@ -209,8 +569,12 @@ class Simulation():
             mod.add_para("iwrite0", 1)
             mod.add_para("TURBST", 1) #Disable timeadapt if TURBST is 1!
 
-            self.run_name = f"RESTART{restart_number}_{folder}"
-            self.modify_file_and_run_eulag()
+            self.run_name = restart_name
+            self.modify_file_and_run_eulag(compact_log=False)
+
+        #write the wide log file once for all restarts
+        if self.log:
+            RunLog(LOGPATH).compact()
 
     def no_mod_just_run(self):
         """
@@ -219,6 +583,29 @@ class Simulation():
         self.modify = False
         self.modify_file_and_run_eulag()
         
+    def run_sweep(self, sweep, workers=8, scheduler=None):
+        """
+        Runs all runs of a sweep with run_series. The parameters are imported from sweep.start_from and the
+        base of the sweep is set before, on top of the parameters that have already been added.
+
+        Args:
+            sweep (Sweep): The sweep, see sweep.py.
+            workers (int, optional): The number of jobs that are submitted at the same time. Defaults to 8.
+            scheduler (JobScheduler, optional): If given, the jobs are put into the queue of the scheduler with
+            schedule_series instead of being submitted right away. Defaults to None.
+        """
+        mod = self.mod
+        if sweep.start_from is not None:
+            path = sweep.start_from if sweep.start_from[-4:] == ".csv" else OUTPATH + sweep.start_from
+            imported = mod.import_parameters(path, quiet=True)
+            print(imported.summary())
+        for key_name, value in sweep.base.items():
+            mod.add_para(key_name, value)
+        if scheduler is not None:
+            self.schedule_series(sweep.runs(), scheduler)
+        else:
+            self.run_series(sweep.runs(), workers)
+
     def rerun_with_modified_params(self, old_run_name):
         """
         Reruns a single run with modified parameters.
@@ -226,26 +613,13 @@ class Simulation():
         Args:
             old_run_name (str): The name of the run to be rerun.
         """
-        mod = self.mod
-    
-        mod.import_parameters(OUTPATH + old_run_name)
-        
         # modify the parameters here
         
         # # EXAMPLE:
-        # mod.add_para("nt", '1')
-        # mod.add_para("nplot", '1')
-        # mod.add_para("nstore", '1')
-        # mod.add_para("noutp", '1')
+        # base={"nt": '1', "nplot": '1', "nstore": '1', "noutp": '1'}
         TOWZ = [100, 200]
         ZAB = [150, 200]
-        run_name = self.run_name
-        for towz in TOWZ:
-            for zab in ZAB:
-                mod.add_para("towz", towz)
-                mod.add_para("zab", zab)
-                self.run_name = run_name + f"_towz{towz}_zab{zab}"
-                self.modify_file_and_run_eulag()
+        self.run_sweep(Sweep(self.run_name, {"towz": TOWZ, "zab": ZAB}, start_from=old_run_name))
         
     def test_series_courant_number(self):
         """
@@ -258,139 +632,334 @@ class Simulation():
         # list of courant numbers to be tested
         CRN =  [0.65, 0.75]#[0.9, 0.8, 0.7, 0.6, 0.5, 0.4]
         
-        mod = self.mod
-        mod.add_para("TKE", 0)
-        mod.add_para("timeadapt", 1)
-        mod.add_para("dt00", 0.5)
-        mod.add_para("ideep", 0)
-        mod.add_para("nt", '9*60*60')
-        mod.add_para("nplot", '30*60')
-        mod.add_para("nstore", '10*60*60')
-        mod.add_para("noutp", '20*60')
-        
-        
-        for crn in CRN:
-            #change the noise amplitude
-            mod.add_para("cour_max_allowed", crn)
-            #name of the run
-            self.run_name = NAME_OF_SERIES + "_crn" + str(crn).replace(".", "dot")
-            self.modify_file_and_run_eulag()
+        base = {"TKE": 0, "timeadapt": 1, "dt00": 0.5, "ideep": 0,
+                "nt": '9*60*60', "nplot": '30*60', "nstore": '10*60*60', "noutp": '20*60'}
+        self.run_sweep(Sweep(NAME_OF_SERIES, {"cour_max_allowed": CRN}, base, labels={"cour_max_allowed": "crn"}))
 
 
     def test_series_different_nois_ampns(self):
         """
         Runs a series of EULAG runs with different noise amplitudes.
         """    
-        mod = self.mod        
         NAME_OF_SERIES = self.series_name
     
         
         AMPNS = [0.3, 1.8, 3.0, 4.0]
         rghn = 0.0
         
-        mod.import_parameters(OUTPATH + "DIANA_rghn0dot0_ampns1dot4")
-        mod.add_para("TKE", 0)
-        mod.add_para("SGS", 0)
-        mod.add_para("rghn", rghn) 
-
-        for ampns in AMPNS:
-            #change the noise amplitude
-            mod.add_para("ampns", ampns)
-
-            #name of the run
-            self.run_name = NAME_OF_SERIES  + "_rghn" + str(rghn).replace(".", "dot") + "_ampns" + str(ampns).replace(".", "dot")
-            self.modify_file_and_run_eulag()
+        self.run_sweep(Sweep(NAME_OF_SERIES, {"rghn": [rghn], "ampns": AMPNS}, {"TKE": 0, "SGS": 0},
+                             start_from="DIANA_rghn0dot0_ampns1dot4"))
 
     def test_series_different_rghn(self):
         """
         Runs a series of EULAG runs with different rghn values.
         """    
-        mod = self.mod
         NAME_OF_SERIES = self.series_name
         
         RGHN_SERIES = [0.3, 0.0001, 0.00005, 0.7]
         ampns = 0
         
-        mod.import_parameters(OUTPATH + "DIANA_rghn0dot0_ampns1dot4")
-        mod.add_para("TKE", 1)
-        mod.add_para("SGS", 1)
-        mod.add_para("ampns", ampns) 
-        
-        
-        for rghn in RGHN_SERIES:
-            #change the noise amplitude
-            mod.add_para("rghn", rghn)
-            #name of the run
-            self.run_name = NAME_OF_SERIES + "_ampns" + str(ampns).replace(".", "dot") + "_rghn" + str(rghn).replace(".", "dot")
-            self.modify_file_and_run_eulag
+        self.run_sweep(Sweep(NAME_OF_SERIES, {"ampns": [ampns], "rghn": RGHN_SERIES}, {"TKE": 1, "SGS": 1},
+                             start_from="DIANA_rghn0dot0_ampns1dot4"))
 
-    def convergence_test(self, old_run_name, first_iteration = 1):
+    def convergence_test(self, old_run_name, first_iteration = 1, scheduler = None, chain = False):
         """
         Runs a EULAG run that is restarted multiple times to get a different
         turbs file for each restart. Comparing the quantities of interest in the
         different turbs files can give an idea of the convergence of the simulation.
+        Every restart is put into the queue of the scheduler when the previous run has finished.
+        The runs are recorded in the journal of the series. If the test has been interrupted, calling the method
+        again resumes it at the last run in the journal instead of first_iteration: a run that has been submitted
+        is waited for, a run that has finished is processed and a run that could not be submitted is started again.
 
         Args:
             run_name (str): The name of the run.
             old_run_name (str): The name of the file to load the parameters from.
             first_iteration (int, optional): The number of the first iteration. Defaults to 1.
+            scheduler (JobScheduler, optional): The scheduler the runs are put into. Then the method returns right
+            away and the runs start when the scheduler runs. Defaults to None, in which case a scheduler is
+            created and run until the last restart has finished.
+            chain (bool, optional): Submit all restarts at once as a chain of Slurm jobs with
+            submit_restart_chain instead. Defaults to False.
         """    
-        import time as t
-        from cluster_handling import pause_until_next_job_can_start
+        if chain:
+            self.submit_restart_chain(old_run_name, first_iteration)
+            return
+        import os
         from cluster_handling import rename_turbs_file
         from cluster_handling import copy_tapef_file
 
         mod = self.mod
+        journal = self.journal
         run_name = self.run_name
+        run_scheduler = scheduler is None
+        if run_scheduler:
+            scheduler = JobScheduler()
+        scheduler.running_job_names = self.backend.running_job_names
+        scheduler.active_job_names = self.backend.active_job_names
+        scheduler.update_states = self.backend.update_states
+
+        def start_first_run():
+            # if the test is started from the very beginning the first run is a 'normal' run
+            self._convergence_test_params(old_run_name, first_iteration)
+            self.modify_file_and_run_eulag()
+
+        def start_restart(i):
+            def start():
+                restart_run_name = f"RESTART{i}_{run_name}"
+                self.run_name = restart_run_name
+                # set the following runs as restarts
+                mod.add_para("irst", 1)
+                # disable the export and log for the restarts
+                self.export = False
+                self.log = False 
+
+                mod.add_para("nfil", i)
+                mod.add_para("nfilm", i-1)
+
+                # export the parameters of the first restart run
+                if i == first_iteration + 1 and not journal.done(restart_run_name, "logged"):
+                    mod.export_parameters(restart_run_name)
+                    journal.record(restart_run_name, "logged")
+                
+                # modify the source code an run the sim
+                self.modify_file_and_run_eulag()
+            return start
+
+        def file_management(i):
+            def on_done(job):
+                iteration_run_name = run_name if i == 1 else f"RESTART{i}_{run_name}"
+                if job is not None and job.state == "timeout":
+                    print(f"The job of {iteration_run_name} is no longer tracked, the convergence test stops here. "
+                          f"Resume it to wait for the job again.")
+                    return
+                # the test stops at a failed run, it is started again when the test is resumed
+                failed = self._has_failed(scheduler, iteration_run_name, run_name, on_done)
+                if failed is None:
+                    return
+                if failed:
+                    print(f"ERROR: The job of {iteration_run_name} has failed, the convergence test stops here.")
+                    journal.record(iteration_run_name, "failed", job=run_name)
+                    return
+                journal.record(iteration_run_name, "finished")
+                # the turbs file has already been renamed if the test was interrupted right afterwards
+                if not os.path.exists(os.path.join(OUTPATH, run_name, f"turbs{i}.nc")):
+                    rename_turbs_file(run_name, i)
+                copy_tapef_file(run_name, i)
+                journal.record(iteration_run_name, "processed")
+                # the next restart starts when this run has finished
+                if i + 1 < 36:
+                    scheduler.submit(run_name, start_restart(i + 1), on_done=file_management(i + 1))
+            return on_done
+
+        # the restarts run in the folder of the run, so all jobs have the name of the run
+        i = self._convergence_test_progress(run_name)
+        if i is not None:
+            iteration_run_name = run_name if i == 1 else f"RESTART{i}_{run_name}"
+            journal_runs = journal.runs()
+            print(f"The convergence test {run_name} is resumed at {iteration_run_name} "
+                  f"({', '.join(journal_runs[iteration_run_name]['steps'])}).")
+            # the job script may have been changed since, so the parameters of the first run are imported again
+            if os.path.isfile(os.path.join(OUTPATH, run_name, "parameters.csv")):
+                mod.import_parameters(OUTPATH + run_name, quiet=True)
+            if journal.done(iteration_run_name, "processed", journal_runs):
+                if i + 1 < 36:
+                    scheduler.submit(run_name, start_restart(i + 1), on_done=file_management(i + 1))
+            elif journal.done(iteration_run_name, "finished", journal_runs):
+                file_management(i)(None)
+            elif journal.done(iteration_run_name, "submitted", journal_runs):
+                # the job is only waited for, it is not submitted again
+                scheduler.submit(run_name, lambda: None, on_done=file_management(i), wait_only=True)
+            else:
+                scheduler.submit(run_name, start_first_run if i == 1 else start_restart(i), on_done=file_management(i))
+        elif first_iteration == 1:
+            scheduler.submit(run_name, start_first_run, on_done=file_management(first_iteration))
+        else:
+            scheduler.submit(run_name, start_restart(first_iteration + 1), on_done=file_management(first_iteration + 1))
+        if run_scheduler:
+            scheduler.run()
+
+    def _convergence_test_progress(self, run_name):
+        """
+        Returns the last iteration of the convergence test in the journal or None if the test is not in the
+        journal. The first run is iteration 1, the restarts are named RESTART<iteration>_<run_name>.
+        """
+        journal_runs = self.journal.runs()
+        for i in range(35, 1, -1):
+            if f"RESTART{i}_{run_name}" in journal_runs:
+                return i
+        if run_name in journal_runs:
+            return 1
+        return None
+
+
+    def _convergence_test_params(self, old_run_name, first_iteration):
+        """Sets the parameters of the first run of the convergence test."""
+        mod = self.mod
+        imported = mod.import_parameters(OUTPATH + old_run_name, quiet=True)
+        print(imported.summary())
+        mod.add_para("TURBST", 1)
+        mod.add_para("timeadapt", 0)
+        mod.add_para("dt00", 0.3)
+        mod.add_para("nt", '20*200')
+        mod.add_para("nplot", '5*200')
+        mod.add_para("nstore", '10*200')
+        mod.add_para("noutp", '5*200')
+        mod.add_para("irst", 0)
+        mod.add_para("iwrite0", 0)
+        mod.add_para("nfil", first_iteration)
+        mod.add_para("nfilm", first_iteration - 1)
+
+    def submit_restart_chain(self, old_run_name, first_iteration = 1, last_iteration = 35, sbatch_options = ()):
+        """
+        Submits the whole convergence test at once: the first run and all restarts are rendered and submitted
+        one after the other, every job depends on the previous one (afterok). After every run the turbs and turbf
+        file are renamed and the tape file is copied. If the job script has a FILE_MANAGEMENT_LINE (see
+        cluster_handling.insert_file_management), the batch job does this itself at its end, otherwise a small job
+        does it and the next restart depends on that one. The job script passes the dependency to sbatch through
+        the environment variable SBATCH_DEPENDENCY.
+        Every restart gets a job script of its own, restart<i>_<script>, since the restarts are submitted before
+        the previous runs have finished. For the same reason the job script must not overwrite other files a
+        waiting job still needs, e.g. by compiling into the run folder at submission.
+        With src/fake_slurm in the PATH the chain can be tested without Slurm.
+        The job ids are recorded in the journal of the series and the file management jobs are added to the job
+        registry as FILES_<run>. If the submission has been interrupted, calling the method again continues the
+        chain after the last job in the journal, jobs that have been submitted but not recorded are taken from the
+        job registry instead of being submitted again.
+
+        Args:
+            old_run_name (str): The name of the file to load the parameters from.
+            first_iteration (int, optional): The number of the first iteration. Defaults to 1.
+            last_iteration (int, optional): The number of the last restart. Defaults to 35.
+            sbatch_options (tuple, optional): Further options of sbatch for the file management jobs. Defaults to ().
+
+        Returns:
+            list: The ids of the submitted jobs.
+        """
+        import os
+        import re
+        from cluster_handling import parse_job_id, submit_file_management, insert_file_management
+        from job_registry import JobRegistry
+
+        if self.backend.name != "slurm":
+            print(f"ERROR: A chain of jobs can only be submitted to Slurm, not with the {self.backend.name} backend.")
+            return []
+
+        mod = self.mod
+        run_name = self.run_name
+        journal = self.journal
+        journal_runs = journal.runs()
+        runs = {}
+        iterations = {}
         # if the test is started from the very beginning the first run is a 'normal' run
         if first_iteration == 1:
-            mod.import_parameters(OUTPATH + old_run_name)
-            mod.add_para("TURBST", 1)
-            mod.add_para("timeadapt", 0)
-            mod.add_para("dt00", 0.3)
-            mod.add_para("nt", '20*200')
-            mod.add_para("nplot", '5*200')
-            mod.add_para("nstore", '10*200')
-            mod.add_para("noutp", '5*200')
-            mod.add_para("irst", 0)
-            mod.add_para("iwrite0", 0)
-            mod.add_para("nfil", first_iteration)
-            mod.add_para("nfilm", first_iteration - 1)
-            self.modify_file_and_run_eulag()
-            
-            # wait for the first run to finish
-            pause_until_next_job_can_start(run_name)
-            rename_turbs_file(run_name, first_iteration)
-            copy_tapef_file(run_name, first_iteration)
-        
-        # set the following runs as restarts
-        mod.add_para("irst", 1)
-        
-        # disable the export and log for the restarts
-        self.export = False
-        self.log = False 
-        
-        # start the loop for the following runs
-        for i in range(first_iteration + 1, 36):
-            restart_run_name = f"RESTART{i}_{run_name}"
-            self.run_name = restart_run_name
-            
-            mod.add_para("nfil", i)
-            mod.add_para("nfilm", i-1)
+            if run_name not in journal_runs:
+                if self.run_name_is_duplicate():
+                    return []
+                journal.record(run_name, "prepared")
+            runs[run_name] = {}
+            iterations[run_name] = first_iteration
+        if journal.done(run_name, "submitted", journal_runs) and journal.done(run_name, "logged", journal_runs):
+            # the chain is resumed, the restarts get the parameters of the first run
+            mod.import_parameters(OUTPATH + run_name, quiet=True)
+        elif first_iteration == 1:
+            self._convergence_test_params(old_run_name, first_iteration)
+        for i in range(first_iteration + 1, last_iteration + 1):
+            runs[f"RESTART{i}_{run_name}"] = {"irst": 1, "nfil": i, "nfilm": i - 1}
+            iterations[f"RESTART{i}_{run_name}"] = i
 
-            # export the parameters of the first restart run
-            if i == first_iteration + 1:
-                mod.export_parameters(restart_run_name)
-            
-            # modify the source code an run the sim
-            self.modify_file_and_run_eulag(export=False, log=False)
+        def log(chain_run_name):
+            # the first run is exported and logged, the restarts only export the parameters of the first restart
+            if journal.done(chain_run_name, "logged", journal_runs):
+                pass
+            elif chain_run_name == run_name:
+                self._export_and_log(run_name)
+            elif iterations[chain_run_name] == first_iteration + 1:
+                mod.export_parameters(chain_run_name)
+                journal.record(chain_run_name, "logged")
 
-            # wait until the job is finished
-            pause_until_next_job_can_start(run_name)
-            
-            # file managment
-            rename_turbs_file(run_name, i)
-            copy_tapef_file(run_name, i)
+        job_ids = []
+
+        def manage_files(chain_run_name, job_name, job_id):
+            # the file management job is registered like the runs, so that it is found if the chain is resumed
+            files_run_name = f"FILES_{chain_run_name}"
+            dependency = self._unrecorded_job(files_run_name)
+            if dependency is None:
+                dependency = submit_file_management(job_name, iterations[chain_run_name], job_id, sbatch_options)
+                if dependency is None:
+                    return None
+                JobRegistry(LOGPATH).add_job(dependency, files_run_name, job_name)
+            journal.record(chain_run_name, "submitted", file_management=dependency)
+            job_ids.append(dependency)
+            return dependency
+
+        dependency = None
+        # the runs that have been submitted before the chain was interrupted are skipped
+        for chain_run_name in list(runs):
+            if not journal.done(chain_run_name, "submitted", journal_runs):
+                break
+            run = journal_runs[chain_run_name]
+            if not journal.done(chain_run_name, "logged", journal_runs):
+                # the process died right after the submission, the run is logged with the parameters of its script
+                lines_to_modify = mod.lines_to_modify
+                mod.lines_to_modify = dict(lines_to_modify)
+                try:
+                    for key_name, value in runs[chain_run_name].items():
+                        mod.add_para(key_name, value)
+                    log(chain_run_name)
+                finally:
+                    mod.lines_to_modify = lines_to_modify
+            dependency = run.get("file_management")
+            if dependency is None:
+                dependency = manage_files(chain_run_name, run["job"], run["job_id"])
+                if dependency is None:
+                    print(f"ERROR: The file management after {chain_run_name} could not be submitted.")
+                    # nothing else is submitted
+                    runs.clear()
+                    break
+            del runs[chain_run_name]
+            print(f"{chain_run_name} has already been submitted, the chain continues after {dependency}.")
+
+        for chain_run_name, script_path in mod.render_runs(runs):
+            i = iterations[chain_run_name]
+            # get rid of the restart prefix
+            job_name = re.sub(fr"RESTAR[^_]+_", "", chain_run_name)
+            epilogue = insert_file_management(script_path, job_name, i)
+            # the restarts share the name of the job, so the job is only looked up in the job registry
+            job_id = self._unrecorded_job(chain_run_name)
+            if job_id is not None:
+                print(f"{chain_run_name} has already been submitted as job {job_id}.")
+            else:
+                environment = dict(os.environ)
+                if dependency is not None:
+                    environment["SBATCH_DEPENDENCY"] = f"afterok:{dependency}"
+                process = self.backend.submit(script_path, job_name, env=environment, run_name=chain_run_name)
+                print(process.stdout, end="")
+                job_id = parse_job_id(process.stdout)
+                if process.returncode != 0 or job_id is None:
+                    journal.record(chain_run_name, "failed", job=job_name)
+                    print(process.stderr, end="")
+                    print(f"ERROR: The job {chain_run_name} could not be submitted, the chain stops here.")
+                    break
+                print(f"EULAG JOB SUBMITTED: {chain_run_name} ({job_id}, after {dependency})")
+            journal.record(chain_run_name, "submitted", job=job_name, job_id=job_id)
+            job_ids.append(job_id)
+            log(chain_run_name)
+
+            if epilogue:
+                # the job does the file management itself, the next restart only depends on it
+                dependency = job_id
+                journal.record(chain_run_name, "submitted", file_management=dependency)
+                continue
+            dependency = manage_files(chain_run_name, job_name, job_id)
+            if dependency is None:
+                print(f"ERROR: The file management after {chain_run_name} could not be submitted, the chain stops here.")
+                break
+
+        #write the wide log file once for the chain
+        if self.log:
+            RunLog(LOGPATH).compact()
+        return job_ids
 
 
 if __name__ == "__main__":
@@ -415,4 +984,13 @@ if __name__ == "__main__":
     #sim.test_series_different_nois_ampns()
     #sim.test_series_different_rghn()
     #sim.convergence_test("DIANA_rghn0dot0_ampns1dot4", 1)
+    #sim.run_sweep(Sweep.from_file("my_sweep.toml"))
+    #scheduler = JobScheduler(max_in_flight=4)
+    #sim.run_sweep(Sweep.from_file("my_sweep.toml"), scheduler=scheduler)
+    #sim.convergence_test("DIANA_rghn0dot0_ampns1dot4", 1, scheduler)
+    #scheduler.run()
+    #small series on the local machine, two jobs at the same time with four cores each
+    #from execution_backend import LocalBackend
+    #sim = Simulation("DIANA", backend=LocalBackend(max_jobs=2, cores_per_job=4))
+    #sim.run_sweep(Sweep.from_file("my_sweep.toml"))
 
@@ -0,0 +1,193 @@
+"""
+Checks if the saved configurations still fit the job script, e.g. after the job script has changed. Every
+configuration in CONFIGPATH and every parameters.csv in the run folders in OUTPATH is imported and all of its
+parameters are searched in the job script like modify_file would do it. The configurations whose parameters are all
+found are rendered to a temporary file like the diff command of the parameter service does it, so that a value that
+can not be substituted is found as well. The job script itself is not written.
+The job script is read and indexed once and the index is shared with the worker processes, which check the
+configurations in parallel.
+"""
+import io
+import os
+import csv
+import tempfile
+import contextlib
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from read_write_automation import FileModifier
+from source_index import SourceIndex
+from config.config import SOURCEPATH, OUTPATH, CONFIGPATH
+
+# the index of the job script in a worker process, set by _init_worker
+_index = None
+
+
+def find_configs(configpath=CONFIGPATH, outpath=OUTPATH) -> list:
+    """
+    Returns the paths of all configurations: the csv files in configpath that were written by export_parameters
+    and the parameters.csv files of the run folders in outpath.
+
+    Args:
+        configpath (str, optional): The config folder. Defaults to CONFIGPATH.
+        outpath (str, optional): The folder of the run folders. Defaults to OUTPATH.
+    """
+    paths = []
+    if os.path.isdir(configpath):
+        for file_name in sorted(os.listdir(configpath)):
+            path = os.path.join(configpath, file_name)
+            if file_name.endswith(".csv") and _is_config(path):
+                paths.append(path)
+    if os.path.isdir(outpath):
+        for folder in sorted(os.listdir(outpath)):
+            path = os.path.join(outpath, folder, "parameters.csv")
+            if os.path.isfile(path):
+                paths.append(path)
+    return paths
+
+
+def _is_config(path):
+    # the config folder also holds the log, the files of export_parameters start with "Changed parameters"
+    try:
+        with open(path, "r", newline="") as csvfile:
+            return next(csv.reader(csvfile), []) == ["Changed parameters"]
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def _read_line_numbers(path):
+    """Returns the key_names of a configuration and the line numbers that were saved with them."""
+    line_numbers = {}
+    with open(path, "r", newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)
+        header = next(reader, [])
+        key_name_index = header.index("key_name") if "key_name" in header else header.index("para_name")
+        line_number_index = header.index("line_number")
+        for row in reader:
+            if len(row) <= max(key_name_index, line_number_index) or row[0] in ["line", "line_number"]:
+                continue
+            line_numbers[row[key_name_index]] = row[line_number_index]
+    return line_numbers
+
+
+def _init_worker(index):
+    global _index
+    _index = index
+
+
+def validate_config(path) -> dict:
+    """
+    Imports a configuration and searches all of its parameters in the indexed job script of the worker. If all of
+    them are found once, the configuration is rendered to a temporary file to check that every value can be substituted.
+
+    Args:
+        path (str): The path to the configuration.
+
+    Returns:
+        dict: The path, the number of keys, the unresolved keys with the reason, the ambiguous keys with the
+        two lines they are found in, the keys whose line number has changed with the old and new line number
+        and an error message if the configuration or some of its rows can not be read or it can not be rendered.
+    """
+    result = {"path": path, "keys": 0, "unresolved": [], "ambiguous": [], "moved": [], "error": None}
+    mod = FileModifier(use_template=False)
+    try:
+        line_numbers = _read_line_numbers(path)
+        imported = mod.import_parameters(path, quiet=True)
+    except (OSError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+    if imported.errors:
+        result["error"] = " ".join(imported.errors)
+
+    result["keys"] = len(line_numbers)
+    result["unresolved"] += [(key_name, "not in archive") for key_name in imported.unknown_keys]
+    result["unresolved"] += [(key_name, "no value") for key_name in imported.missing_values]
+
+    for key_name, line_obj in mod.lines_to_modify.items():
+        hits = [i + 1 for i, _ in islice(mod._find_lines(line_obj, _index), 2)]
+        if not hits:
+            result["unresolved"].append((key_name, "not found"))
+        elif len(hits) > 1:
+            result["ambiguous"].append((key_name, *hits))
+        elif line_numbers.get(key_name, "") not in ("", str(hits[0])):
+            result["moved"].append((key_name, line_numbers[key_name], hits[0]))
+
+    if not result["unresolved"] and not result["ambiguous"]:
+        render_error = _render(mod)
+        if render_error:
+            result["error"] = f"{result['error']} {render_error}" if result["error"] else render_error
+    return result
+
+
+def _render(mod):
+    """Renders the configuration to a temporary file and returns why it failed or None if it was rendered."""
+    mod.lines_to_read = {}
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output), tempfile.TemporaryDirectory() as directory:
+            mod._modify_lines(list(_index.lines), os.path.join(directory, "validate.csh"), in_place=False)
+    except SystemExit:
+        warnings = [line for line in output.getvalue().splitlines() if line.startswith("Warning")]
+        return f"Render failed: {warnings[-1] if warnings else 'the FileModifier quit'}"
+    except Exception as e:
+        return f"Render failed: {type(e).__name__}: {e}"
+    return None
+
+
+def validate_configs(paths=None, filepath=SOURCEPATH, workers=None, index=None) -> list:
+    """
+    Validates the configurations in parallel and prints a table with the problems of every configuration.
+    The job script is not changed.
+
+    Args:
+        paths (list, optional): The paths to the configurations. Defaults to None, in which case find_configs
+        is used.
+        filepath (str, optional): The path to the job script. Defaults to SOURCEPATH.
+        workers (int, optional): The number of worker processes. Defaults to None, which uses all cpus.
+        index (SourceIndex, optional): The index of the job script if it has already been read. Defaults to None.
+
+    Returns:
+        list: The results of validate_config.
+    """
+    if paths is None:
+        paths = find_configs()
+    if index is None:
+        with open(filepath, "r") as file:
+            index = SourceIndex(file.readlines())
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index,)) as executor:
+        results = list(executor.map(validate_config, paths, chunksize=max(len(paths) // 64, 1)))
+
+    print("-"*100)
+    print(f"Validated {len(results)} configurations against {filepath}")
+    print(f"{'Configuration':<50} |{'Keys':>6} |{'Unresolved':>11} |{'Ambiguous':>10} |{'Moved':>6}")
+    for result in results:
+        name = os.path.relpath(result["path"], os.path.dirname(os.path.dirname(result["path"])))
+        print(f"{name:<50} |{result['keys']:>6} |{len(result['unresolved']):>11} |"
+              f"{len(result['ambiguous']):>10} |{len(result['moved']):>6}")
+        if result["error"]:
+            print(f"{'Error':>18} | {result['error']}")
+        for key_name, reason in result["unresolved"]:
+            print(f"{'Unresolved':>18} | {key_name:<17} | {reason}")
+        for key_name, line_number, second_line_number in result["ambiguous"]:
+            print(f"{'Ambiguous':>18} | {key_name:<17} | found in line {line_number} and {second_line_number}")
+        for key_name, old_line_number, line_number in result["moved"]:
+            print(f"{'Moved':>18} | {key_name:<17} | line {old_line_number} -> {line_number}")
+    print("-"*100)
+    return results
+
+
+def flag_parser():
+    """Parses the flags from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", help="Set the configurations to validate. Defaults to all configurations in CONFIGPATH and OUTPATH.")
+    parser.add_argument("-f", "--file", default=SOURCEPATH, help="Set the job script the configurations are validated against.")
+    parser.add_argument("-w", "--workers", default=None, type=int, help="Set the number of worker processes.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = flag_parser()
+    validate_configs(args.paths or None, args.file, args.workers)